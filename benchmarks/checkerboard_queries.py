@@ -0,0 +1,80 @@
+"""
+Compares the Python-level CheckerBoard queries (all_fields()) with the vectorized ones, on a large board.
+Needs numpy. Run with `python benchmarks/checkerboard_queries.py`.
+"""
+import random
+import sys
+import timeit
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from game_anywhere.components import CheckerBoard
+
+SIZE = 100
+REPEAT = 20
+
+
+class Stone:
+    def __init__(self, player: int):
+        self.player = player
+
+
+def make_board() -> CheckerBoard:
+    random.seed(0)
+    board = CheckerBoard(SIZE, SIZE, classify=lambda stone: stone.player + 1)
+    for i in range(SIZE):
+        for j in range(SIZE):
+            if random.random() < 0.4:
+                board[i, j] = Stone(random.randrange(2))
+    return board
+
+
+def empty_fields_python(board):
+    return [field for _, field in board.all_fields() if field.empty()]
+
+
+def empty_fields_vectorized(board):
+    return board.fields_where(board.empty_mask())
+
+
+def owned_fields_python(board):
+    return [field for _, field in board.all_fields() if not field.empty() and field.content.player == 0]
+
+
+def owned_fields_vectorized(board):
+    return board.fields_where(board.type_mask(1))
+
+
+def liberties_python(board):
+    """ Number of empty neighbours of each field """
+    result = [[0] * SIZE for _ in range(SIZE)]
+    for i in range(SIZE):
+        for j in range(SIZE):
+            for di, dj in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                if 0 <= i + di < SIZE and 0 <= j + dj < SIZE and board[i + di, j + dj] is None:
+                    result[i][j] += 1
+    return result
+
+
+def liberties_vectorized(board):
+    return board.neighbour_count(board.empty_mask(), diagonals=False)
+
+
+if __name__ == "__main__":
+    board = make_board()
+    assert set(map(id, empty_fields_python(board))) == set(map(id, empty_fields_vectorized(board)))
+    assert set(map(id, owned_fields_python(board))) == set(map(id, owned_fields_vectorized(board)))
+    assert liberties_python(board) == liberties_vectorized(board).tolist()
+
+    print(f"{SIZE}x{SIZE} board, mean of {REPEAT} runs")
+    for name, python, vectorized in [
+        ("empty fields", empty_fields_python, empty_fields_vectorized),
+        ("fields of one player", owned_fields_python, owned_fields_vectorized),
+        ("liberties", liberties_python, liberties_vectorized),
+    ]:
+        python_time = timeit.timeit(lambda: python(board), number=REPEAT) / REPEAT
+        vectorized_time = timeit.timeit(lambda: vectorized(board), number=REPEAT) / REPEAT
+        print(f"{name:22} python {python_time * 1e3:8.2f} ms   vectorized {vectorized_time * 1e3:8.2f} ms"
+              f"   x{python_time / vectorized_time:.1f}")
@@ -0,0 +1,40 @@
+"""
+Validates the chess move generator of examples/chess/bitboard.py against the known perft node counts of
+standard positions (see https://www.chessprogramming.org/Perft_Results), and reports the nodes per second.
+Run with `python benchmarks/chess_perft.py [max_depth]`.
+"""
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from chess.bitboard import Position, perft, INITIAL_FEN
+
+# FEN -> node counts for depth 1, 2, ...
+POSITIONS = {
+    "initial": (INITIAL_FEN, [20, 400, 8902, 197281]),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862]),
+    "position 3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    "position 4": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    "position 5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379]),
+}
+
+if __name__ == "__main__":
+    max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    total_nodes = 0
+    total_time = 0.0
+    for name, (fen, counts) in POSITIONS.items():
+        position = Position.from_fen(fen)
+        for depth, expected in enumerate(counts[:max_depth], start=1):
+            start = time.perf_counter()
+            nodes = perft(position, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok" if nodes == expected else f"FAILED, expected {expected}"
+            print(f"{name:12} depth {depth}: {nodes:8} nodes in {elapsed:7.3f} s  {status}")
+            assert nodes == expected
+    print(f"{total_nodes / total_time:.0f} nodes/s")
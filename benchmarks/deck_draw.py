@@ -0,0 +1,83 @@
+"""
+Compares drawing cards one at a time into lists (List.append(deck.draw())) with the bulk operations of Deck
+(deal() and draw_into()) when dealing a game of poker: time to deal, time to serialize the messages sent to the agents
+(which the network thread does), number of messages and diffs, and number of bytes.
+Checks that both give the same hands.
+Run with `python benchmarks/deck_draw.py [number_of_deals]`.
+"""
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from game_anywhere.core import Game
+from game_anywhere.components import ComponentSlotProperty
+from game_anywhere.components.containers import List
+from game_anywhere.components.traditional.cards import Deck, fiftytwo_cards
+from game_lookahead import RecordingAgent
+
+NB_PLAYERS = 6
+
+
+class Table(Game):
+    deck = ComponentSlotProperty()
+    board = ComponentSlotProperty()
+    hands = ComponentSlotProperty()
+
+    def __init__(self, seed: int):
+        super().__init__([SimpleNamespace(name=str(i)) for i in range(NB_PLAYERS)], seed=seed)
+        self.deck = Deck(fiftytwo_cards(), shuffled=True, rng=self.random)
+        self.board = List()
+        self.hands = List([List(hidden=True, owner_id=i) for i in range(NB_PLAYERS)])
+        self.set_agents([RecordingAgent(str(i)) for i in range(NB_PLAYERS)])
+
+    def play_game(self): ...
+
+
+def one_at_a_time(table: Table):
+    for hand in table.hands:
+        for card in table.deck.draw(2):
+            hand.append(card)
+    for card in table.deck.draw(3):
+        table.board.append(card)
+    table.board.append(table.deck.draw())
+    table.board.append(table.deck.draw())
+
+
+def bulk(table: Table):
+    table.deck.deal(table.hands, 2)
+    table.deck.draw_into(table.board, 3)
+    table.deck.draw_into(table.board)
+    table.deck.draw_into(table.board)
+
+
+def measure(name: str, deal, nb_deals: int) -> list[str]:
+    elapsed = serialization = 0
+    nb_messages = nb_diffs = nb_bytes = 0
+    results = []
+    for seed in range(nb_deals):
+        table = Table(seed)
+        start = time.perf_counter()
+        deal(table)
+        elapsed += time.perf_counter() - start
+        nb_messages += sum(len(agent.updates) for agent in table.agents)
+        nb_diffs += sum(len(message) for agent in table.agents for message in agent.updates)
+        start = time.perf_counter()
+        nb_bytes += sum(len(json.dumps(message)) for agent in table.agents for message in agent.updates)
+        serialization += time.perf_counter() - start
+        results.append(str(table.html(viewer_id=0)))
+    print(f"{name:14} {elapsed / nb_deals * 1e6:7.1f} us/deal + {serialization / nb_deals * 1e6:5.1f} us to serialize   "
+          f"{nb_messages / nb_deals:5.1f} messages/deal   {nb_diffs / nb_deals:5.1f} diffs/deal   "
+          f"{nb_bytes / nb_deals:6.0f} bytes/deal")
+    return results
+
+
+if __name__ == "__main__":
+    nb_deals = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    expected = measure("one at a time", one_at_a_time, nb_deals)
+    assert measure("bulk", bulk, nb_deals) == expected
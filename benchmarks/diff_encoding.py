@@ -0,0 +1,61 @@
+"""
+Compares the JSON and binary encodings of the diffs sent to a player during random games of chess.
+Checks that the binary diffs decode to the same diffs.
+Run with `python benchmarks/diff_encoding.py [number_of_games]`.
+"""
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from game_anywhere.network.binary_diffs import DiffEncoder, DiffDecoder
+from chess.chess import Chess
+from game_lookahead import RecordingAgent, play
+
+PLIES = 100
+
+
+def random_game(seed: int) -> list[list[dict]]:
+    rng = random.Random(seed)
+    game = Chess([SimpleNamespace(name="white"), SimpleNamespace(name="black")])
+    game.set_agents([RecordingAgent("white"), RecordingAgent("black")])
+    for _ in range(PLIES):
+        if not game.legal_moves:
+            break
+        with game.transaction():
+            play(game, rng.choice(game.legal_moves))
+    return game.agents[0].updates
+
+
+def measure(name: str, games: list[list[list[dict]]], new_connection) -> tuple[int, list[list]]:
+    """ new_connection() returns the encoding function of a connection. Each game is sent on its own connection """
+    nb_messages = sum(len(game) for game in games)
+    start = time.perf_counter()
+    frames = []
+    for game in games:
+        encode = new_connection()
+        frames.append([encode(message) for message in game])
+    elapsed = time.perf_counter() - start
+    size = sum(len(frame) for game in frames for frame in game)
+    print(f"{name:7} {size / nb_messages:8.0f} bytes/message   {elapsed / nb_messages * 1e6:6.1f} us/message")
+    return size, frames
+
+
+if __name__ == "__main__":
+    nb_games = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    games = [random_game(seed) for seed in range(nb_games)]
+
+    json_size, _ = measure("JSON", games, lambda: json.dumps)
+    binary_size, frames = measure("binary", games, lambda: DiffEncoder().encode)
+    print(f"binary is {binary_size / json_size:.0%} of the size of JSON")
+
+    for game, game_frames in zip(games, frames):
+        decoder = DiffDecoder()
+        for message, frame in zip(game, game_frames):
+            assert decoder.decode(frame) == message
@@ -0,0 +1,64 @@
+"""
+Compares Game.clone() (copy-on-write) with copy.deepcopy() of the whole game, to try out moves in a game of chess:
+each random move is played on a copy of the previous position, as a search would do.
+Checks that the pieces of each copy match its bitboard position, and that the original game is left untouched.
+Run with `python benchmarks/game_clone.py [number_of_games]`.
+"""
+import copy
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from chess.chess import Chess, ChessCoordinates, BITBOARD_COLORS, BITBOARD_TYPES
+from chess import bitboard
+
+PLIES = 40
+
+
+def random_game(game: Chess, copy_and_play) -> list[Chess]:
+    games = [game]
+    while len(games) <= PLIES and games[-1].legal_moves:
+        games.append(copy_and_play(games[-1], random.choice(games[-1].legal_moves)))
+    return games
+
+
+def with_deepcopy(game: Chess, move: int) -> Chess:
+    game = copy.deepcopy(game)
+    game.apply_move([ChessCoordinates.from_square(bitboard.move_from(move)),
+                     ChessCoordinates.from_square(bitboard.move_to(move))], move)
+    game.totalTurn += 1
+    return game
+
+
+def check(game: Chess):
+    for coords, field in game.board.all_fields():
+        piece = field.content
+        expected = bitboard.EMPTY if piece is None else BITBOARD_COLORS[piece.color] * 6 + BITBOARD_TYPES[piece.type]
+        assert game.position.squares[bitboard.square(*coords)] == expected, coords
+
+
+if __name__ == "__main__":
+    nb_games = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    root = Chess([SimpleNamespace(name="white"), SimpleNamespace(name="black")])
+    root_html = str(root.html())
+
+    for name, copy_and_play in (("deepcopy", with_deepcopy), ("Game.clone()", Chess.after_move)):
+        random.seed(0)
+        nb_moves = 0
+        start = time.perf_counter()
+        games = []
+        for _ in range(nb_games):
+            games.append(random_game(root, copy_and_play))
+            nb_moves += len(games[-1]) - 1
+        elapsed = time.perf_counter() - start
+        for game in games:
+            for position in game:
+                check(position)
+        print(f"{name:14} {elapsed / nb_moves * 1e6:8.1f} us/move")
+    assert str(root.html()) == root_html
@@ -0,0 +1,120 @@
+"""
+Compares two ways to look ahead on the component tree: playing each move on a Game.clone(), and playing it on the game
+itself between Game.checkpoint() and Game.rollback().
+- tic-tac-toe: every sequence of marks up to a given depth;
+- chess: random games, where each move is taken back at the end.
+Checks that the games are unchanged afterwards, and that no update was sent to the agents.
+Run with `python benchmarks/game_lookahead.py [tic_tac_toe_depth]`.
+"""
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from game_anywhere.core import Agent
+from chess.chess import Chess, ChessCoordinates
+from chess import bitboard
+from tic_tac_toe.tic_tac_toe import TicTacToe, TicTacToeMark
+
+CHESS_GAMES = 20
+CHESS_PLIES = 40
+
+
+class RecordingAgent(Agent):
+    def __init__(self, name):
+        super().__init__(name)
+        self.updates = []
+
+    def update(self, diff):
+        self.updates.append(diff)
+
+    def message(self, *args, **kwargs): ...
+    def query(self, allowedSchema): ...
+    def choose_one_component_slot(self, *args, **kwargs): ...
+    def text_choice(self, options): ...
+    def int_choice(self, min=0, max=None): ...
+    def chat_stream(self, event_loop): ...
+
+
+def new_game(game_class):
+    game = game_class([SimpleNamespace(name="first"), SimpleNamespace(name="second")])
+    game.set_agents([RecordingAgent("first"), RecordingAgent("second")])
+    return game
+
+
+def tic_tac_toe_with_clone(game: TicTacToe, depth: int) -> int:
+    if depth == 0:
+        return 1
+    nodes = 1
+    for coords, field in game.board.all_fields():
+        if field.empty():
+            child = game.clone()
+            child.board[coords] = TicTacToeMark(child.get_current_agent_index())
+            child.totalTurn += 1
+            nodes += tic_tac_toe_with_clone(child, depth - 1)
+    return nodes
+
+
+def tic_tac_toe_with_rollback(game: TicTacToe, depth: int) -> int:
+    if depth == 0:
+        return 1
+    nodes = 1
+    for coords, field in game.board.all_fields():
+        if field.empty():
+            checkpoint = game.checkpoint()
+            field.content = TicTacToeMark(game.get_current_agent_index())
+            game.totalTurn += 1
+            nodes += tic_tac_toe_with_rollback(game, depth - 1)
+            game.rollback(checkpoint)
+    return nodes
+
+
+def play(game: Chess, move: int):
+    game.apply_move([ChessCoordinates.from_square(bitboard.move_from(move)),
+                     ChessCoordinates.from_square(bitboard.move_to(move))], move)
+    game.totalTurn += 1
+
+
+def chess_with_clone(game: Chess) -> int:
+    position = game
+    plies = 0
+    while plies < CHESS_PLIES and position.legal_moves:
+        position = position.after_move(random.choice(position.legal_moves))
+        plies += 1
+    return plies
+
+
+def chess_with_rollback(game: Chess) -> int:
+    checkpoints = []
+    while len(checkpoints) < CHESS_PLIES and game.legal_moves:
+        checkpoints.append(game.checkpoint())
+        play(game, random.choice(game.legal_moves))
+    for checkpoint in reversed(checkpoints):
+        game.rollback(checkpoint)
+    return len(checkpoints)
+
+
+def measure(name: str, game, search) -> None:
+    html = str(game.html())
+    start = time.perf_counter()
+    nodes = search(game)
+    elapsed = time.perf_counter() - start
+    assert str(game.html()) == html
+    # see Game.FlushingAgent, and AsyncAgentAdapter
+    assert not any(getattr(agent.agent, "agent", agent.agent).updates for agent in game.agents)
+    print(f"{name:36} {nodes:7} nodes   {nodes / elapsed:9.0f} nodes/s")
+
+
+if __name__ == "__main__":
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    measure(f"tic-tac-toe depth {depth}, clone", new_game(TicTacToe), lambda game: tic_tac_toe_with_clone(game, depth))
+    measure(f"tic-tac-toe depth {depth}, rollback", new_game(TicTacToe), lambda game: tic_tac_toe_with_rollback(game, depth))
+    for name, search in (("clone", chess_with_clone), ("rollback", chess_with_rollback)):
+        random.seed(0)
+        game = new_game(Chess)
+        measure(f"chess random games, {name}", game, lambda game: sum(search(game) for _ in range(CHESS_GAMES)))
@@ -0,0 +1,104 @@
+"""
+Compares the HTML serializer of game_anywhere.ui with the naive recursive one it replaced, in which every element
+concatenates the strings of all its children. On flat, wide boards the two are on par; the iterative walk only wins on
+deep trees, and it is what lets trees deeper than the recursion limit be serialized at all.
+Then measures building and serializing a board's HTML with and without the cache of tag classes in HtmlElementMeta,
+which is where the speedup of rendering a board comes from.
+Run with `python benchmarks/html_serialization.py`.
+"""
+import sys
+from pathlib import Path
+from timeit import timeit
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from game_anywhere.components import CheckerBoard, Component
+from game_anywhere.ui import Html, HtmlElement, HtmlElementMeta, tag
+
+
+def naive_serialize(html) -> str:
+    """ The serializer that was used before """
+    if not isinstance(html, Html):
+        return str(html)
+    result = ""
+    if isinstance(html, HtmlElement):
+        result += f"<{html.tag_name}"
+        for key, value in html.attrs.items():
+            result += f' {key}="{value}"'
+        result += ">"
+    for child in html.content:
+        result += naive_serialize(child)
+    if isinstance(html, HtmlElement):
+        result += f"</{html.tag_name}>"
+    return result
+
+
+class Stack(Component):
+    """ A field content that contains a few levels of nested elements, e.g. a stack of tokens """
+
+    def __init__(self, height: int):
+        super().__init__()
+        self.height = height
+
+    def html(self, viewer_id=None):
+        html = tag.span("token")
+        for i in range(self.height):
+            html = tag.div(html, tag.span(i), **{"class": "stack"})
+        return html
+
+
+def checkerboard(size: int, stack_height: int) -> CheckerBoard:
+    return CheckerBoard(height=size, width=size, fill=lambda: Stack(stack_height))
+
+
+def unfrozen_html(board: CheckerBoard) -> Html:
+    """ Renders each field without the slot cache, so that the tree contains no pre-serialized elements """
+    return tag.div(*(field._render_html() for _, field in board.all_fields()), **{"class": "checkerboard"})
+
+
+def nested_html(depth: int, payload_size: int) -> Html:
+    html = tag.span("leaf")
+    for i in range(depth):
+        html = tag.div(html, tag.span("x" * payload_size), id=str(i))
+    return html
+
+
+def compare(name: str, html: Html, number: int):
+    assert naive_serialize(html) == str(html)
+    naive = min(timeit(lambda: naive_serialize(html), number=number) for _ in range(3)) / number
+    linear = min(timeit(lambda: str(html), number=number) for _ in range(3)) / number
+    print(f"{name:<40} naive {naive * 1000:8.2f} ms   linear {linear * 1000:8.2f} ms   speedup x{naive / linear:.1f}")
+
+
+class NoCache(dict):
+    """ Before, HtmlElementMeta created a new class every time an attribute of `tag` was accessed """
+
+    def __setitem__(self, key, value):
+        pass
+
+
+def render(name: str, board: CheckerBoard, number: int):
+    """ Builds and serializes the same way both times, so the difference is the tag class cache alone """
+    tag_classes = HtmlElementMeta._tags
+    HtmlElementMeta._tags = NoCache()
+    try:
+        uncached = min(timeit(lambda: str(unfrozen_html(board)), number=number) for _ in range(3)) / number
+    finally:
+        HtmlElementMeta._tags = tag_classes
+    cached = min(timeit(lambda: str(unfrozen_html(board)), number=number) for _ in range(3)) / number
+    print(f"{name:<40} uncached {uncached * 1000:8.2f} ms   cached {cached * 1000:8.2f} ms   "
+          f"speedup x{uncached / cached:.1f}")
+
+
+if __name__ == "__main__":
+    print("Serializer alone, iterative vs naive recursive:")
+    compare("CheckerBoard 100x100", unfrozen_html(checkerboard(100, 0)), number=10)
+    compare("CheckerBoard 30x30, stacks of 50", unfrozen_html(checkerboard(30, 50)), number=5)
+    compare("CheckerBoard 10x10, stacks of 500", unfrozen_html(checkerboard(10, 500)), number=5)
+    compare("Nested elements, depth 900", nested_html(900, payload_size=100), number=5)
+    print("Building and serializing the HTML tree, tag class cache off vs on:")
+    render("CheckerBoard 100x100", checkerboard(100, 0), number=3)
+    render("CheckerBoard 30x30, stacks of 50", checkerboard(30, 50), number=3)
+    # the naive serializer would hit the recursion limit here
+    deep = nested_html(20000, payload_size=10)
+    print(f"{'Nested elements, depth 20000':<40} linear {timeit(lambda: str(deep), number=5) / 5 * 1000:8.2f} ms")
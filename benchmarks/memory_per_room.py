@@ -0,0 +1,65 @@
+"""
+Measures the memory used by the component tree of each example game, i.e. the cost of one room.
+Run with `python benchmarks/memory_per_room.py`.
+"""
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from game_anywhere.agents.local_agent import HumanAgent
+from chess import Chess
+from tic_tac_toe import TicTacToe
+from poker import Poker
+from werewolves.werewolves import Werewolves, Villager, Werewolf, Seer, Witch
+from hanabi import Hanabi
+
+ROOMS = 200
+
+games = {
+    "TicTacToe": (TicTacToe, 2, {}),
+    "Chess": (Chess, 2, {}),
+    "Poker": (Poker, 4, {}),
+    "Hanabi": (Hanabi, 4, {}),
+    "Werewolves": (Werewolves, 6, {"all_roles": [Villager, Villager, Werewolf, Werewolf, Seer, Witch]}),
+}
+
+
+def create_game(GameType, nb_players: int, kwargs: dict):
+    agent_descriptions = [HumanAgent.Descriptor() for _ in range(nb_players)]
+    for i, descriptor in enumerate(agent_descriptions):
+        descriptor.resolve_name(f"Player {i}")
+    kwargs = {key: list(value) for key, value in kwargs.items()}  # some games shuffle their arguments
+    return GameType(agent_descriptions, **kwargs)
+
+
+def render(game):
+    for viewer_id in game.get_viewers():
+        str(game.html(viewer_id=viewer_id))
+
+
+def measure(GameType, nb_players: int, kwargs: dict, rendered: bool) -> float:
+    random.seed(0)
+    create_game(GameType, nb_players, kwargs)  # warm up, e.g. create the classes that are created lazily
+    tracemalloc.start()
+    rooms = []
+    for _ in range(ROOMS):
+        game = create_game(GameType, nb_players, kwargs)
+        if rendered:
+            render(game)
+        rooms.append(game)
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / ROOMS
+
+
+if __name__ == "__main__":
+    print(f"{'Game':<12} {'bytes/room':>12} {'with HTML cache':>16}")
+    for name, (GameType, nb_players, kwargs) in games.items():
+        tree = measure(GameType, nb_players, kwargs, rendered=False)
+        rendered = measure(GameType, nb_players, kwargs, rendered=True)
+        print(f"{name:<12} {tree:>12.0f} {rendered:>16.0f}")
@@ -0,0 +1,61 @@
+"""
+Measures the Monte Carlo equity calculator (game_anywhere/components/traditional/poker_equity.py):
+- checks it against the exact equity, enumerated with evaluate_hand(), on the turn and on the flop;
+- compares evaluate_hands() with a loop over evaluate_hand() on the same random hands;
+- counts how many samples fit in the 20 ms that Poker gives to the computation.
+Run with `python benchmarks/poker_equity.py`. Needs numpy.
+"""
+import sys
+import time
+from itertools import combinations
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from game_anywhere.components.traditional.poker_hands import evaluate_hand, evaluate_hands
+from game_anywhere.components.traditional.poker_equity import equities
+
+
+def exact_shares(hands: list[list[int]], board: list[int]) -> list[float]:
+    remaining = [card for card in range(52) if card not in board and all(card not in hand for hand in hands)]
+    shares = [0.0] * len(hands)
+    nb_boards = 0
+    for completion in combinations(remaining, 5 - len(board)):
+        scores = [evaluate_hand(hand + board + list(completion)) for hand in hands]
+        best = max(scores)
+        winners = [i for i, score in enumerate(scores) if score == best]
+        for i in winners:
+            shares[i] += 1 / len(winners)
+        nb_boards += 1
+    return [share / nb_boards for share in shares]
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    # Ace-king of spades against a pair of nines, with a flop that helps both, then a turn
+    hands = [[48, 44], [29, 30]]
+    for board in ([8, 25, 40], [8, 25, 40, 5]):
+        exact = exact_shares(hands, board)
+        estimate, nb_samples = equities(hands, board, samples=200000, rng=rng)
+        print(f"board {board}: exact {[f'{share:.2%}' for share in exact]},"
+              f" {nb_samples} samples {[f'{equity.share:.2%}' for equity in estimate]}")
+        assert all(abs(equity.share - share) < 0.01 for equity, share in zip(estimate, exact))
+
+    nb_hands = 200000
+    cards = np.array([rng.choice(52, 7, replace=False) for _ in range(nb_hands)])
+    start = time.perf_counter()
+    vectorized = evaluate_hands(cards)
+    vectorized_time = time.perf_counter() - start
+    lists = cards.tolist()
+    start = time.perf_counter()
+    scalar = [evaluate_hand(hand) for hand in lists]
+    scalar_time = time.perf_counter() - start
+    assert vectorized.tolist() == scalar
+    print(f"evaluate_hand()   {scalar_time / nb_hands * 1e9:8.0f} ns/hand")
+    print(f"evaluate_hands()  {vectorized_time / nb_hands * 1e9:8.0f} ns/hand   x{scalar_time / vectorized_time:.0f}")
+
+    for nb_players in (2, 6):
+        _, nb_samples = equities([[48, 44]] + [None] * (nb_players - 1), time_limit=0.02, rng=rng)
+        print(f"{nb_players} players, preflop: {nb_samples} samples in 20 ms")
@@ -0,0 +1,57 @@
+"""
+Cross-checks the poker hand evaluator (game_anywhere/components/traditional/poker_hands.py) against the reference
+PokerHand of examples/poker.py on random 7-card hands, and compares their speed.
+Run with `python benchmarks/poker_showdown.py [number_of_hands]`.
+"""
+import random
+import sys
+import time
+from collections import Counter
+from itertools import combinations
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from game_anywhere.components.traditional.cards import fiftytwo_cards
+from game_anywhere.components.traditional.poker_hands import evaluate_hand, card_index, hand_category
+from poker import PokerHand, hand_value_names_ranked
+
+
+def reference(cards) -> PokerHand:
+    return max(PokerHand(five_cards) for five_cards in combinations(cards, 5))
+
+
+def sign(x) -> int:
+    return (x > 0) - (x < 0)
+
+
+if __name__ == "__main__":
+    nb_hands = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    random.seed(0)
+    deck = list(fiftytwo_cards())
+    hands = [random.sample(deck, 7) for _ in range(nb_hands)]
+    indices = [[card_index(card) for card in hand] for hand in hands]
+
+    start = time.perf_counter()
+    reference_hands = [reference(hand) for hand in hands]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = [evaluate_hand(hand) for hand in indices]
+    evaluator_time = time.perf_counter() - start
+
+    # Same category, and the same order between consecutive hands
+    categories = Counter()
+    for i, (hand, score) in enumerate(zip(reference_hands, scores)):
+        category = hand_value_names_ranked[hand.hand_value]
+        assert category == hand_category(score), (hands[i], category, hand_category(score))
+        categories[category] += 1
+        if i > 0:
+            previous_hand, previous_score = reference_hands[i - 1], scores[i - 1]
+            expected = sign((hand > previous_hand) - (hand < previous_hand))
+            assert sign(score - previous_score) == expected, (hands[i - 1], hands[i])
+    print(f"{nb_hands} hands, same ranking as PokerHand. Categories: {dict(categories)}")
+    print(f"PokerHand        {reference_time / nb_hands * 1e6:8.2f} us/hand")
+    print(f"evaluate_hand()  {evaluator_time / nb_hands * 1e6:8.2f} us/hand   x{reference_time / evaluator_time:.0f}")
@@ -0,0 +1,96 @@
+"""
+Records games played by random agents to replay logs, then replays them headless.
+Checks that each replay ends in the same state as the recorded game, as seen by the players (spectators of poker also
+see equity estimates, which depend on timing), and compares the speed of both.
+Run with `python benchmarks/replay.py [number_of_games]`.
+"""
+import contextlib
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from game_anywhere.core import Agent
+from game_anywhere.agents.replay import ReplayLog, RecordingAgent, replay_game
+from chess.chess import Chess
+from tic_tac_toe.tic_tac_toe import TicTacToe
+from poker import Poker
+
+MAX_BET = 10
+
+
+class RandomAgent(Agent):
+    def __init__(self, name, rng: random.Random):
+        super().__init__(name)
+        self.rng = rng
+        self.nb_updates = 0
+
+    def update(self, diff):
+        self.nb_updates += 1
+
+    def choose_one_component_slot(self, slots, indices=None, special_options=[], message=None):
+        return self.rng.choice([*(indices or slots), *special_options])
+
+    def text_choice(self, options):
+        return self.rng.choice(options)
+
+    def int_choice(self, min=0, max=None):
+        min = min or 0
+        return self.rng.randint(min, min + MAX_BET if max is None else max)
+
+    def message(self, *args, **kwargs): ...
+    def query(self, allowedSchema): ...
+    def chat_stream(self, event_loop): ...
+
+
+def record(GameType, config: list[str], path: str, seed: int, archive_path: str | None = None):
+    nb_agents, game_config = GameType.parse_config(config)
+    names = [f"player {i}" for i in range(nb_agents)]
+    game = GameType([SimpleNamespace(name=name) for name in names], seed=seed, **game_config)
+    log = ReplayLog(path, archive_path)
+    log.write_header(game, config, names, game_kwargs=game_config)
+    rng = random.Random(seed)
+    agents = [RandomAgent(name, rng) for name in names]
+    game.set_agents([RecordingAgent(agent, i, log) for i, agent in enumerate(agents)])
+    try:
+        summary = game.play_game()
+    finally:
+        log.close()
+    return game, summary
+
+
+def run(name: str, GameType, config: list[str], nb_games: int, directory: str):
+    record_time = replay_time = 0
+    nb_answers = 0
+    for seed in range(nb_games):
+        path = os.path.join(directory, f"{name}-{seed}.jsonl")
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(None):  # the examples print their progress
+            game, summary = record(GameType, config, path, seed)
+        record_time += time.perf_counter() - start
+        nb_answers += len(ReplayLog.read(path)[1])
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            replayed, replayed_summary = replay_game(path, GameType)
+        replay_time += time.perf_counter() - start
+        assert replayed_summary.get_winner() == summary.get_winner()
+        for viewer_id in range(len(game.agents)):
+            assert str(replayed.html(viewer_id=viewer_id)) == str(game.html(viewer_id=viewer_id))
+    print(f"{name:12} {nb_answers:7} answers   recorded {nb_answers / record_time:9.0f} answers/s"
+          f"   replayed {nb_answers / replay_time:9.0f} answers/s")
+
+
+if __name__ == "__main__":
+    nb_games = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with TemporaryDirectory() as directory:
+        run("tic-tac-toe", TicTacToe, [], nb_games, directory)
+        run("chess", Chess, [], nb_games, directory)
+        run("poker", Poker, [], nb_games, directory)
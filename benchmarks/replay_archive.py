@@ -0,0 +1,85 @@
+"""
+Seeks into the ReplayArchives of random games of chess, and compares it with replaying the games from their start.
+Checks that applying the frames read for a turn gives the same HTML as a keyframe of that turn, and that the archive
+written while the game is played is the same as the one written when replaying it.
+Run with `python benchmarks/replay_archive.py [number_of_games]`.
+"""
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from game_anywhere.agents.replay import ReplayArchive, replay_game
+from chess.chess import Chess
+from replay import record
+
+SEEKS_PER_GAME = 20
+
+
+def apply_frames(frames) -> str:
+    screen = None
+    for frame in frames:
+        for diff in json.loads(frame):
+            content = ElementTree.fromstring(f"<div>{diff['value']}</div>")
+            if diff["key"] == "":
+                screen = content
+            elif diff["op"] == "add":  # a slot of a list, e.g. of captured pieces
+                screen.find(f".//*[@id='{diff['key'].rpartition('/')[0]}']").extend(content)
+            else:
+                assert diff["op"] == "replace"
+                element = screen.find(f".//*[@id='{diff['key']}']")
+                attributes = dict(element.attrib)
+                element.clear()
+                element.attrib.update(attributes)
+                element.text = content.text
+                element.extend(content)
+    return ElementTree.tostring(screen, encoding="unicode")
+
+
+if __name__ == "__main__":
+    nb_games = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    seek_time = replay_time = 0
+    bytes_read = archive_bytes = nb_seeks = nb_turns = 0
+    rng = random.Random(0)
+    with TemporaryDirectory() as directory:
+        for seed in range(nb_games):
+            log = os.path.join(directory, f"{seed}.jsonl")
+            archive_path = os.path.join(directory, f"{seed}.replay")
+            with contextlib.redirect_stdout(None):
+                record(Chess, [], log, seed, archive_path=archive_path)
+
+            start = time.perf_counter()
+            replay_game(log, Chess, archive_path=archive_path + ".replayed")
+            replay_time += time.perf_counter() - start
+            with open(archive_path, "rb") as live, open(archive_path + ".replayed", "rb") as replayed:
+                assert live.read() == replayed.read()
+
+            ReplayArchive.KEYFRAME_INTERVAL = 1  # the reference: a keyframe at every turn
+            replay_game(log, Chess, archive_path=archive_path + ".keyframes")
+            ReplayArchive.KEYFRAME_INTERVAL = 32
+
+            with ReplayArchive(archive_path) as archive, ReplayArchive(archive_path + ".keyframes") as keyframes:
+                assert len(archive) == len(keyframes)
+                nb_turns += len(archive)
+                archive_bytes += os.path.getsize(archive_path)
+                for _ in range(SEEKS_PER_GAME):
+                    turn = rng.randrange(len(archive))
+                    start = time.perf_counter()
+                    frames = list(archive.read(turn))
+                    seek_time += time.perf_counter() - start
+                    bytes_read += archive.offsets[turn + 1] - archive.offsets[turn - turn % archive.keyframe_interval]
+                    nb_seeks += 1
+                    assert apply_frames(frames) == apply_frames(keyframes.read(turn)), turn
+
+    print(f"{nb_turns} turns in {nb_games} games, {archive_bytes / nb_turns:.0f} bytes/turn in the archives")
+    print(f"replay from the start: {replay_time / nb_games * 1e3:8.1f} ms/game")
+    print(f"seek in the archive:   {seek_time / nb_seeks * 1e3:8.3f} ms/seek, {bytes_read / nb_seeks / 1024:.1f} KiB read")
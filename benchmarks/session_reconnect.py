@@ -0,0 +1,146 @@
+"""
+Plays chess through websockets, and loses the connection of a player while the diffs of the other player's move are on
+the way to it: the client hasn't read them when its connection drops. Then reconnects it like client/player.html does:
+by reloading the view, by resuming after the last diffs it received (see Session.replay_diffs()), and by resuming from a
+sequence number that the server no longer has, so that it gets a snapshot of its view instead.
+Measures the bytes that the client gets until it is asked its next question, and checks that it sees the same board
+as a fresh view of the game. Both for clients that get JSON and clients that get binary diffs.
+Run with `python benchmarks/session_reconnect.py [number_of_moves_before_the_drop]`.
+"""
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+from xml.etree import ElementTree
+
+import aiohttp
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+import game_anywhere.agents
+from game_anywhere.network.binary_diffs import DiffDecoder
+from game_anywhere.network.http_controlled_server import HttpControlledServer
+from chess import Chess
+from stable_list import apply
+from waiting_rooms import PORT, URL, create_rooms, player
+
+
+def parse(html: str) -> ElementTree.Element:
+    """ The screen of client/player.html, showing the html """
+    return ElementTree.fromstring(f"<div id=''>{html}</div>")
+
+
+class Client:
+    """ A player of seat 0, and the board that it sees """
+
+    def __init__(self, session: aiohttp.ClientSession, room: int, binary: bool):
+        self.session = session
+        self.room = room
+        self.binary = binary
+        self.screen: ElementTree.Element | None = None
+        self.last_seen: int | None = None  # see Session.replay_diffs()
+        self.nb_bytes = 0
+
+    async def fetch_view(self) -> str:
+        async with self.session.get(f"{URL}/r/{self.room}/html?seat=0&username=player0") as response:
+            html = await response.text()
+        self.nb_bytes += len(html.encode())
+        return html
+
+    async def connect(self, resume_from: int | None = None) -> aiohttp.ClientWebSocketResponse:
+        if resume_from is None:
+            self.screen = parse(await self.fetch_view())
+        self.decoder = DiffDecoder()  # a new connection starts with new slot IDs
+        url = f"{URL}/r/{self.room}/ws/0?username=player0"
+        if self.binary:
+            url += "&protocol=binary"
+        if resume_from is not None:
+            url += f"&seq={resume_from}"
+        ws = await self.session.ws_connect(url)
+        await ws.send_str("?")  # see Session.CLIENT_LOST_TRACK_MESSAGE
+        return ws
+
+    async def next_question(self, ws: aiohttp.ClientWebSocketResponse) -> dict:
+        """ Applies the diffs received until the next question """
+        while True:
+            message = await ws.receive(timeout=5)
+            if message.type == aiohttp.WSMsgType.BINARY:
+                self.nb_bytes += len(message.data)
+                self.apply(self.decoder.decode(message.data))
+                self.last_seen = self.decoder.sequence_number
+                continue
+            assert message.type == aiohttp.WSMsgType.TEXT, message
+            self.nb_bytes += len(message.data.encode())
+            data = json.loads(message.data)
+            if isinstance(data, dict) and data.get("type") == "diffs":
+                self.apply(data["diffs"])
+                self.last_seen = data["seq"]
+            elif isinstance(data, dict) and data.get("type") == "choice":
+                return data
+
+    def apply(self, diffs: list[dict]):
+        for diff in diffs:
+            if diff["key"] == "":  # a snapshot
+                self.screen = parse(diff["value"])
+            elif diff["op"] == "replace":  # the value is HTML, like the innerHTML set by client/player.html
+                element = self.screen.find(f".//*[@id='{diff['key']}']")
+                element.clear()
+                element.attrib["id"] = diff["key"]
+                value = parse(diff["value"])
+                element.text = value.text
+                element.extend(value)
+            else:
+                apply(self.screen, diff)
+
+    @staticmethod
+    async def answer(ws: aiohttp.ClientWebSocketResponse, question: dict):
+        if question.get("slots"):
+            await ws.send_str(question["slots"][0])
+        else:
+            await ws.send_str(json.dumps(question["schema"]["enum"][0]))
+
+
+async def reconnect(session: aiohttp.ClientSession, binary: bool, how: str, nb_moves: int) -> tuple[int, int]:
+    """ Returns the bytes that the client got to see the board again, and the number of diffs that it had missed """
+    room, = await create_rooms(session, "Chess", 1)
+    opponent = asyncio.create_task(player(session, room, 1))
+    client = Client(session, room, binary)
+    ws = await client.connect()
+    for _ in range(2 * nb_moves):  # which piece, then where it goes
+        await client.answer(ws, await client.next_question(ws))
+    # the opponent moves and the server sends its diffs, which the client never reads
+    await asyncio.sleep(0.5)
+    await ws.close()
+    last_seen = client.last_seen
+
+    client.nb_bytes = 0
+    resume_from = {"reload": None, "replay": last_seen, "snapshot": 10 ** 6}[how]
+    ws = await client.connect(resume_from)
+    question = await client.next_question(ws)
+    nb_bytes = client.nb_bytes
+    fresh = parse(await client.fetch_view())
+    assert ElementTree.tostring(client.screen) == ElementTree.tostring(fresh), how
+    await client.answer(ws, question)
+    await ws.close()
+    opponent.cancel()
+    return nb_bytes, (client.last_seen or 0) - (last_seen or 0)
+
+
+async def main(nb_moves: int):
+    async with aiohttp.ClientSession() as session:
+        for binary in (False, True):
+            for how in ("reload", "replay", "snapshot"):
+                nb_bytes, nb_missed = await reconnect(session, binary, how, nb_moves)
+                print(f"{'binary' if binary else 'JSON':6} {how:8} {nb_bytes:7} bytes to see the board again"
+                      + (f"   ({nb_missed} diffs replayed)" if how == "replay" else ""))
+
+
+if __name__ == "__main__":
+    nb_moves = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    server = HttpControlledServer({"Chess": Chess})
+    threading.Thread(target=server.nt_start, kwargs={"port": PORT, "print": None}, daemon=True).start()
+    asyncio.run(asyncio.sleep(1))
+    asyncio.run(main(nb_moves))
@@ -0,0 +1,104 @@
+"""
+Starts examples/run_server.py with one process, then with a Supervisor and several worker processes, and plays
+concurrent games of chess through it, with clients that pick the first option of each question.
+Compares the answers per second, and checks that the games are the same, and that the room list, its watch stream
+and the HTML view of the rooms are served by the supervisor for the rooms of all workers.
+Run with `python benchmarks/sharded_server.py [number_of_workers] [number_of_games]`.
+"""
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import aiohttp
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+PORT = 8095
+URL = f"http://localhost:{PORT}"
+ANSWERS_PER_PLAYER = 20
+
+
+async def player(session: aiohttp.ClientSession, room: int, seat: int) -> int:
+    """ Answers the first option of each question, ANSWERS_PER_PLAYER times or until the game ends """
+    nb_answers = 0
+    async with session.ws_connect(f"{URL}/r/{room}/ws/{seat}?username=player{seat}") as ws:
+        while nb_answers < ANSWERS_PER_PLAYER:
+            try:
+                message = await ws.receive(timeout=5)
+            except asyncio.TimeoutError:
+                break  # the other player has stopped
+            if message.type != aiohttp.WSMsgType.TEXT:
+                break
+            data = json.loads(message.data)
+            if isinstance(data, dict) and data.get("type") == "choice":
+                await ws.send_str(data["slots"][0] if data.get("slots") else json.dumps(data["schema"]["enum"][0]))
+                nb_answers += 1
+    return nb_answers
+
+
+async def watch(session: aiohttp.ClientSession, keys: set[str]):
+    async with session.get(f"{URL}/room/list/watch") as response:
+        async for line in response.content:
+            if line.startswith(b"data: "):
+                keys.update(diff["key"] for diff in json.loads(line[len(b"data: "):]))
+
+
+async def benchmark(nb_games: int) -> tuple[float, list[int]]:
+    async with aiohttp.ClientSession() as session:
+        watched_keys = set()
+        watcher = asyncio.create_task(watch(session, watched_keys))
+        await asyncio.sleep(0.2)
+        rooms = []
+        for _ in range(nb_games):
+            async with session.post(f"{URL}/room", json={"game": "Chess", "args": ""}) as response:
+                rooms.append(await response.json())
+        async with session.get(f"{URL}/room/list") as response:
+            assert sorted(map(int, await response.json())) == sorted(rooms)
+
+        start = time.perf_counter()
+        answers = await asyncio.gather(*[player(session, room, seat) for room in rooms for seat in (0, 1)])
+        elapsed = time.perf_counter() - start
+        assert sum(answers) == 2 * ANSWERS_PER_PLAYER * nb_games
+
+        for room in rooms:
+            assert f"/{room}" in watched_keys
+            async with session.get(f"{URL}/r/{room}/html?seat=watch&username=spectator") as response:
+                assert response.status == 200 and "<div" in await response.text()
+        watcher.cancel()
+    return sum(answers) / elapsed, answers
+
+
+def run(nb_workers: int, nb_games: int) -> tuple[float, list[int]]:
+    server = subprocess.Popen(
+        [sys.executable, str(PROJECT_ROOT / "examples" / "run_server.py"), "-p", str(PORT), "--workers", str(nb_workers)],
+        stdout=subprocess.DEVNULL, start_new_session=True,
+    )
+    try:
+        while True:  # wait until the server (and its workers) accept connections
+            try:
+                urllib.request.urlopen(f"{URL}/room/list", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.2)
+        return asyncio.run(benchmark(nb_games))
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+
+
+if __name__ == "__main__":
+    # at least 2, so that the sharded path is measured even on one core
+    nb_workers = int(sys.argv[1]) if len(sys.argv) > 1 else max(2, os.cpu_count() or 1)
+    nb_games = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    results = []
+    for workers in (1, nb_workers):
+        answers_per_second, answers = run(workers, nb_games)
+        print(f"{workers} process(es): {answers_per_second:7.0f} answers/s over {nb_games} concurrent games of chess")
+        results.append(answers)
+    assert results[0] == results[1]  # the clients always pick the first option, so the games are the same
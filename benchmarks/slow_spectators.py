@@ -0,0 +1,132 @@
+"""
+Publishes the diffs of chess moves to the spectators of a room, one of which is stalled (like a mobile tab in the
+background) and only reads its messages once the moves are over. Compares the messages and bytes that its connection
+holds with an unbounded writing queue and with each OverflowPolicy of a bounded one, and checks that once it has read
+everything (and reloaded the view when it was told to), it sees the same board as the others.
+Run with `python benchmarks/slow_spectators.py [number_of_moves] [max_queue_size]`.
+"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from game_anywhere.network.binary_diffs import DiffEncoder, DiffDecoder
+from game_anywhere.network.broadcast import BroadcastHub, EncodedMessage
+from game_anywhere.network.outbound_queue import OutboundQueue
+from game_anywhere.network.spectator import Spectator
+from spectator_broadcast import chess_move
+
+
+class Client:
+    """ A fake WebSocket, and the board that its client sees """
+
+    def __init__(self, binary: bool, board: dict[str, str]):
+        self.decoder = DiffDecoder() if binary else None
+        self.board: dict[str, str] = {}
+        self.real_board = board  # what the view shows when it is reloaded
+        self.stalled = asyncio.Event()
+        self.stalled.set()
+        self.closed = False
+        self.on_close = None
+
+    async def send_str(self, data: str):
+        await self.stalled.wait()
+        if self.closed:
+            return
+        message = json.loads(data)
+        if message == OutboundQueue.RESYNC_MESSAGE:
+            self.board = dict(self.real_board)
+        elif isinstance(message, list):
+            self.apply(message)
+
+    async def send_bytes(self, data: bytes):
+        await self.stalled.wait()
+        if self.closed:
+            return
+        self.apply(self.decoder.decode(data))
+
+    async def send_json(self, data):
+        await self.send_str(json.dumps(data))
+
+    async def close(self, code: int, message: bytes):
+        assert code == Spectator.RESYNC_CLOSE_CODE
+        self.closed = True
+        self.on_close()
+
+    def apply(self, diffs: list[dict]):
+        for diff in diffs:
+            self.board[diff["key"]] = diff["value"]
+
+
+def queued_bytes(queue: OutboundQueue) -> int:
+    return sum(
+        len(message.data if isinstance(message, EncodedMessage) else json.dumps(message)) for message in queue.messages
+    )
+
+
+async def measure(nb_moves: int, max_size: int, policy: OutboundQueue.OverflowPolicy, binary: bool):
+    room = SimpleNamespace(
+        server=SimpleNamespace(loop=asyncio.get_running_loop()), max_queue_size=max_size, overflow_policy=policy
+    )
+    broadcast = BroadcastHub()
+    board: dict[str, str] = {}
+    spectators = []
+    for _ in range(2):
+        spectator = Spectator(room)
+        spectator.ws = Client(binary, board)
+        spectator.diff_encoder = DiffEncoder() if binary else None
+        spectator.state = Spectator.State.CONNECTED
+        # the connection ends, see ServerRoom.report_afk()
+        spectator.ws.on_close = lambda spectator=spectator: broadcast.unsubscribe(spectator)
+        broadcast.subscribe(spectator)
+        spectators.append(spectator)
+    fast, slow = spectators
+    tasks = [asyncio.create_task(spectator.send_all_messages()) for spectator in spectators]
+
+    slow.ws.stalled.clear()
+    for i in range(nb_moves):
+        diffs = chess_move(i)
+        for diff in diffs:
+            board[diff["key"]] = diff["value"]
+        broadcast.publish_diffs(diffs)
+        await asyncio.sleep(0)
+    held = len(slow.writing_queue), queued_bytes(slow.writing_queue)
+
+    start = time.perf_counter()
+    slow.ws.stalled.set()
+    while len(slow.writing_queue) or len(fast.writing_queue):
+        await asyncio.sleep(0)
+    catch_up = time.perf_counter() - start
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks)
+    for spectator in spectators:
+        spectator.state = Spectator.State.FREE
+    assert fast.ws.board == board
+    # a client that was disconnected reconnects and reloads the view
+    assert slow.ws.closed or slow.ws.board == board
+    return held, catch_up, slow.metrics()
+
+
+async def main(nb_moves: int, max_size: int):
+    for binary in (False, True):
+        for name, size, policy in [
+            ("unbounded", nb_moves + 10, OutboundQueue.OverflowPolicy.CONFLATE),
+            *[(policy.name.lower(), max_size, policy) for policy in OutboundQueue.OverflowPolicy],
+        ]:
+            (nb_messages, nb_bytes), catch_up, metrics = await measure(nb_moves, size, policy, binary)
+            print(f"{'binary' if binary else 'JSON':6} {name:10} holds {nb_messages:6} messages {nb_bytes / 1024:8.1f} KiB"
+                  f"   catches up in {catch_up * 1000:6.1f} ms   high water mark {metrics['high_water_mark']:6}"
+                  f"   merged {metrics['merged']:6}   dropped {metrics['dropped']:6}   resyncs {metrics['resyncs']}")
+
+
+if __name__ == "__main__":
+    nb_moves = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    max_size = int(sys.argv[2]) if len(sys.argv) > 2 else OutboundQueue.DEFAULT_MAX_SIZE
+    asyncio.run(main(nb_moves, max_size))
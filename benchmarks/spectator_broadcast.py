@@ -0,0 +1,110 @@
+"""
+Sends the diffs of chess moves to 1, 100 and 10k spectators of a room, each one being put in the writing queue of every
+spectator (so each connection encodes it again), or published by the BroadcastHub of the room (encoded once).
+Measures the messages per second that reach all spectators, for clients that get JSON and clients that get binary diffs.
+The WebSockets are fake ones that only count the bytes, so that the encoding and the queues are all that's measured.
+Run with `python benchmarks/spectator_broadcast.py [number_of_spectators...]`.
+"""
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from game_anywhere.network.binary_diffs import DiffEncoder
+from game_anywhere.network.broadcast import BroadcastHub
+from game_anywhere.network.outbound_queue import OutboundQueue
+from game_anywhere.network.spectator import Spectator
+
+DELIVERIES = 200_000  # messages times spectators, per measurement
+PIECE = ('<svg width="100%" height="100%" viewBox="0 0 12 12"><text y="100%" textLength="100%" '
+         'lengthAdjust="spacingAndGlyphs" style="font-size: 12;">{}</text></svg>')
+
+
+def chess_move(i: int) -> list[dict]:
+    """ What the spectators get when a piece moves: its old square is emptied, and it appears on the new one """
+    start, end = divmod(i % 4096, 64)
+    return [
+        {"op": "replace", "key": f"/0/{start // 8},{start % 8}", "value": ""},
+        {"op": "replace", "key": f"/0/{end // 8},{end % 8}", "value": PIECE.format("♞♘"[i % 2])},
+    ]
+
+
+class FakeWebSocket:
+    def __init__(self, done: asyncio.Event, expected: int):
+        self.done = done
+        self.expected = expected
+        self.nb_messages = self.nb_bytes = 0
+        self.last = None
+
+    async def send_str(self, data: str):
+        self.received(data)
+
+    async def send_bytes(self, data: bytes):
+        self.received(data)
+
+    async def send_json(self, data):  # like aiohttp
+        await self.send_str(json.dumps(data))
+
+    def received(self, data: str | bytes):
+        self.nb_messages += 1
+        self.nb_bytes += len(data)
+        self.last = data
+        if self.nb_messages == self.expected:
+            self.done.set()
+
+
+async def measure(nb_spectators: int, binary: bool, hub: bool) -> tuple[float, FakeWebSocket]:
+    nb_messages = max(10, DELIVERIES // nb_spectators)
+    room = SimpleNamespace(
+        server=SimpleNamespace(loop=asyncio.get_running_loop()),
+        max_queue_size=nb_messages, overflow_policy=OutboundQueue.OverflowPolicy.CONFLATE,  # nothing is merged
+    )
+    broadcast = BroadcastHub()
+    spectators = []
+    events = []
+    for _ in range(nb_spectators):
+        spectator = Spectator(room)
+        events.append(asyncio.Event())
+        spectator.ws = FakeWebSocket(events[-1], nb_messages)
+        spectator.diff_encoder = DiffEncoder() if binary else None
+        broadcast.subscribe(spectator)
+        spectators.append(spectator)
+    tasks = [asyncio.create_task(spectator.send_all_messages()) for spectator in spectators]
+    messages = [chess_move(i) for i in range(nb_messages)]
+
+    start = time.perf_counter()
+    for message in messages:
+        if hub:
+            broadcast.publish_diffs(message)
+        else:
+            for spectator in spectators:
+                spectator.send_nowait(message)
+        await asyncio.sleep(0)  # the game hands over to the network thread between moves
+    await asyncio.gather(*[event.wait() for event in events])
+    elapsed = time.perf_counter() - start
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks)
+    return nb_messages / elapsed, spectators[-1].ws
+
+
+async def main(spectator_counts: list[int]):
+    for binary in (False, True):
+        for nb_spectators in spectator_counts:
+            results = [await measure(nb_spectators, binary, hub) for hub in (False, True)]
+            (before, ws_before), (after, ws_after) = results
+            # the spectators get the same frames
+            assert ws_before.nb_bytes == ws_after.nb_bytes and ws_before.last == ws_after.last
+            print(f"{'binary' if binary else 'JSON':6} {nb_spectators:6} spectators: {before:9.0f} messages/s per connection"
+                  f"   {after:9.0f} messages/s with the hub   ({after / before:4.1f}x)")
+
+
+if __name__ == "__main__":
+    spectator_counts = [int(arg) for arg in sys.argv[1:]] or [1, 100, 10_000]
+    asyncio.run(main(spectator_counts))
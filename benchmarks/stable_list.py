@@ -0,0 +1,116 @@
+"""
+Applies random inserts, removals and moves to the hands of a table, with a List (which can only remove by rebuilding
+its positional IDs, and sends no diff for it) and with a StableList (one diff per change).
+Applies the diffs sent to a player to a copy of their screen, and counts the changes after which it no longer matches
+the HTML of the game. Also compares the time to remove cards from the middle of big hands.
+Run with `python benchmarks/stable_list.py [number_of_changes]`.
+"""
+import random
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from game_anywhere.core import Game
+from game_anywhere.components import ComponentSlotProperty
+from game_anywhere.components.containers import List, StableList
+from game_anywhere.network.binary_diffs import DiffEncoder, DiffDecoder
+from game_lookahead import RecordingAgent
+
+NB_HANDS = 4
+BIG_HAND = 10_000
+
+
+class Table(Game):
+    hands = ComponentSlotProperty()
+
+    def __init__(self, ListType):
+        super().__init__([SimpleNamespace(name="player")])
+        self.hands = List([ListType(range(5)) for _ in range(NB_HANDS)])
+        self.set_agents([RecordingAgent("player")])
+
+    def play_game(self): ...
+
+
+def apply(screen: ElementTree.Element, diff: dict):
+    """ What client/player.html does """
+    element = screen.find(f".//*[@id='{diff['key']}']")
+    if diff["op"] == "replace":
+        element.clear()
+        element.attrib["id"] = diff["key"]
+        element.text = diff["value"]
+        return
+    if diff["op"] == "add":
+        element = ElementTree.fromstring(diff["value"])
+    if diff["op"] in ("remove", "move"):
+        screen.find(f".//*[@id='{diff['key']}']/..").remove(element)
+    if diff["op"] in ("add", "move"):
+        if "before" in diff:
+            parent = screen.find(f".//*[@id='{diff['before']}']/..")
+            parent.insert(list(parent).index(parent.find(f"*[@id='{diff['before']}']")), element)
+        else:
+            screen.find(f".//*[@id='{diff['key'].rpartition('/')[0]}']").append(element)
+
+
+def random_changes(ListType, nb_changes: int) -> tuple[int, int, int]:
+    """ Returns the number of diffs, the number of changes after which the screen is out of sync, and the bytes sent """
+    rng = random.Random(0)
+    table = Table(ListType)
+    agent = table.agents[0]
+    screen = ElementTree.fromstring(f"<div>{table.html(viewer_id=0)}</div>")
+    encoder, decoder = DiffEncoder(), DiffDecoder()
+    nb_diffs = nb_bytes = nb_out_of_sync = 0
+    for i in range(nb_changes):
+        hand = rng.choice(table.hands)
+        change = rng.choice(["append", "remove", "move"] if ListType is StableList else ["append", "remove"])
+        if len(hand) < 2:
+            change = "append"
+        if change == "append":
+            hand.append(i)
+        elif change == "remove":
+            del hand[rng.randrange(len(hand))]
+        else:
+            slots = list(hand.iter_slots())
+            hand.move(rng.choice(slots), rng.choice([*slots, None]))
+        for message in agent.updates:
+            frame = encoder.encode(message)
+            assert decoder.decode(frame) == message
+            nb_bytes += len(frame)
+            for diff in message:
+                nb_diffs += 1
+                apply(screen, diff)
+        agent.updates.clear()
+        expected = ElementTree.fromstring(f"<div>{table.html(viewer_id=0)}</div>")
+        if ElementTree.tostring(screen) != ElementTree.tostring(expected):
+            nb_out_of_sync += 1
+            screen = expected  # as if the client reloaded the page
+    return nb_diffs, nb_out_of_sync, nb_bytes
+
+
+def remove_from_middle(ListType) -> float:
+    table = Table(ListType)
+    hand = table.hands[0]
+    hand.extend(range(BIG_HAND))
+    slots = [slot for _, slot in hand.get_slots()]
+    start = time.perf_counter()
+    if ListType is StableList:
+        for slot in slots[len(slots) // 4:3 * len(slots) // 4]:
+            hand.remove_slot(slot)
+    else:
+        for _ in range(len(slots) // 2):
+            del hand[len(hand) // 2]
+    return (time.perf_counter() - start) / (len(slots) // 2)
+
+
+if __name__ == "__main__":
+    nb_changes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for ListType in (List, StableList):
+        nb_diffs, nb_out_of_sync, nb_bytes = random_changes(ListType, nb_changes)
+        print(f"{ListType.__name__:10} {nb_diffs / nb_changes:5.2f} diffs/change   {nb_bytes / nb_changes:5.1f} bytes/change"
+              f"   out of sync after {nb_out_of_sync / nb_changes:4.0%} of the changes"
+              f"   {remove_from_middle(ListType) * 1e6:6.2f} us/removal from a hand of {BIG_HAND + 5}")
@@ -0,0 +1,97 @@
+"""
+Sends messages from a game thread to a connection whose event loop runs on another thread, like the network thread of
+the server: with a coroutine scheduled per message (asyncio.run_coroutine_threadsafe()), with a callback per message
+(loop.call_soon_threadsafe()), and with the ThreadBridge of the loop (Spectator.send_sync()).
+Measures the messages per second that reach the socket, then the questions per second that the game thread asks and
+gets answered (Spectator.get_sync()), the client answering as soon as it receives a question.
+The WebSocket is a fake one, so that the cost of crossing threads is all that's measured.
+Run with `python benchmarks/thread_bridge.py [number_of_messages]`.
+"""
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from game_anywhere.network.outbound_queue import OutboundQueue
+from game_anywhere.network.spectator import Spectator
+from spectator_broadcast import chess_move
+
+QUESTION = {"type": "choice", "schema": {"enum": ["e4", "d4"]}}
+
+
+class FakeWebSocket:
+    def __init__(self, spectator: Spectator):
+        self.spectator = spectator
+        self.nb_messages = 0
+        self.all_received = threading.Event()
+        self.expected = 0
+
+    async def send_json(self, data):
+        self.nb_messages += 1
+        if data == QUESTION:  # the client answers, see Spectator.read_all_messages()
+            self.spectator.reading_queue.append('"e4"')
+            self.spectator.notify_readers()
+        if self.nb_messages == self.expected:
+            self.all_received.set()
+
+
+def start_loop() -> asyncio.AbstractEventLoop:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def connect(loop: asyncio.AbstractEventLoop, nb_messages: int) -> tuple[Spectator, asyncio.Task]:
+    room = SimpleNamespace(
+        server=SimpleNamespace(loop=loop),
+        max_queue_size=nb_messages + 1, overflow_policy=OutboundQueue.OverflowPolicy.CONFLATE,  # nothing is merged
+    )
+    spectator = Spectator(room)
+    spectator.ws = FakeWebSocket(spectator)
+    spectator.state = Spectator.State.CONNECTED
+
+    async def start_sending():
+        return asyncio.create_task(spectator.send_all_messages())
+    return spectator, asyncio.run_coroutine_threadsafe(start_sending(), loop).result()
+
+
+def send_messages(spectator: Spectator, loop: asyncio.AbstractEventLoop, path: str, nb_messages: int) -> float:
+    messages = [chess_move(i) for i in range(nb_messages)]
+    spectator.ws.expected = spectator.ws.nb_messages + nb_messages
+    spectator.ws.all_received.clear()
+    start = time.perf_counter()
+    for message in messages:
+        if path == "coroutine":
+            asyncio.run_coroutine_threadsafe(spectator.send(message), loop)
+        elif path == "callback":
+            loop.call_soon_threadsafe(spectator.send_nowait, message)
+        else:
+            spectator.send_sync(message)
+    spectator.ws.all_received.wait()
+    return nb_messages / (time.perf_counter() - start)
+
+
+def ask_questions(spectator: Spectator, nb_questions: int) -> float:
+    start = time.perf_counter()
+    for _ in range(nb_questions):
+        spectator.send_sync(QUESTION)
+        assert spectator.get_sync() == '"e4"'
+    return nb_questions / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    nb_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    loop = start_loop()
+    spectator, sending = connect(loop, nb_messages)
+    for path, name in [
+        ("coroutine", "run_coroutine_threadsafe"), ("callback", "call_soon_threadsafe"), ("bridge", "ThreadBridge"),
+    ]:
+        print(f"{name:25} {send_messages(spectator, loop, path, nb_messages):8.0f} messages/s to the socket")
+    print(f"{'questions answered':25} {ask_questions(spectator, nb_messages // 10):8.0f} questions/s")
+    loop.call_soon_threadsafe(sending.cancel)
+    spectator.state = Spectator.State.FREE
@@ -0,0 +1,94 @@
+"""
+Starts a server, creates rooms that wait for their players, and measures the threads and memory that they use.
+Then plays a game of tic-tac-toe (an AsyncGame, played on the event loop) and moves of chess (a synchronous game,
+played on its own thread) through websockets, with clients that pick the first option of each question.
+Run with `python benchmarks/waiting_rooms.py [number_of_rooms]`.
+"""
+import asyncio
+import json
+import sys
+import threading
+import tracemalloc
+from pathlib import Path
+
+import aiohttp
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+import game_anywhere.agents
+from game_anywhere.network.http_controlled_server import HttpControlledServer
+from chess import Chess
+from tic_tac_toe import TicTacToe
+
+PORT = 8093
+URL = f"http://localhost:{PORT}"
+CHESS_MOVES = 6
+
+
+async def create_rooms(session: aiohttp.ClientSession, game: str, nb_rooms: int) -> list[int]:
+    rooms = []
+    for _ in range(nb_rooms):
+        async with session.post(f"{URL}/room", json={"game": game, "args": ""}) as response:
+            rooms.append(await response.json())
+    return rooms
+
+
+async def player(session: aiohttp.ClientSession, room: int, seat: int, max_answers: int | None = None) -> int:
+    """
+    Answers the first option of each question until the game ends, or until it has answered max_answers questions
+    and the other player waits for it. Returns the number of answers
+    """
+    nb_answers = 0
+    async with session.ws_connect(f"{URL}/r/{room}/ws/{seat}?username=player{seat}") as ws:
+        while True:
+            try:
+                message = await ws.receive(timeout=2)
+            except asyncio.TimeoutError:
+                break
+            if message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.CLOSING):
+                break
+            if message.type != aiohttp.WSMsgType.TEXT:
+                continue
+            data = json.loads(message.data)
+            if isinstance(data, dict) and data.get("type") == "choice":
+                if max_answers is not None and nb_answers == max_answers:
+                    break
+                if data.get("slots"):
+                    await ws.send_str(data["slots"][0])
+                else:
+                    await ws.send_str(json.dumps(data["schema"]["enum"][0]))
+                nb_answers += 1
+    return nb_answers
+
+
+async def main(nb_rooms: int):
+    async with aiohttp.ClientSession() as session:
+        for game in ("TicTacToe", "Chess"):
+            threads = threading.active_count()
+            tracemalloc.start()
+            await create_rooms(session, game, nb_rooms)
+            await asyncio.sleep(0.5)
+            size, _peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{nb_rooms} {game} rooms waiting for their players: {threading.active_count() - threads} new threads,"
+                  f" {size / nb_rooms:.0f} bytes/room")
+
+        room, = await create_rooms(session, "TicTacToe", 1)
+        answers = await asyncio.gather(player(session, room, 0), player(session, room, 1))
+        print(f"tic-tac-toe played through websockets: {sum(answers)} moves")
+        assert sum(answers) >= 5
+
+        room, = await create_rooms(session, "Chess", 1)
+        answers = await asyncio.gather(player(session, room, 0, CHESS_MOVES), player(session, room, 1, CHESS_MOVES))
+        print(f"chess played through websockets: {sum(answers)} answers")
+        assert sum(answers) == 2 * CHESS_MOVES
+
+
+if __name__ == "__main__":
+    nb_rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    server = HttpControlledServer({"TicTacToe": TicTacToe, "Chess": Chess})
+    threading.Thread(target=server.nt_start, kwargs={"port": PORT, "print": None}, daemon=True).start()
+    asyncio.run(asyncio.sleep(1))
+    asyncio.run(main(nb_rooms))
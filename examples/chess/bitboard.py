@@ -0,0 +1,363 @@
+"""
+A bitboard chess position and legal move generator.
+
+Squares are numbered 0 (a1) to 63 (h8), i.e. square = rank * 8 + file, and a bitboard is an int
+whose bit `square` is set when the square is in the set.
+Moves are encoded as ints too (see make_move()), so that generating them doesn't allocate objects.
+"""
+from typing import Iterator, Optional
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+EMPTY = -1
+
+# Move flags
+NORMAL, DOUBLE_PUSH, EN_PASSANT, CASTLE = range(4)
+
+# Castling rights
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_3 = 0xFF << 16
+RANK_6 = 0xFF << 40
+PROMOTION_RANKS = 0xFF | 0xFF << 56
+
+INITIAL_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+FEN_PIECES = "PNBRQK"
+
+
+def square(file: int, rank: int) -> int:
+    return rank * 8 + file
+
+
+def make_move(from_square: int, to_square: int, promotion: int = 0, flag: int = NORMAL) -> int:
+    """ promotion is the type of the promoted piece, or 0 (PAWN) if the move is not a promotion """
+    return from_square | to_square << 6 | promotion << 12 | flag << 15
+
+
+def move_from(move: int) -> int:
+    return move & 63
+
+
+def move_to(move: int) -> int:
+    return (move >> 6) & 63
+
+
+def move_promotion(move: int) -> int:
+    return (move >> 12) & 7
+
+
+def move_flag(move: int) -> int:
+    return move >> 15
+
+
+def squares_of(bitboard: int) -> Iterator[int]:
+    while bitboard:
+        bit = bitboard & -bitboard
+        yield bit.bit_length() - 1
+        bitboard ^= bit
+
+
+# Precomputed tables
+
+def _step_attacks(steps: list[tuple[int, int]]) -> list[int]:
+    table = []
+    for sq in range(64):
+        file, rank = sq % 8, sq // 8
+        attacks = 0
+        for df, dr in steps:
+            if 0 <= file + df < 8 and 0 <= rank + dr < 8:
+                attacks |= 1 << square(file + df, rank + dr)
+        table.append(attacks)
+    return table
+
+
+KNIGHT_ATTACKS = _step_attacks([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _step_attacks([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+# PAWN_ATTACKS[color][sq]: the squares attacked by a pawn of that color on sq
+PAWN_ATTACKS = [_step_attacks([(-1, 1), (1, 1)]), _step_attacks([(-1, -1), (1, -1)])]
+
+
+def _rays(df: int, dr: int) -> list[int]:
+    table = []
+    for sq in range(64):
+        file, rank = sq % 8 + df, sq // 8 + dr
+        ray = 0
+        while 0 <= file < 8 and 0 <= rank < 8:
+            ray |= 1 << square(file, rank)
+            file, rank = file + df, rank + dr
+        table.append(ray)
+    return table
+
+
+# The first blocker on a ray is its lowest bit for directions that increase the square, its highest bit otherwise
+_ROOK_RAYS_UP = [_rays(0, 1), _rays(1, 0)]
+_ROOK_RAYS_DOWN = [_rays(0, -1), _rays(-1, 0)]
+_BISHOP_RAYS_UP = [_rays(1, 1), _rays(-1, 1)]
+_BISHOP_RAYS_DOWN = [_rays(1, -1), _rays(-1, -1)]
+
+
+def _slide(sq: int, occupied: int, rays_up: list[list[int]], rays_down: list[list[int]]) -> int:
+    attacks = 0
+    for rays in rays_up:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in rays_down:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq: int, occupied: int) -> int:
+    return _slide(sq, occupied, _ROOK_RAYS_UP, _ROOK_RAYS_DOWN)
+
+
+def bishop_attacks(sq: int, occupied: int) -> int:
+    return _slide(sq, occupied, _BISHOP_RAYS_UP, _BISHOP_RAYS_DOWN)
+
+
+# The castling rights that remain when a piece moves from or to a square
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[square(4, 0)] = BLACK_KINGSIDE | BLACK_QUEENSIDE
+CASTLING_MASK[square(7, 0)] = 15 ^ WHITE_KINGSIDE
+CASTLING_MASK[square(0, 0)] = 15 ^ WHITE_QUEENSIDE
+CASTLING_MASK[square(4, 7)] = WHITE_KINGSIDE | WHITE_QUEENSIDE
+CASTLING_MASK[square(7, 7)] = 15 ^ BLACK_KINGSIDE
+CASTLING_MASK[square(0, 7)] = 15 ^ BLACK_QUEENSIDE
+
+# King destination -> (rook origin, rook destination)
+CASTLING_ROOK_MOVES = {
+    square(6, 0): (square(7, 0), square(5, 0)),
+    square(2, 0): (square(0, 0), square(3, 0)),
+    square(6, 7): (square(7, 7), square(5, 7)),
+    square(2, 7): (square(0, 7), square(3, 7)),
+}
+
+
+class Position:
+    """
+    An immutable chess position: play() returns a new Position.
+    Pieces are numbered color * 6 + type, e.g. BLACK * 6 + KNIGHT.
+    """
+
+    __slots__ = ("pieces", "occupancy", "squares", "side", "castling", "en_passant", "halfmove_clock")
+
+    def __init__(self):
+        # One bitboard per piece
+        self.pieces: list[int] = [0] * 12
+        # One bitboard per color
+        self.occupancy: list[int] = [0, 0]
+        # The piece on each square, or EMPTY
+        self.squares: list[int] = [EMPTY] * 64
+        self.side = WHITE
+        self.castling = 0
+        # The square a pawn skipped with a double push on the last move, or None
+        self.en_passant: Optional[int] = None
+        # Number of moves since the last capture or pawn move, for the fifty-move rule
+        self.halfmove_clock = 0
+
+    @staticmethod
+    def from_fen(fen: str) -> "Position":
+        """ Parses a FEN string. The fullmove number is ignored """
+        placement, side, castling, en_passant, *counters = fen.split()
+        position = Position()
+        for rank, row in enumerate(reversed(placement.split("/"))):
+            file = 0
+            for char in row:
+                if char.isdigit():
+                    file += int(char)
+                    continue
+                color = WHITE if char.isupper() else BLACK
+                position.put(color * 6 + FEN_PIECES.index(char.upper()), square(file, rank))
+                file += 1
+        position.side = WHITE if side == "w" else BLACK
+        for char, right in zip("KQkq", (WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE)):
+            if char in castling:
+                position.castling |= right
+        if en_passant != "-":
+            position.en_passant = square(ord(en_passant[0]) - ord("a"), int(en_passant[1]) - 1)
+        if counters:
+            position.halfmove_clock = int(counters[0])
+        return position
+
+    @staticmethod
+    def initial() -> "Position":
+        return Position.from_fen(INITIAL_FEN)
+
+    def put(self, piece: int, sq: int):
+        self.pieces[piece] |= 1 << sq
+        self.occupancy[piece // 6] |= 1 << sq
+        self.squares[sq] = piece
+
+    def king_square(self, color: int) -> int:
+        return self.pieces[color * 6 + KING].bit_length() - 1
+
+    def is_attacked(self, sq: int, by: int) -> bool:
+        pieces = self.pieces
+        base = by * 6
+        if PAWN_ATTACKS[by ^ 1][sq] & pieces[base + PAWN]:
+            return True
+        if KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT]:
+            return True
+        if KING_ATTACKS[sq] & pieces[base + KING]:
+            return True
+        occupied = self.occupancy[0] | self.occupancy[1]
+        queens = pieces[base + QUEEN]
+        if bishop_attacks(sq, occupied) & (pieces[base + BISHOP] | queens):
+            return True
+        return rook_attacks(sq, occupied) & (pieces[base + ROOK] | queens) != 0
+
+    def is_fifty_move_draw(self) -> bool:
+        return self.halfmove_clock >= 100
+
+    def in_check(self) -> bool:
+        return self.is_attacked(self.king_square(self.side), self.side ^ 1)
+
+    def pseudo_legal_moves(self) -> list[int]:
+        """ All moves, including those that leave the own king in check """
+        us = self.side
+        them = us ^ 1
+        pieces = self.pieces
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        occupied = own | enemy
+        empty = ~occupied & FULL
+        base = us * 6
+        moves = []
+
+        # Pawns, all pawns at once
+        pawns = pieces[base + PAWN]
+        capturable = enemy
+        if self.en_passant is not None:
+            capturable |= 1 << self.en_passant
+        if us == WHITE:
+            single = (pawns << 8) & empty
+            double = ((single & RANK_3) << 8) & empty
+            captures = [(((pawns & ~FILE_A) << 7) & capturable, 7), (((pawns & ~FILE_H) << 9) & capturable, 9)]
+            forward = 8
+        else:
+            single = (pawns >> 8) & empty
+            double = ((single & RANK_6) >> 8) & empty
+            captures = [(((pawns & ~FILE_A) >> 9) & capturable, -9), (((pawns & ~FILE_H) >> 7) & capturable, -7)]
+            forward = -8
+        for targets, delta in [(single, forward)] + captures:
+            for to in squares_of(targets):
+                frm = to - delta
+                if (1 << to) & PROMOTION_RANKS:
+                    for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        moves.append(make_move(frm, to, promotion))
+                elif to == self.en_passant and delta != forward:
+                    moves.append(make_move(frm, to, flag=EN_PASSANT))
+                else:
+                    moves.append(frm | to << 6)
+        for to in squares_of(double):
+            moves.append(make_move(to - 2 * forward, to, flag=DOUBLE_PUSH))
+
+        # Other pieces, one by one
+        not_own = ~own & FULL
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            for frm in squares_of(pieces[base + piece_type]):
+                if piece_type == KNIGHT:
+                    targets = KNIGHT_ATTACKS[frm]
+                elif piece_type == BISHOP:
+                    targets = bishop_attacks(frm, occupied)
+                elif piece_type == ROOK:
+                    targets = rook_attacks(frm, occupied)
+                elif piece_type == QUEEN:
+                    targets = bishop_attacks(frm, occupied) | rook_attacks(frm, occupied)
+                else:
+                    targets = KING_ATTACKS[frm]
+                for to in squares_of(targets & not_own):
+                    moves.append(frm | to << 6)
+
+        # Castling. The king may not castle out of, through, or into check
+        if us == WHITE:
+            rights = (WHITE_KINGSIDE, WHITE_QUEENSIDE)
+        else:
+            rights = (BLACK_KINGSIDE, BLACK_QUEENSIDE)
+        king = 56 * us + 4
+        if self.castling & rights[0] and not occupied & (0b11 << (king + 1)):
+            if not any(self.is_attacked(sq, them) for sq in (king, king + 1, king + 2)):
+                moves.append(make_move(king, king + 2, flag=CASTLE))
+        if self.castling & rights[1] and not occupied & (0b111 << (king - 3)):
+            if not any(self.is_attacked(sq, them) for sq in (king, king - 1, king - 2)):
+                moves.append(make_move(king, king - 2, flag=CASTLE))
+        return moves
+
+    def legal_moves(self) -> list[int]:
+        king_color = self.side
+        them = king_color ^ 1
+        legal = []
+        for move in self.pseudo_legal_moves():
+            after = self.play(move)
+            if not after.is_attacked(after.king_square(king_color), them):
+                legal.append(move)
+        return legal
+
+    def play(self, move: int) -> "Position":
+        """ Returns the position after the move. The move is assumed to be pseudo-legal """
+        frm = move & 63
+        to = (move >> 6) & 63
+        promotion = (move >> 12) & 7
+        flag = move >> 15
+        us = self.side
+        them = us ^ 1
+
+        result = Position.__new__(Position)
+        pieces = result.pieces = self.pieces[:]
+        occupancy = result.occupancy = self.occupancy[:]
+        squares = result.squares = self.squares[:]
+
+        piece = squares[frm]
+        captured = squares[to]
+        move_mask = (1 << frm) | (1 << to)
+        pieces[piece] ^= move_mask
+        occupancy[us] ^= move_mask
+        squares[frm] = EMPTY
+        squares[to] = piece
+        if captured != EMPTY:
+            pieces[captured] ^= 1 << to
+            occupancy[them] ^= 1 << to
+        if flag == EN_PASSANT:
+            captured_square = to - 8 if us == WHITE else to + 8
+            pieces[them * 6 + PAWN] ^= 1 << captured_square
+            occupancy[them] ^= 1 << captured_square
+            squares[captured_square] = EMPTY
+        elif flag == CASTLE:
+            rook_from, rook_to = CASTLING_ROOK_MOVES[to]
+            rook_mask = (1 << rook_from) | (1 << rook_to)
+            pieces[us * 6 + ROOK] ^= rook_mask
+            occupancy[us] ^= rook_mask
+            squares[rook_to] = squares[rook_from]
+            squares[rook_from] = EMPTY
+        if promotion:
+            pieces[piece] ^= 1 << to
+            pieces[us * 6 + promotion] |= 1 << to
+            squares[to] = us * 6 + promotion
+
+        result.side = them
+        result.castling = self.castling & CASTLING_MASK[frm] & CASTLING_MASK[to]
+        result.en_passant = (frm + to) // 2 if flag == DOUBLE_PUSH else None
+        if piece == us * 6 + PAWN or captured != EMPTY:
+            result.halfmove_clock = 0
+        else:
+            result.halfmove_clock = self.halfmove_clock + 1
+        return result
+
+
+def perft(position: Position, depth: int) -> int:
+    """ Number of leaf nodes of the legal move tree, see https://www.chessprogramming.org/Perft """
+    if depth == 0:
+        return 1
+    moves = position.legal_moves()
+    if depth == 1:
+        return len(moves)
+    return sum(perft(position.play(move), depth - 1) for move in moves)
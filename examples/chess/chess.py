@@ -9,6 +9,11 @@ from game_anywhere.ui import tag
 from enum import Enum, auto
 from typing import Optional
 
+try:
+    from . import bitboard
+except ImportError:  # chess.py is run as a script
+    import bitboard
+
 
 class ChessPiece(Component):
     class Type(Enum):
@@ -93,18 +98,12 @@ class ChessCoordinates(tuple[int, int]):
     def algebraic_notation(self) -> str:
         return chr(self[0] + ord("a")) + chr(self[1] + ord("1"))
 
-    def __add__(self, other: tuple[int, int]) -> "ChessCoordinates":
-        """
-        override the + operator to get neighbours of field easily.
-        Throws a ChessCoordinates.OutOfBounds error when the field is outside the chessboard
-        """
-        return ChessCoordinates(self[0] + other[0], self[1] + other[1])
+    @staticmethod
+    def from_square(square: int) -> "ChessCoordinates":
+        return ChessCoordinates(square % 8, square // 8)
 
-    def try_add(self, other: tuple[int, int]) -> Optional["ChessCoordinates"]:
-        try:
-            return self + other
-        except ChessCoordinates.OutOfBounds:
-            return None
+    def square(self) -> int:
+        return bitboard.square(self[0], self[1])
 
 
 class ChessMove:
@@ -119,12 +118,23 @@ class ChessMove:
         self.piece_captured = piece_captured
 
 
-CARDINAL_DIRECTIONS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-DIAGONAL_DIRECTIONS = [(i, j) for i in (-1, 1) for j in (-1, 1)]
+# Conversions between ChessPiece and the piece numbers of the bitboard module
+BITBOARD_COLORS = {ChessPiece.Color.WHITE: bitboard.WHITE, ChessPiece.Color.BLACK: bitboard.BLACK}
+BITBOARD_TYPES = {
+    ChessPiece.Type.PAWN: bitboard.PAWN,
+    ChessPiece.Type.KNIGHT: bitboard.KNIGHT,
+    ChessPiece.Type.BISHOP: bitboard.BISHOP,
+    ChessPiece.Type.ROOK: bitboard.ROOK,
+    ChessPiece.Type.QUEEN: bitboard.QUEEN,
+    ChessPiece.Type.KING: bitboard.KING,
+}
+PIECE_TYPES = {bitboard_type: type for type, bitboard_type in BITBOARD_TYPES.items()}
 
 
 class Chess(TurnBasedGame):
     SummaryType = SimpleGameSummary
+    # apply_move() replaces the position and the legal moves, so they can be restored by Game.rollback()
+    checkpointed_attributes = TurnBasedGame.checkpointed_attributes + ("position", "legal_moves")
 
     board = ComponentSlotProperty[CheckerBoard]()
     captured = ComponentSlotProperty[List[ChessPiece]]()
@@ -132,8 +142,16 @@ class Chess(TurnBasedGame):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.board = full_chessboard()
-        self.last_field_moved_through_for_en_passant = None
         self.captured = List[ChessPiece]([])
+        # The rules are checked on a bitboard model of the board, which is kept in sync by apply_move()
+        self.position = bitboard.Position()
+        for coords, field in self.board.all_fields():
+            piece = field.content
+            if piece is not None:
+                self.position.put(BITBOARD_COLORS[piece.color] * 6 + BITBOARD_TYPES[piece.type], bitboard.square(*coords))
+        self.position.side = BITBOARD_COLORS[self.current_color()]
+        self.position.castling = 15
+        self.legal_moves = self.position.legal_moves()
 
     @staticmethod
     def color_of(agent_id: "AgentId"):
@@ -142,96 +160,26 @@ class Chess(TurnBasedGame):
     def current_color(self):
         return self.color_of(self.get_current_agent_id())
 
-    def go_straight(
-        self,
-        position: ChessCoordinates,
-        direction: tuple[int, int],
-        color: ChessPiece.Color,
-    ) -> list[ChessCoordinates]:
-        assert (
-            self.board[position] is not None and self.board[position].color == color
-        )
-        possibilities = []
-        while True:
-            position = position.try_add(direction)
-            if position and (
-                self.board[position] is None
-                or self.board[position].color != color
-            ): # empty or enemy piece taken
-                possibilities.append(position)
-            if not position or self.board[position] is not None:
-                # end of board or enemy piece taken -> stop here
-                break
-        return possibilities
-
     def possible_movements(
         self, piece: ChessPiece, position: ChessCoordinates
     ) -> list[ChessCoordinates]:
         assert self.board[position] == piece
-        possibilities = []
-        if piece.type == ChessPiece.Type.PAWN:
-            forward = 1 if piece.color == ChessPiece.Color.WHITE else -1
-            field_in_front = position.try_add((0, forward))
-            if field_in_front and self.board[field_in_front] is None:
-                possibilities.append(field_in_front)
-                if (piece.color == ChessPiece.Color.WHITE and position[1] == 1) or (
-                    piece.color == ChessPiece.Color.BLACK and position[1] == 6
-                ):
-                    field_2_in_front = field_in_front.try_add((0, forward))
-                    if field_2_in_front and self.board[field_2_in_front] is None:
-                        possibilities.append(field_2_in_front)
-            for side in (-1, 1):
-                field_at_diag = position.try_add((side, forward))
-                if field_at_diag:
-                    if (
-                        (
-                            self.board[field_at_diag] is not None
-                            and self.board[field_at_diag].color != piece.color
-                        )
-                        or self.last_field_moved_through_for_en_passant == field_at_diag
-                    ):
-                        possibilities.append(field_at_diag)
-        elif piece.type == ChessPiece.Type.BISHOP:
-            for direction in DIAGONAL_DIRECTIONS:
-                possibilities += self.go_straight(position, direction, piece.color)
-        elif piece.type == ChessPiece.Type.ROOK:
-            for direction in CARDINAL_DIRECTIONS:
-                possibilities += self.go_straight(position, direction, piece.color)
-        elif piece.type == ChessPiece.Type.QUEEN:
-            for direction in CARDINAL_DIRECTIONS + DIAGONAL_DIRECTIONS:
-                possibilities += self.go_straight(position, direction, piece.color)
-        elif piece.type == ChessPiece.Type.KING:
-            for direction in CARDINAL_DIRECTIONS + DIAGONAL_DIRECTIONS:
-                next_position = position.try_add(direction)
-                if next_position and (
-                    self.board[next_position] is None
-                    or self.board[next_position].color != piece.color
-                ):
-                    possibilities.append(next_position)
-            # TODO castling
-        elif piece.type == ChessPiece.Type.KNIGHT:
-            for long in [-2, 2]:
-                for short in [-1, 1]:
-                    for direction in [(long, short), (short, long)]:
-                        next_position = position.try_add(direction)
-                        if next_position and (
-                            self.board[next_position] is None
-                            or self.board[next_position].color != piece.color
-                        ):
-                            possibilities.append(next_position)
-        # TODO do not allow the king to be in check
-        return possibilities
+        square = position.square()
+        return list({
+            ChessCoordinates.from_square(bitboard.move_to(move)): None
+            for move in self.legal_moves
+            if bitboard.move_from(move) == square
+        })
 
     def all_options(
         self, previous_choices: list[ChessCoordinates] = []
     ) -> list[ChessCoordinates] | None:
         if len(previous_choices) == 0:
-            return [
-                ChessCoordinates(coords)
-                for coords, field in self.board.all_fields()
-                if field.content is not None
-                and field.content.color == self.current_color()
-            ]
+            # Only the pieces that can move
+            return list({
+                ChessCoordinates.from_square(bitboard.move_from(move)): None
+                for move in self.legal_moves
+            })
 
         field_chosen: tuple[int, int] = previous_choices[0]
         piece_chosen = self.board[field_chosen]
@@ -243,40 +191,61 @@ class Chess(TurnBasedGame):
         assert len(previous_choices) == 2
         return None
 
-    def apply_move(self, choices: list[ChessCoordinates]) -> ChessMove:
-        # TODO: it would be more convenient if this worked on a copy of self
+    def find_move(self, choices: list[ChessCoordinates]) -> int:
+        """ The legal move for the choices. Asks for the piece to promote to if needed """
+        start, stop = choices[0].square(), choices[1].square()
+        moves = [
+            move for move in self.legal_moves
+            if bitboard.move_from(move) == start and bitboard.move_to(move) == stop
+        ]
+        if len(moves) > 1:
+            promotions = {PIECE_TYPES[bitboard.move_promotion(move)].name: move for move in moves}
+            return promotions[self.get_current_agent().text_choice(list(promotions))]
+        return moves[0]
+
+    def apply_move(self, choices: list[ChessCoordinates], move: Optional[int] = None) -> ChessMove:
+        """ Plays the move on this game. See after_move() to play it on a copy """
         starting_coords: ChessCoordinates = choices[0]
         stopping_coords: ChessCoordinates = choices[1]
-        # TODO: assert that the move is valid
+        if move is None:
+            move = self.find_move(choices)
         piece = self.board[starting_coords]
         self.board[starting_coords] = None
         assert piece.color == self.current_color()
 
+        captured_coords = stopping_coords
+        if bitboard.move_flag(move) == bitboard.EN_PASSANT:
+            captured_coords = ChessCoordinates(stopping_coords[0], starting_coords[1])
         captured = None
-        if self.board[stopping_coords] is not None:
-            captured = self.board[stopping_coords]
+        if self.board[captured_coords] is not None:
+            captured = self.board[captured_coords]
             assert captured.color != self.current_color()
+            self.board[captured_coords] = None
             self.captured.append(captured)
 
+        if bitboard.move_promotion(move):
+            piece = ChessPiece(piece.color, PIECE_TYPES[bitboard.move_promotion(move)])
         self.board[stopping_coords] = piece
 
-        if (
-            piece.type == ChessPiece.Type.PAWN
-            and abs(stopping_coords[1] - starting_coords[1]) == 2
-        ):
-            self.last_field_moved_through_for_en_passant = starting_coords + (
-                0,
-                (stopping_coords[1] - starting_coords[1]) / 2,
-            )
-        else:
-            self.last_field_moved_through_for_en_passant = (
-                None  # en passant expires after one move
-            )
-
-        # TODO: pawn promotion
+        if bitboard.move_flag(move) == bitboard.CASTLE:
+            rook_from, rook_to = bitboard.CASTLING_ROOK_MOVES[stopping_coords.square()]
+            rook_from, rook_to = ChessCoordinates.from_square(rook_from), ChessCoordinates.from_square(rook_to)
+            rook = self.board[rook_from]
+            self.board[rook_from] = None
+            self.board[rook_to] = rook
 
+        self.position = self.position.play(move)
+        self.legal_moves = self.position.legal_moves()
         return ChessMove(starting_coords, stopping_coords, captured)
 
+    def after_move(self, move: int) -> "Chess":
+        """ A clone of the game, in which the move is played and the turn is over. E.g. to look ahead """
+        clone = self.clone()
+        start, stop = ChessCoordinates.from_square(bitboard.move_from(move)), ChessCoordinates.from_square(bitboard.move_to(move))
+        clone.apply_move([start, stop], move)
+        clone.totalTurn += 1
+        return clone
+
     def turn(self) -> Optional[SimpleGameSummary]:
         partial_choices = []
         while True:
@@ -296,8 +265,12 @@ class Chess(TurnBasedGame):
 
         move = self.apply_move(partial_choices)
 
-        if any([piece.type == ChessPiece.Type.KING for piece in self.captured]):
-            return SimpleGameSummary(winner=self.get_current_agent_id())
+        if not self.legal_moves:
+            if self.position.in_check():
+                return SimpleGameSummary(winner=self.get_current_agent_id())
+            return SimpleGameSummary(SimpleGameSummary.NO_WINNER)  # stalemate
+        if self.position.is_fifty_move_draw():
+            return SimpleGameSummary(SimpleGameSummary.NO_WINNER)
 
     def html(self, *args, **kwargs):
         html = super().html(*args, **kwargs)
@@ -5,7 +5,7 @@ from enum import Enum, unique, auto
 from game_anywhere.components.component import PerPlayerComponent
 
 from game_anywhere.run_game import run_game_from_cmdline
-from game_anywhere.components import PerPlayer, ComponentSlotProperty, ComponentSlot, List, Dict
+from game_anywhere.components import PerPlayer, ComponentSlotProperty, ComponentSlot, List, StableList, Dict
 from game_anywhere.core import TurnBasedGame, GameSummary, Agent
 from game_anywhere.core.agent import AgentId
 from game_anywhere.components.traditional.cards import Deck, DiscardPile
@@ -45,7 +45,7 @@ class EveryoneCanSeeItExceptMyself(ComponentSlot):
 
 
 class HanabiPerPlayerComponent(PerPlayerComponent):
-    cards = ComponentSlotProperty[List[HanabiCard]]()
+    cards = ComponentSlotProperty[StableList[HanabiCard]]()
 
 
 class Hanabi(TurnBasedGame):
@@ -69,9 +69,9 @@ class Hanabi(TurnBasedGame):
         assert len(config) == 1, "Only one configuration option allowed: number of players"
         return int(config[0]), {}
 
-    def __init__(self, agent_descriptions):
-        super().__init__(agent_descriptions=agent_descriptions)
-        self.deck = Deck(default_hanabi_deck(), shuffled=True)
+    def __init__(self, agent_descriptions, **kwargs):
+        super().__init__(agent_descriptions=agent_descriptions, **kwargs)
+        self.deck = Deck(default_hanabi_deck(), shuffled=True, rng=self.random)
         self.nb_hints = self.MAX_HINTS
         self.nb_lives = 3
         self.stacks = Dict[Color, List]()
@@ -82,7 +82,7 @@ class Hanabi(TurnBasedGame):
         assert 2 <= nb_players <= 5, "Hanabi can be played only between 2 and 5 players"
         CARDS_PER_PLAYER = 5 if nb_players <= 3 else 4
         for i, player in enumerate(self.players):
-            player.cards = List(self.deck.draw(CARDS_PER_PLAYER), slotClass=EveryoneCanSeeItExceptMyself, owner_id=i)
+            player.cards = StableList(self.deck.draw(CARDS_PER_PLAYER), slotClass=EveryoneCanSeeItExceptMyself, owner_id=i)
 
     def turn(self) -> Union['Hanabi.Summary', None]:
         options = ['Place card', 'Cycle card']
@@ -90,10 +90,11 @@ class Hanabi(TurnBasedGame):
             options.append('Give hint')
         choice = self.get_current_agent().text_choice(options)
         if choice == 'Place card':
-            card = self.get_current_agent().choose_one_component_slot(
+            card_slot = self.get_current_agent().choose_one_component_slot(
                 [slot for _, slot in self.players[self.get_current_agent_index()].cards.get_slots()]
-            ).content
-            self.players[self.get_current_agent_index()].cards.remove(card)
+            )
+            card = card_slot.content
+            self.players[self.get_current_agent_index()].cards.remove_slot(card_slot)
             if card.color not in self.stacks and card.value == 1:
                 self.stacks[card.color] = List([card])
             elif card.color in self.stacks and self.stacks[card.color][-1].value == card.value - 1:
@@ -102,15 +103,16 @@ class Hanabi(TurnBasedGame):
                 self.discard_pile.append(card)
                 self.nb_lives -= 1
                 if self.nb_lives == 0:
-                    return self.Summary(sum(len(stack) for stack in self.stacks))
-            self.players[self.get_current_agent_index()].cards.append(self.deck.draw())
+                    return self.Summary(sum(len(stack) for stack in self.stacks.values()))
+            self.deck.draw_into(self.players[self.get_current_agent_index()].cards)
         elif choice == 'Cycle card':
             card_slot = self.get_current_agent().choose_one_component_slot(
                 [slot for _, slot in self.players[self.get_current_agent_index()].cards.get_slots()]
             )
-            card = card_slot.take()
+            card = card_slot.content
+            self.players[self.get_current_agent_index()].cards.remove_slot(card_slot)
             self.discard_pile.append(card)
-            self.players[self.get_current_agent_index()].cards.append(self.deck.draw())
+            self.deck.draw_into(self.players[self.get_current_agent_index()].cards)
             if self.nb_hints < self.MAX_HINTS:
                 self.nb_hints += 1
         elif choice == 'Give hint':
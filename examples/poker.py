@@ -4,16 +4,41 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from game_anywhere.core import Game, GameSummary, Agent
-from game_anywhere.components import ComponentSlotProperty, PerPlayer, List
+from game_anywhere.components import Component, ComponentSlotProperty, PerPlayer, List
 from game_anywhere.components.traditional.cards import Deck, PokerCard, fiftytwo_cards
+from game_anywhere.components.traditional.poker_hands import card_index, evaluate_poker_cards, np
+from game_anywhere.components.traditional.poker_equity import Equity, equities
+from game_anywhere.ui import Html, tag
 
 from typing import Protocol, TypeVar, Callable
 from collections import defaultdict
-from itertools import combinations, cycle
+from itertools import cycle
 from abc import abstractmethod
 
 
+class EquityOverlay(Component):
+    """ The chances of each player who hasn't folded, shown to the spectators """
+    __slots__ = ("equities", "nb_samples")
+    HIDDEN_HTML = ""
+
+    def __init__(self, equities: dict[int, Equity], nb_samples: int):
+        super().__init__()
+        self.equities = equities
+        self.nb_samples = nb_samples
+
+    def html(self, viewer_id=None) -> Html:
+        return tag.div(
+            *(tag.div(f"Player {i + 1}: {equity} (win {equity.win:.1%}, tie {equity.tie:.1%})")
+              for i, equity in self.equities.items()),
+            tag.div(f"{self.nb_samples} samples"),
+            **{"class": "equities"},
+        )
+
+
 class Poker(Game):
+    # Time given to the equity computations, so that they don't stall the game
+    EQUITY_TIME_LIMIT = 0.02
+
     class EveryoneFolds(Exception):
         def __init__(self, winner_index: int):
             self.winner_index = winner_index
@@ -30,6 +55,8 @@ class Poker(Game):
 
     deck = ComponentSlotProperty()
     revealed_cards = ComponentSlotProperty()
+    # Hidden, without an owner: only the spectators see it
+    equity_overlay = ComponentSlotProperty(hidden=True)
     players = PerPlayer(
         hand=ComponentSlotProperty(),
         bet=ComponentSlotProperty(),
@@ -38,7 +65,7 @@ class Poker(Game):
 
     def __init__(self, agent_descriptions, *args, small_blind=1, big_blind=2, **kwargs):
         super().__init__(agent_descriptions, *args, **kwargs)
-        self.deck = Deck(fiftytwo_cards(), shuffled=True)
+        self.deck = Deck(fiftytwo_cards(), shuffled=True, rng=self.random)
         self.revealed_cards : List[PokerCard] = List()
         self.big_blind = big_blind
         self.small_blind = small_blind
@@ -50,30 +77,30 @@ class Poker(Game):
 
     # override
     def play_game(self) -> GameSummary:
-        for player in self.players:
-            player.hand += self.deck.draw(2)
+        self.deck.deal([player.hand for player in self.players], 2)
+        self.update_equities()
 
         try:
             self.betting_round(force_blinds=[self.small_blind, self.big_blind])
             # no need to burn cards
-            self.revealed_cards.extend(
-                self.deck.draw() for _ in range(3)
-            )  # TODO: OPTIM: add a draw_multiple function
+            self.deck.draw_into(self.revealed_cards, 3)
+            self.update_equities()
             self.betting_round()
-            self.revealed_cards.append(self.deck.draw())
+            self.deck.draw_into(self.revealed_cards)
+            self.update_equities()
             self.betting_round()
-            self.revealed_cards.append(self.deck.draw())
+            self.deck.draw_into(self.revealed_cards)
+            self.update_equities()
         except Poker.EveryoneFolds as win:
             return self.win_game(win.winner_index)
 
         best_hand = None
         best_hand_index = -1
+        revealed_cards = list(self.revealed_cards)
         for i, player in enumerate(self.players):
             if not player.folded:
-                best_hand_for_player = max(
-                    PokerHand(cards)
-                    for cards in combinations(list(self.revealed_cards) + list(player.hand), 5)
-                )
+                # Same result as max(PokerHand(cards) for cards in combinations(..., 5)), but much faster
+                best_hand_for_player = evaluate_poker_cards(revealed_cards + list(player.hand))
                 if best_hand is None or best_hand < best_hand_for_player:
                     best_hand = best_hand_for_player
                     best_hand_index = i
@@ -109,6 +136,7 @@ class Poker(Game):
 
             if decision == "fold":
                 self.players[turn_counter].folded = True
+                self.update_equities()
                 if sum(not player.folded for player in self.players) == 1:
                     # TODO this is ugly. Is there no find_first function in Python?
                     last_remaining_player = next(
@@ -130,6 +158,31 @@ class Poker(Game):
     def win_game(self, player_index) -> "Poker.PokerSummary":
         return Poker.PokerSummary(player_index)
 
+    def compute_equities(self, time_limit: float = EQUITY_TIME_LIMIT) -> tuple[dict[int, Equity], int]:
+        """ The equity of every player who hasn't folded, knowing all hands. Needs numpy """
+        remaining_players = [i for i, player in enumerate(self.players) if not player.folded]
+        hands = [[card_index(card) for card in self.players[i].hand] for i in remaining_players]
+        board = [card_index(card) for card in self.revealed_cards]
+        player_equities, nb_samples = equities(hands, board, time_limit=time_limit)
+        return dict(zip(remaining_players, player_equities)), nb_samples
+
+    def estimate_equity(self, player_index: int, time_limit: float = EQUITY_TIME_LIMIT) -> Equity:
+        """
+        The equity of a player, from what they know: their own hand, the revealed cards and the number of opponents.
+        A cheap signal for bots. Needs numpy
+        """
+        hands = [[card_index(card) for card in self.players[player_index].hand]]
+        hands += [None for i, player in enumerate(self.players) if not player.folded and i != player_index]
+        board = [card_index(card) for card in self.revealed_cards]
+        return equities(hands, board, time_limit=time_limit)[0][0]
+
+    def update_equities(self) -> None:
+        """ Only while someone can see the overlay: it takes EQUITY_TIME_LIMIT, on every deal, fold and street """
+        if np is not None and not self.headless and None in self.get_update_recipients():
+            self.equity_overlay = EquityOverlay(*self.compute_equities())
+        elif self.equity_overlay is not None:
+            self.equity_overlay = None  # out of date, a spectator who comes later must not see it
+
 
 # Copied from https://gist.github.com/pawelrubin/a394702e4029809f30515621fc41ab1f
 
@@ -169,12 +222,22 @@ hand_value_names_ranked = [
 ]
 
 
+def rank(value: PokerCard.Value) -> int:
+    """ Aces are high in poker """
+    return 14 if value == PokerCard.Value.ACE else int(value)
+
+
 class PokerHand:
+    """
+    A readable implementation of the poker hand rules, for 5 cards.
+    Games should use poker_hands.evaluate_hand(), which gives the same ranking much faster.
+    """
     def __init__(self, cards: list[PokerCard]):
         self.cards = list(cards)
         self.cards.sort(
-            key=lambda card: card.value
+            key=lambda card: rank(card.value), reverse=True
         )  # already sorting by value because it will be useful for most algorithms
+        self.ranks = [rank(card.value) for card in self.cards]
         self.values = self.cards_by_value()
 
         for i, hand_value_name in sorted(
@@ -198,43 +261,43 @@ class PokerHand:
             other.hand_subvalue,
         )  # tuple comparison is so convenient
 
+    def __eq__(self, other: "PokerHand") -> bool:
+        return (self.hand_value, self.hand_subvalue) == (other.hand_value, other.hand_subvalue)
+
     @hand_value
-    def is_flush(self) -> list[PokerCard.Value] | None:
-        cards_by_color = sorted(self.cards, key=lambda card: card.color)
-        if cards_by_color[0].color == cards_by_color[4].color:
-            return list(card.value for card in self.cards)
+    def is_flush(self) -> list[int] | None:
+        if all(card.color == self.cards[0].color for card in self.cards):
+            return self.ranks
         else:
             return None
 
     @hand_value
-    def is_straight(self) -> PokerCard.Value | None:
-        if self.cards[4].value == int(self.cards[0].value) + 4:
-            return self.cards[4]
-        elif (
-            self.cards[0] == PokerCard.Value.ACE
-            and self.cards[1] == 10
-            and self.cards[4] == PokerCard.Value.KING
-        ):
-            # special case for royal straight because aces have technically the value 1
-            return PokerCard.Value.ACE
+    def is_straight(self) -> int | None:
+        if len(set(self.ranks)) != 5:
+            return None
+        if self.ranks[0] == self.ranks[4] + 4:
+            return self.ranks[0]
+        elif self.ranks == [14, 5, 4, 3, 2]:
+            # special case for the lowest straight, where the ace counts as 1
+            return 5
         else:
             return None
 
     @hand_value
-    def is_straight_flush(self) -> PokerCard.Value | None:
+    def is_straight_flush(self) -> int | None:
         if self.is_flush():
             return self.is_straight()
         # return self.flush() and self.straight() # shorter, but less explicit
 
     @hand_value
-    def is_four_of_a_kind(self) -> tuple[PokerCard.Value, PokerCard.Value] | None:
+    def is_four_of_a_kind(self) -> tuple[int, int] | None:
         if self.values[0][0] == 4:
             return self.values[0][1], self.values[1][1]
         else:
             return None
 
     @hand_value
-    def is_full_house(self) -> tuple[PokerCard.Value, PokerCard.Value] | None:
+    def is_full_house(self) -> tuple[int, int] | None:
         if self.values[0][0] == 3 and self.values[1][0] == 2:
             return self.values[0][1], self.values[1][1]
         else:
@@ -243,7 +306,7 @@ class PokerHand:
     @hand_value
     def is_three_of_a_kind(
         self,
-    ) -> tuple[PokerCard.Value, PokerCard.Value, PokerCard.Value] | None:
+    ) -> tuple[int, int, int] | None:
         if self.values[0][0] == 3:
             return tuple(value[1] for value in self.values)
         else:
@@ -252,7 +315,7 @@ class PokerHand:
     @hand_value
     def is_two_pairs(
         self,
-    ) -> tuple[PokerCard.Value, PokerCard.Value, PokerCard.Value] | None:
+    ) -> tuple[int, int, int] | None:
         if self.values[0][0] == 2 and self.values[1][0] == 2:
             return tuple(value[1] for value in self.values)
         else:
@@ -262,7 +325,7 @@ class PokerHand:
     def is_pair(
         self,
     ) -> (
-        tuple[PokerCard.Value, PokerCard.Value, PokerCard.Value, PokerCard.Value] | None
+        tuple[int, int, int, int] | None
     ):
         if self.values[0][0] == 2:
             return tuple(value[1] for value in self.values)
@@ -270,16 +333,16 @@ class PokerHand:
             return None
 
     @hand_value
-    def high_card(self) -> list[PokerCard.Value]:
-        return [card.value for card in self.cards]
+    def high_card(self) -> list[int]:
+        return self.ranks
 
-    def cards_by_value(self) -> list[tuple[int, PokerCard.Value]]:
+    def cards_by_value(self) -> list[tuple[int, int]]:
         cards_by_value = defaultdict(int)
-        for card in self.cards:
-            cards_by_value[card.value] += 1
+        for card_rank in self.ranks:
+            cards_by_value[card_rank] += 1
         return sorted(
-            (number, value) for value, number in cards_by_value.items()
-        )  # sorted first by number of cards, and then by card value
+            ((number, card_rank) for card_rank, number in cards_by_value.items()), reverse=True
+        )  # sorted first by number of cards, and then by card value, most important first
 
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ sys.path.append(str(PROJECT_ROOT))
 
 import argparse
 from game_anywhere.network.http_controlled_server import HttpControlledServer
+from game_anywhere.network.supervisor import Supervisor
 from game_anywhere.network.router import heartbeat
 from aiohttp import web, http
 from chess import Chess
@@ -14,10 +15,6 @@ from poker import Poker
 from werewolves import Werewolves
 from hanabi import Hanabi
 
-parser = argparse.ArgumentParser()
-parser.add_argument("-p", "--port", default=8080, dest="port", type=int)
-args = parser.parse_args()
-
 available_games = {
     "TicTacToe": TicTacToe,
     "Chess": Chess,
@@ -26,10 +23,22 @@ available_games = {
     "Hanabi": Hanabi,
 }
 
-# fmt: off
-HttpControlledServer(available_games)\
-    .add_client(heartbeat)\
-    .add_client(web.static('/web', PROJECT_ROOT / 'client'))\
-    .add_client(web.get('/', lambda request: web.Response(status=http.HTTPStatus.PERMANENT_REDIRECT, headers={'Location': '/web/index.html'}))) \
-    .nt_start(port=args.port, print=lambda message:print(message.replace("0.0.0.0", "localhost")))
-# fmt: on
+if __name__ == "__main__":  # the worker processes of a Supervisor might import this module
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-p", "--port", default=8080, dest="port", type=int)
+    parser.add_argument("--replay-directory", help="record every game in this directory")
+    parser.add_argument("--workers", default=1, type=int, help="number of processes that host the rooms")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        server = Supervisor(available_games, args.workers, first_worker_port=args.port + 1,
+                            replay_directory=args.replay_directory)
+    else:
+        server = HttpControlledServer(available_games, replay_directory=args.replay_directory)
+    # fmt: off
+    server\
+        .add_client(heartbeat)\
+        .add_client(web.static('/web', PROJECT_ROOT / 'client'))\
+        .add_client(web.get('/', lambda request: web.Response(status=http.HTTPStatus.PERMANENT_REDIRECT, headers={'Location': '/web/index.html'}))) \
+        .nt_start(port=args.port, print=lambda message:print(message.replace("0.0.0.0", "localhost")))
+    # fmt: on
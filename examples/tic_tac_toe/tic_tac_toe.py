@@ -1,7 +1,7 @@
 from typing import Union
 
 from game_anywhere.core.game import AgentId
-from game_anywhere.core import TurnBasedGame, SimpleGameSummary
+from game_anywhere.core import AsyncTurnBasedGame, SimpleGameSummary
 from game_anywhere.components import Component, CheckerBoard, ComponentSlotProperty
 
 
@@ -32,7 +32,7 @@ def hasRow(
     return True
 
 
-class TicTacToe(TurnBasedGame):
+class TicTacToe(AsyncTurnBasedGame):
     SummaryType = SimpleGameSummary
 
     board = ComponentSlotProperty[CheckerBoard]()
@@ -41,14 +41,14 @@ class TicTacToe(TurnBasedGame):
         super().__init__(*args, **kwargs)
         self.board = CheckerBoard(BOARD_SIZE, BOARD_SIZE)
 
-    def turn(self) -> Union[None, SimpleGameSummary]:
+    async def turn(self) -> Union[None, SimpleGameSummary]:
         TOTAL_MOVES = self.board.get_size()
 
         if self.get_current_turn() == TOTAL_MOVES:
             return SimpleGameSummary(SimpleGameSummary.NO_WINNER)
 
         fields = [field for _, field in self.board.all_fields() if field.empty()]
-        field = self.get_current_agent().choose_one_component_slot(fields, fields)
+        field = await self.get_current_agent().choose_one_component_slot(fields, fields)
         field.content = TicTacToeMark(self.get_current_agent_index())
 
         # check rows
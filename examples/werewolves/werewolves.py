@@ -6,7 +6,6 @@ from game_anywhere.components.component import PerPlayer, PerPlayerComponent, Po
 from game_anywhere.agents.chat import Chat
 
 from enum import Enum, unique, auto
-from random import shuffle
 from collections import Counter
 from abc import abstractmethod
 from typing import TypeVar, Iterable, Literal
@@ -94,18 +93,19 @@ class Werewolves(Game):
     mayor = ComponentSlotProperty(slotType=Pointer)
 
     @classmethod
-    def parse_config(cls, config: list[str]) -> dict[Literal['all_roles'], list[type[Role]]]:
-        return {'all_roles': [Role.all[rolename] for rolename in config]}
+    def parse_config(cls, config: list[str]) -> tuple[int, dict[Literal['all_roles'], list[type[Role]]]]:
+        """ One role name per player """
+        return len(config), {'all_roles': [Role.all[rolename] for rolename in config]}
 
-    def __init__(self, agent_descriptions, all_roles: list[type[Role]]):
-        super().__init__(agent_descriptions, nb_agents=len(all_roles))
+    def __init__(self, agent_descriptions, all_roles: list[type[Role]], **kwargs):
+        super().__init__(agent_descriptions, **kwargs)
         self.werewolf_kill: Player|None = None
         self.other_kills: list[Player] = []
         self.lovers: tuple[Player,Player]|None = None
-        self.all_roles = all_roles
+        self.all_roles = list(all_roles)  # shuffled below, the argument is still the configuration of the game
         self.players: list[Player] = PerPlayer.INIT(agent_descriptions)  # type: ignore
         # and now we can also distribute the roles
-        shuffle(self.all_roles)
+        self.random.shuffle(self.all_roles)
         for player, roleType in zip(self.players, self.all_roles):
             player.role = roleType()
 
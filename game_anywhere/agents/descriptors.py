@@ -2,6 +2,7 @@ from game_anywhere.core.agent import Agent
 from abc import abstractmethod, ABC
 from typing import Any, TypeVar, Type, Generic
 from contextlib import ExitStack
+import asyncio
 
 AgentPromise = Any
 
@@ -22,6 +23,10 @@ class AgentDescriptor(ABC):
     @abstractmethod
     def await_initialization(self, promise: AgentPromise) -> Agent: ...
 
+    async def await_initialization_async(self, promise: AgentPromise) -> "Agent | AsyncAgent":
+        """ Waits on the event loop of the server instead of blocking it. Override this to return an AsyncAgent """
+        return await asyncio.to_thread(self.await_initialization, promise)
+
     def resolve_name(self, name: str):
         self.name = name
 
@@ -38,6 +43,8 @@ class GameDescriptor(Generic[GameType]):
         self.agents_descriptors = agents_descriptors
         self.game_args = game_args
         self.game_kwargs = game_kwargs
+        # The command-line configuration the game was created from, if any. Written to replay logs
+        self.config: list[str] = []
 
     def start_initialization(self, context) -> list[AgentPromise]:
         return [
@@ -51,6 +58,12 @@ class GameDescriptor(Generic[GameType]):
             for i, agent in enumerate(self.agents_descriptors)
         ]
 
+    async def await_initialization_async(self, promises: list[AgentPromise]) -> list["Agent | AsyncAgent"]:
+        return list(await asyncio.gather(*[
+            agent.await_initialization_async(promises[i])
+            for i, agent in enumerate(self.agents_descriptors)
+        ]))
+
     def create_agents(self, context) -> list[Agent]:
         promises = self.start_initialization(context)
         agents = self.await_initialization(promises)
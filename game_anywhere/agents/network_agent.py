@@ -1,4 +1,5 @@
-from game_anywhere.core import Agent
+from game_anywhere.components import Component
+from game_anywhere.core import Agent, AsyncAgent
 from game_anywhere.components.utils import html
 from game_anywhere.core.agent import ChatStream
 
@@ -15,6 +16,11 @@ T = TypeVar("T")
 Json = Any
 
 class JsonSchemaAgentMixin(ABC):
+    """
+    The choices, as questions sent to the client with the validation of the answer.
+    question_with_validation() is a coroutine in AsyncNetworkAgent, so that the choices are coroutines too.
+    """
+
     class InvalidAnswer(Exception):
         def __init__(self, message):
             super().__init__()
@@ -48,54 +54,6 @@ class JsonSchemaAgentMixin(ABC):
             {"type": "choice", "schema": jsonSchema}, _validation
         )
 
-
-class NetworkAgent(JsonSchemaAgentMixin, Agent):
-    class Descriptor(AgentDescriptor):
-        def start_initialization(self, agent_id: "AgentId", context: Context):
-            if "server_room" not in context:
-                if Server._instance is None:
-                    server = Server(RoomClass=BaseGameRoom)
-                    context["server"] = server
-                    context["exit_stack"].enter_context(server)
-                else:
-                    server = context["server"]
-                if "game" in context:
-                    _room_id, room = server.new_room(
-                        BaseGameRoom(game=context["game"], server=server)
-                    )
-                else:
-                    _room_id, room = server.new_room()
-                context["server_room"] = room
-                # context['exit_stack'].enter_context(room)
-            else:
-                room = context["server_room"]
-            session = room.create_session(agent_id)
-            return session
-
-        def await_initialization(self, session):
-            session.reconnect_sync()
-            self.resolve_name(session.room.session_id_to_username[session.id])
-            return NetworkAgent(session)
-
-    def __init__(self, session: Session):
-        username = session.room.session_id_to_username[session.id]
-        super().__init__(username)
-        self.session = session
-
-    # override
-    def message(self, message, **kwargs) -> None:
-        self.session.send_sync({"type": "message", "text": message, **kwargs})
-
-    # override
-    def update(self, diffs: list[Any]):
-        def serialize_diff(diff: dict):
-            if diff["op"] in ["add", "update"]:
-                diff = diff.copy()
-                diff["value"] = str(diff["value"])
-            return diff
-
-        self.session.send_sync(list(map(serialize_diff, diffs)))
-
     # override
     def choose_one_component_slot(
         self,
@@ -106,22 +64,41 @@ class NetworkAgent(JsonSchemaAgentMixin, Agent):
     ) -> T:
         if not indices:
             indices = slots
+        addresses = [slot.get_address() for slot in slots]
         question = {
             "type": "choice",
-            "slots": [slot.get_address() for slot in slots],
+            "slots": addresses,
             "special_options": special_options,
         }
         if message is not None:
             question["message"] = message
-        ids = {slot.get_address(): index for slot, index in zip(slots, indices)}
+        try:
+            game = slots[0].get_game() if slots else None
+        except Component.NotAttachedToComponentTree:
+            game = None
+        not_an_option = object()
+        if game is not None and game._slots_by_address is not None:
+            # the game indexes its slots, see Game.index_slot_addresses(): only the slot of the answer is looked for
+            def resolve(answer: str):
+                slot = game.get_slot_by_address(answer)
+                try:
+                    return indices[slots.index(slot)] if slot is not None else not_an_option
+                except ValueError:
+                    return not_an_option
+        else:
+            ids = dict(zip(addresses, indices))
+
+            def resolve(answer: str):
+                return ids.get(answer, not_an_option)
 
         def _validation(answer: str):
-            if answer in ids:
-                return ids[answer]
+            value = resolve(answer)
+            if value is not not_an_option:
+                return value
             elif answer in special_options:
                 return answer
             else:
-                raise NetworkAgent.InvalidAnswer("Invalid choice, please try again!")
+                raise self.InvalidAnswer("Invalid choice, please try again!")
 
         return self.question_with_validation(question, _validation)
 
@@ -134,7 +111,7 @@ class NetworkAgent(JsonSchemaAgentMixin, Agent):
             answer = answer[1:-1]
 
             if answer not in options:
-                raise NetworkAgent.InvalidAnswer(f"value {answer} not allowed")
+                raise self.InvalidAnswer(f"value {answer} not allowed")
             return answer
 
         return self.question_with_validation(
@@ -153,6 +130,55 @@ class NetworkAgent(JsonSchemaAgentMixin, Agent):
             {"type": "choice", "schema": query}, _validation
         )
 
+
+class NetworkAgent(JsonSchemaAgentMixin, Agent):
+    class Descriptor(AgentDescriptor):
+        def start_initialization(self, agent_id: "AgentId", context: Context):
+            if "server_room" not in context:
+                if Server._instance is None:
+                    server = Server(RoomClass=BaseGameRoom)
+                    context["server"] = server
+                    context["exit_stack"].enter_context(server)
+                else:
+                    server = context["server"]
+                if "game" in context:
+                    _room_id, room = server.new_room(
+                        BaseGameRoom(game=context["game"], server=server)
+                    )
+                else:
+                    _room_id, room = server.new_room()
+                context["server_room"] = room
+                # context['exit_stack'].enter_context(room)
+            else:
+                room = context["server_room"]
+            session = room.create_session(agent_id)
+            return session
+
+        def await_initialization(self, session):
+            session.reconnect_sync()
+            self.resolve_name(session.room.session_id_to_username[session.id])
+            return NetworkAgent(session)
+
+        # override
+        async def await_initialization_async(self, session):
+            await session.reconnect()
+            self.resolve_name(session.room.session_id_to_username[session.id])
+            return AsyncNetworkAgent(session)
+
+    def __init__(self, session: Session):
+        username = session.room.session_id_to_username[session.id]
+        super().__init__(username)
+        self.session = session
+
+    # override
+    def message(self, message, **kwargs) -> None:
+        self.session.send_sync({"type": "message", "text": message, **kwargs})
+
+    # override
+    def update(self, diffs: list[Any]):
+        # the values are already strings, and the diffs are serialized on the network thread, as JSON or binary
+        self.session.send_sync(diffs)
+
     def question_with_validation(
         self, question: Any, validation: Callable[[str], T]
     ) -> T:
@@ -172,6 +198,42 @@ class NetworkAgent(JsonSchemaAgentMixin, Agent):
         return NetworkChatStream(event_loop, self.session)
 
 
+class AsyncNetworkAgent(JsonSchemaAgentMixin, AsyncAgent):
+    """ A NetworkAgent for games played on the network thread, see AsyncGame. Its methods must be called there """
+
+    def __init__(self, session: Session):
+        username = session.room.session_id_to_username[session.id]
+        super().__init__(username)
+        self.session = session
+
+    # override
+    def message(self, message, **kwargs) -> None:
+        self.session.send_nowait({"type": "message", "text": message, **kwargs})
+
+    # override
+    def update(self, diffs: list[Any]):
+        self.session.send_nowait(diffs)
+
+    async def question_with_validation(
+        self, question: Any, validation: Callable[[str], T]
+    ) -> T:
+        while True:
+            self.session.send_nowait(question)
+            answer = await self.session.get()
+            if answer == Session.CLIENT_LOST_TRACK_MESSAGE:
+                continue  # resend question
+            try:
+                answer = validation(answer)
+            except AsyncNetworkAgent.InvalidAnswer as err:
+                self.session.send_nowait({"type": "error", "message": err.message})
+                continue
+            return answer
+
+    # override
+    def chat_stream(self, event_loop: asyncio.AbstractEventLoop) -> ChatStream:
+        return NetworkChatStream(event_loop, self.session)
+
+
 class NetworkChatStream(ChatStream):
     CHAT_CHARACTER = '<'
 
@@ -31,4 +31,6 @@ def parse_game_descriptor(
         agent_descriptions = [parse_agent_description(agent) for agent in obj["agents"]]
     else:
         agent_descriptions = [parse_agent_description(obj["agents"]) for _ in range(nb_players)]
-    return GameDescriptor(GameType, agent_descriptions, **args)
+    descriptor = GameDescriptor(GameType, agent_descriptions, **args)
+    descriptor.config = cmdline
+    return descriptor
@@ -0,0 +1,477 @@
+from game_anywhere.core import Agent, AsyncAgent
+from game_anywhere.core.agent import ChatStream
+from game_anywhere.core.game import coalesce_diffs
+from .descriptors import AgentDescriptor
+from array import array
+from enum import Enum
+from typing import Any, Iterable, Iterator, Optional, TypeVar, Union
+import asyncio
+import importlib
+import json
+import mmap
+import struct
+import zlib
+
+T = TypeVar("T")
+U = TypeVar("U")
+Json = Any
+
+
+class ReplayLog:
+    """
+    Append-only log of a game, one JSON document per line.
+    The first line says how to create the game again: its type, command-line configuration, seed and agent names,
+    and the arguments the game was actually created with (see encode_game_argument()).
+    Each of the following lines is an answer of an agent: [agent_id, kind, value].
+    Since all randomness of a game comes from its seed (see Game.random), this is enough to replay it.
+    If an archive path is given, the spectators' view of the game is also written there, see ReplayArchive.
+    """
+
+    def __init__(self, path: str, archive_path: str | None = None):
+        self.path = path
+        self.archive_path = archive_path
+        self.file = None
+        self.archive: Optional[ReplayArchive.Writer] = None
+
+    def write_header(
+        self, game: "Game", config: list[str], agent_names: list[str],
+        game_args: Iterable = (), game_kwargs: dict[str, Any] | None = None,
+    ):
+        """
+        game_args and game_kwargs are those of the game's GameDescriptor, so they include its parsed command-line
+        configuration: they are all replay_game() needs, the configuration is written for reference.
+        The seed is written on its own.
+        """
+        header = {
+            "game": type_name(type(game)),
+            "config": config,
+            "seed": game.seed,
+            "agents": agent_names,
+            "args": [encode_game_argument(arg) for arg in game_args],
+            "kwargs": {key: encode_game_argument(value) for key, value in (game_kwargs or {}).items() if key != "seed"},
+        }
+        self.file = open(self.path, "w")
+        if self.archive_path is not None:
+            self.archive = ReplayArchive.Writer(self.archive_path, game)
+        self._write(header)
+
+    def record(self, agent_id: "AgentId", kind: str, value: Json):
+        if self.archive is not None:
+            self.archive.end_turn()
+        self._write([agent_id, kind, value])
+
+    def _write(self, obj: Json):
+        # one line at a time, so that the log is usable even if the server crashes
+        self.file.write(json.dumps(obj, separators=(",", ":")) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.archive is not None:
+            self.archive.close()
+
+    @staticmethod
+    def read(path: str) -> tuple[dict[str, Json], list[tuple["AgentId", str, Json]]]:
+        with open(path) as file:
+            header = json.loads(file.readline())
+            return header, [tuple(json.loads(line)) for line in file if line.strip()]
+
+
+class ReplayArchive:
+    """
+    The spectators' view of a recorded game, that can be read at any turn without replaying the game.
+    Turn N is the state of the game when its N-th answer was given, the last turn is the end of the game.
+    Each turn is a frame: a zlib-compressed JSON list of diffs. Every keyframe_interval turns, the frame is a keyframe,
+    i.e. a replace of the whole game (key ""), the other frames are the diffs since the previous turn.
+    An index at the end of the file gives the offset of every frame, so reading turn N reads one keyframe and
+    fewer than keyframe_interval diffs. The file is memory-mapped, only these frames are actually read.
+    """
+
+    MAGIC = b"GAREPLAY"
+    # index offset, number of turns, keyframe interval, MAGIC
+    FOOTER = struct.Struct("<QQI8s")
+    KEYFRAME_INTERVAL = 32
+
+    class Corrupted(Exception):
+        pass
+
+    class Writer:
+        """ Writes the archive while the game is played, see ReplayLog """
+
+        def __init__(self, path: str, game: "Game", keyframe_interval: int | None = None):
+            self.path = path
+            self.game = game
+            self.keyframe_interval = keyframe_interval or ReplayArchive.KEYFRAME_INTERVAL
+            self.file = open(path, "wb")
+            self.file.write(ReplayArchive.MAGIC)
+            # offsets[i] is the start of frame i, offsets[-1] the end of the last frame
+            self.offsets = [len(ReplayArchive.MAGIC)]
+            game.spectator_updates = []
+
+        def end_turn(self):
+            turn = len(self.offsets) - 1
+            if turn % self.keyframe_interval == 0:
+                diffs = [{"op": "replace", "key": "", "value": str(self.game.html())}]
+            else:
+                diffs = coalesce_diffs(self.game.spectator_updates)
+            self.game.spectator_updates.clear()
+            frame = zlib.compress(json.dumps(diffs, separators=(",", ":")).encode())
+            self.file.write(frame)
+            self.file.flush()  # readers can see the frame as soon as it is in the index
+            self.offsets.append(self.offsets[-1] + len(frame))
+
+        def close(self):
+            if self.file is None:
+                return
+            self.end_turn()  # the end of the game
+            self.game.spectator_updates = None
+            self.file.write(array("Q", self.offsets).tobytes())
+            self.file.write(ReplayArchive.FOOTER.pack(
+                self.offsets[-1], len(self.offsets) - 1, self.keyframe_interval, ReplayArchive.MAGIC
+            ))
+            self.file.close()
+            self.file = None
+
+        def open(self) -> "ReplayArchive":
+            """ Opens the turns written so far for reading, e.g. from another thread while the game goes on """
+            if self.file is None:
+                return ReplayArchive(self.path)
+            return ReplayArchive(self.path, self.offsets[:], self.keyframe_interval)
+
+    def __init__(self, path: str, offsets: list[int] | None = None, keyframe_interval: int | None = None):
+        """ The offsets and keyframe interval are read from the file, unless it is still being written """
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if offsets is None:
+            index_offset, nb_turns, keyframe_interval, magic = ReplayArchive.FOOTER.unpack_from(
+                self.map, len(self.map) - ReplayArchive.FOOTER.size
+            )
+            if magic != ReplayArchive.MAGIC or self.map[:len(magic)] != magic:
+                raise ReplayArchive.Corrupted(path)
+            offsets = array("Q")
+            offsets.frombytes(self.map[index_offset:index_offset + 8 * (nb_turns + 1)])
+        self.offsets = offsets
+        self.keyframe_interval = keyframe_interval
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def read(self, turn: int) -> Iterable[bytes]:
+        """ The frames needed to show this turn, as JSON: the keyframe before it, and the diffs until it """
+        if not 0 <= turn < len(self):
+            raise IndexError(turn)
+        for i in range(turn - turn % self.keyframe_interval, turn + 1):
+            yield zlib.decompress(self.map[self.offsets[i]:self.offsets[i + 1]])
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self) -> "ReplayArchive":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class RecordingAgent(Agent):
+    """ Forwards everything to another agent, and writes its answers to a ReplayLog """
+
+    def __init__(self, agent: Agent, agent_id: "AgentId", log: ReplayLog):
+        super().__init__(agent.name)
+        self.agent = agent
+        self.agent_id = agent_id
+        self.log = log
+
+    # override
+    def message(self, message: str, **kwargs) -> None:
+        self.agent.message(message, **kwargs)
+
+    # override
+    def update(self, diff: list[Any]):
+        self.agent.update(diff)
+
+    # override
+    def query(self, allowedSchema):
+        answer = self.agent.query(allowedSchema)
+        self.log.record(self.agent_id, "query", answer)
+        return answer
+
+    # override
+    def choose_one_component_slot(
+        self,
+        slots: list["ComponentSlot"],
+        indices: Optional[list[T]] = None,
+        special_options: list[U] = [],
+        message: str|None = None,
+    ) -> Union[T, U]:
+        kwargs = {} if message is None else {"message": message}  # not all agents accept a message
+        answer = self.agent.choose_one_component_slot(slots, indices, special_options, **kwargs)
+        self.log.record(self.agent_id, "slot", self.option_position([*(indices or slots), *special_options], answer))
+        return answer
+
+    # override
+    def text_choice(self, options: list[str]) -> str:
+        answer = self.agent.text_choice(options)
+        self.log.record(self.agent_id, "text", answer)
+        return answer
+
+    # override
+    def int_choice(self, min: int | None = 0, max: int | None = None) -> int:
+        answer = self.agent.int_choice(min, max)
+        self.log.record(self.agent_id, "int", answer)
+        return answer
+
+    # override
+    def get_2D_choice(self, dimensions: tuple[int, int]):
+        answer = self.agent.get_2D_choice(dimensions)
+        self.log.record(self.agent_id, "2D", list(answer))
+        return answer
+
+    # override
+    def chat_stream(self, event_loop: asyncio.AbstractEventLoop) -> ChatStream:
+        return self.agent.chat_stream(event_loop)
+
+    @staticmethod
+    def option_position(options: list, answer) -> int:
+        """ The slots can't be written to the log, but their position in the options can """
+        position = next((i for i, option in enumerate(options) if option is answer), None)
+        if position is None:
+            position = options.index(answer)
+        return position
+
+
+class AsyncRecordingAgent(AsyncAgent):
+    """ A RecordingAgent for an AsyncAgent. The log is the same """
+
+    def __init__(self, agent: AsyncAgent, agent_id: "AgentId", log: ReplayLog):
+        super().__init__(agent.name)
+        self.agent = agent
+        self.agent_id = agent_id
+        self.log = log
+
+    # override
+    def message(self, message: str, **kwargs) -> None:
+        self.agent.message(message, **kwargs)
+
+    # override
+    def update(self, diff: list[Any]):
+        self.agent.update(diff)
+
+    # override
+    async def query(self, allowedSchema):
+        answer = await self.agent.query(allowedSchema)
+        self.log.record(self.agent_id, "query", answer)
+        return answer
+
+    # override
+    async def choose_one_component_slot(
+        self,
+        slots: list["ComponentSlot"],
+        indices: Optional[list[T]] = None,
+        special_options: list[U] = [],
+        message: str|None = None,
+    ) -> Union[T, U]:
+        answer = await self.agent.choose_one_component_slot(slots, indices, special_options, message)
+        options = [*(indices or slots), *special_options]
+        self.log.record(self.agent_id, "slot", RecordingAgent.option_position(options, answer))
+        return answer
+
+    # override
+    async def text_choice(self, options: list[str]) -> str:
+        answer = await self.agent.text_choice(options)
+        self.log.record(self.agent_id, "text", answer)
+        return answer
+
+    # override
+    async def int_choice(self, min: int | None = 0, max: int | None = None) -> int:
+        answer = await self.agent.int_choice(min, max)
+        self.log.record(self.agent_id, "int", answer)
+        return answer
+
+    # override
+    async def get_2D_choice(self, dimensions: tuple[int, int]):
+        answer = await self.agent.get_2D_choice(dimensions)
+        self.log.record(self.agent_id, "2D", list(answer))
+        return answer
+
+    # override
+    def chat_stream(self, event_loop: asyncio.AbstractEventLoop) -> ChatStream:
+        return self.agent.chat_stream(event_loop)
+
+
+class SilentChatStream(ChatStream):
+    async def __anext__(self) -> str:
+        await asyncio.Event().wait()  # never returns, until the chat is closed
+
+    def close(self):
+        pass
+
+
+class ReplayAgent(Agent):
+    """ Gives the answers read from a ReplayLog. All the ReplayAgents of a game share the same answers """
+
+    class Diverged(Exception):
+        """ The game asked a question that is not the next one in the log, e.g. because its code changed """
+        pass
+
+    class Descriptor(AgentDescriptor):
+        def __init__(self, name: str, answers: Iterator[tuple["AgentId", str, Json]]):
+            super().__init__()
+            self.resolve_name(name)
+            self.answers = answers
+
+        def start_initialization(self, id: "AgentId", context):
+            return id
+
+        def await_initialization(self, id: "AgentId") -> "ReplayAgent":
+            return ReplayAgent(self.name, id, self.answers)
+
+    def __init__(self, name: str, agent_id: "AgentId", answers: Iterator[tuple["AgentId", str, Json]]):
+        super().__init__(name)
+        self.agent_id = agent_id
+        self.answers = answers
+
+    def _next_answer(self, kind: str) -> Json:
+        try:
+            agent_id, answer_kind, value = next(self.answers)
+        except StopIteration:
+            raise ReplayAgent.Diverged(f"agent {self.agent_id} was asked a {kind} question after the end of the log")
+        if agent_id != self.agent_id or answer_kind != kind:
+            raise ReplayAgent.Diverged(
+                f"agent {self.agent_id} was asked a {kind} question, the log has a {answer_kind} answer of agent {agent_id}"
+            )
+        return value
+
+    # override
+    def message(self, message: str, **kwargs) -> None:
+        pass
+
+    # override
+    def update(self, diff: list[Any]):
+        pass
+
+    # override
+    def query(self, allowedSchema):
+        return self._next_answer("query")
+
+    # override
+    def choose_one_component_slot(
+        self,
+        slots: list["ComponentSlot"],
+        indices: Optional[list[T]] = None,
+        special_options: list[U] = [],
+        message: str|None = None,
+    ) -> Union[T, U]:
+        return [*(indices or slots), *special_options][self._next_answer("slot")]
+
+    # override
+    def text_choice(self, options: list[str]) -> str:
+        return self._next_answer("text")
+
+    # override
+    def int_choice(self, min: int | None = 0, max: int | None = None) -> int:
+        return self._next_answer("int")
+
+    # override
+    def get_2D_choice(self, dimensions: tuple[int, int]):
+        return tuple(self._next_answer("2D"))
+
+    # override
+    def chat_stream(self, event_loop: asyncio.AbstractEventLoop) -> ChatStream:
+        return SilentChatStream()
+
+
+def type_name(cls: type) -> str:
+    """ Inverse of load_game_type() """
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def load_game_type(name: str) -> type["Game"]:
+    module_name, _, qualname = name.partition(":")
+    obj = importlib.import_module(module_name)
+    for attribute in qualname.split("."):
+        obj = getattr(obj, attribute)
+    return obj
+
+
+def encode_game_argument(value: Any) -> Json:
+    """
+    An argument of a game as JSON, for the header of a ReplayLog. Besides JSON values, games take classes (e.g. the
+    roles of Werewolves) and enum members, which are written as {"type": name} and {"enum": name, "member": name}.
+    """
+    if isinstance(value, Enum):
+        return {"enum": type_name(type(value)), "member": value.name}
+    if isinstance(value, type):
+        return {"type": type_name(value)}
+    if isinstance(value, (list, tuple)):
+        return [encode_game_argument(item) for item in value]
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise TypeError(f"Can't record a game argument with non-string keys: {value!r}")
+        return {"dict": {key: encode_game_argument(item) for key, item in value.items()}}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"Can't record a game argument of type {type(value).__name__}: {value!r}")
+
+
+def decode_game_argument(value: Json) -> Any:
+    if isinstance(value, list):
+        return [decode_game_argument(item) for item in value]
+    if isinstance(value, dict):
+        if "enum" in value:
+            return load_game_type(value["enum"])[value["member"]]
+        if "type" in value:
+            return load_game_type(value["type"])
+        return {key: decode_game_argument(item) for key, item in value["dict"].items()}
+    return value
+
+
+def replay_game(
+    path: str, GameType: type["Game"] | None = None, *args, archive_path: str | None = None, **kwargs
+) -> tuple["Game", "GameSummary"]:
+    """
+    Plays a recorded game again, as fast as possible: the game is headless, and its agents give the recorded answers.
+    GameType defaults to the type written in the log, which must be importable. The game is created with the arguments
+    written in the log, followed by args; kwargs override the keyword arguments written in the log, but not the seed.
+    Logs written before these arguments were recorded are replayed with the command-line configuration instead.
+    If an archive path is given, a ReplayArchive of the game is written there.
+    Returns the game, in its final state, and its summary.
+    """
+    header, answers = ReplayLog.read(path)
+    if GameType is None:
+        GameType = load_game_type(header["game"])
+    if "kwargs" in header:
+        args = (*[decode_game_argument(arg) for arg in header["args"]], *args)
+        game_kwargs = {key: decode_game_argument(value) for key, value in header["kwargs"].items()}
+    else:
+        _nb_agents, game_kwargs = GameType.parse_config(header["config"])
+    # one dict, so that a key given twice is not an error
+    game_kwargs = {**game_kwargs, **kwargs, "seed": header["seed"]}
+    remaining_answers = iter(answers)
+    archive: Optional[ReplayArchive.Writer] = None
+
+    def next_answers():
+        for answer in remaining_answers:
+            if archive is not None:
+                archive.end_turn()
+            yield answer
+
+    answers = next_answers()
+    descriptors = [ReplayAgent.Descriptor(name, answers) for name in header["agents"]]
+    game = GameType(descriptors, *args, **game_kwargs)
+    game.headless = True
+    game.set_agents([descriptor.await_initialization(descriptor.start_initialization(i, None))
+                     for i, descriptor in enumerate(descriptors)])
+    if archive_path is not None:
+        archive = ReplayArchive.Writer(archive_path, game)
+    try:
+        summary = game.play_game()
+    finally:
+        if archive is not None:
+            archive.close()
+    leftover = next(remaining_answers, None)
+    if leftover is not None:
+        raise ReplayAgent.Diverged(f"the game ended before the answer {leftover} of the log")
+    return game, summary
@@ -1,3 +1,3 @@
 from .board import Board, CheckerBoard
-from .containers import List, Dict
+from .containers import List, StableList, Dict
 from .component import Component, ComponentSlot, ComponentSlotProperty, PerPlayer
@@ -10,33 +10,67 @@ from typing import (
 from .component import Component, ComponentSlot
 from game_anywhere.ui import Html, tag
 
+try:
+    import numpy as np
+except ImportError:
+    # The vectorized queries of CheckerBoard are not available then
+    np = None
+
+
+def _same_type(content) -> int:
+    return 1
+
 
 class Board(Component):
     # TODO: a board that's as general as possible
-    pass
+    __slots__ = ()
 
 
 T = TypeVar("T", bound=Component)
 
 
 class CheckerBoard(Board, Generic[T]):
-    class Field(ComponentSlot):
-        pass
+    """
+    A rectangular grid of fields.
+    If numpy is installed, the board also keeps an array with the type of each field's content
+    (0 for empty fields, `classify(content)` otherwise), which is used by the vectorized queries, e.g. empty_mask().
+    """
 
-    def __init__(self, height: int, width: int, fill: Callable[[], Optional[T]] | None = None):
+    class Field(ComponentSlot):
+        __slots__ = ("coords",)
+
+        def __init__(self, coords: tuple[int, int], parent: "CheckerBoard", **kwargs):
+            self.coords = coords  # before the content is set, see _set_content()
+            super().__init__(id=CheckerBoard._coords_to_field_id(coords), parent=parent, **kwargs)
+
+        # override
+        def _set_content(self, content):
+            super()._set_content(content)
+            types = self.parent.types
+            if types is not None:
+                types[self.coords] = 0 if content is None else self.parent.classify(content)
+
+    __slots__ = ("width", "height", "board", "classify", "types")
+
+    def __init__(
+        self,
+        height: int,
+        width: int,
+        fill: Callable[[], Optional[T]] | None = None,
+        classify: Callable[[T], int] | None = None,
+    ):
         super().__init__()
         self.width = width
         self.height = height
+        # Maps a content to its type, a strictly positive integer. By default, all contents have the same type
+        self.classify = classify if classify is not None else _same_type
+        self.types = np.zeros((height, width), dtype=np.int32) if np is not None else None
         self.board: list[list[Optional[T]]] = [[None for i in range(width)] for j in range(height)]
         if fill is None:
             fill = lambda: None
-        for i in range(width):
-            for j in range(height):
-                self.board[i][j] = CheckerBoard.Field(
-                    id=self._coords_to_field_id((i, j)),
-                    parent=self,
-                    content=fill(),
-                )
+        for i in range(height):
+            for j in range(width):
+                self.board[i][j] = CheckerBoard.Field((i, j), parent=self, content=fill())
 
     def __getitem__(self, index: tuple[int, int]) -> Optional[T]:
         try:
@@ -58,6 +92,67 @@ class CheckerBoard(Board, Generic[T]):
         i, j = index
         return self.board[i][j]
 
+    # Vectorized queries. The masks are boolean arrays of shape (height, width), indexed like the board
+
+    def _get_types(self) -> "np.ndarray":
+        if self.types is None:
+            raise RuntimeError("The vectorized queries of CheckerBoard need numpy")
+        return self.types
+
+    def empty_mask(self) -> "np.ndarray":
+        return self._get_types() == 0
+
+    def type_mask(self, *types: int) -> "np.ndarray":
+        """ The fields whose content has one of the given types, see `classify` """
+        return np.isin(self._get_types(), types)
+
+    @staticmethod
+    def shift(mask: "np.ndarray", di: int, dj: int) -> "np.ndarray":
+        """ result[i + di, j + dj] = mask[i, j]. The fields shifted in from outside the board are False """
+        result = np.zeros_like(mask)
+        height, width = mask.shape
+        if abs(di) >= height or abs(dj) >= width:
+            return result
+        result[max(di, 0):height + min(di, 0), max(dj, 0):width + min(dj, 0)] = \
+            mask[max(-di, 0):height + min(-di, 0), max(-dj, 0):width + min(-dj, 0)]
+        return result
+
+    def neighbour_count(self, mask: "np.ndarray", diagonals: bool = True) -> "np.ndarray":
+        """ For each field, how many of its neighbours are in the mask """
+        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        if diagonals:
+            directions += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+        result = np.zeros(mask.shape, dtype=np.int32)
+        for di, dj in directions:
+            result += self.shift(mask, di, dj)
+        return result
+
+    def coords_where(self, mask: "np.ndarray") -> list[tuple[int, int]]:
+        return [(i, j) for i, j in np.argwhere(mask).tolist()]
+
+    def fields_where(self, mask: "np.ndarray") -> list["CheckerBoard.Field"]:
+        return [self.board[i][j] for i, j in self.coords_where(mask)]
+
+    # Bulk operations. They send one update for the whole board instead of one per field
+
+    def fill(self, fill: Callable[[], Optional[T]], mask: "np.ndarray | None" = None):
+        """ Sets the content of all fields in the mask (or of the whole board) to a new fill() """
+        if mask is None:
+            fields = [field for row in self.board for field in row]
+        else:
+            fields = self.fields_where(mask)
+        journal = self.get_journal()
+        for field in fields:
+            if journal is not None:
+                if field._shared:
+                    field._unshare()
+                journal.append((field._set_content, field._content))
+            field._set_content(fill())
+        self.log_update()
+
+    def clear(self, mask: "np.ndarray | None" = None):
+        self.fill(lambda: None, mask)
+
     @staticmethod
     def _coords_to_field_id(coords: tuple[int, int]):
         return f"{coords[0]},{coords[1]}"
@@ -75,10 +170,18 @@ class CheckerBoard(Board, Generic[T]):
             for j in range(self.width):
                 yield self._coords_to_field_id((i,j)), self.board[i][j]
 
+    # override
+    def __copy__(self) -> "CheckerBoard[T]":
+        copy = super().__copy__()
+        copy.board = [[field.copy_to(copy) for field in row] for row in self.board]
+        if self.types is not None:
+            copy.types = self.types.copy()
+        return copy
+
     def html(self, viewer_id=None) -> Html:
         return Html(
             tag.div(
-                *(field.html() for _, field in self.all_fields()),
+                *(field.html(viewer_id=viewer_id) for _, field in self.all_fields()),
                 **{
                     "class": "checkerboard",
                     "style": f"grid-template-rows: repeat({self.width}, 1fr); grid-template-columns: repeat({self.height}, 1fr)",
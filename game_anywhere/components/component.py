@@ -1,12 +1,71 @@
 from abc import ABC, abstractmethod
-from game_anywhere.ui import Html, HtmlElement, tag
+from contextlib import nullcontext
+from game_anywhere.ui import Html, HtmlElement, FrozenHtmlElement, tag
+from functools import cache
 from itertools import count
-from typing import Optional, Type, Any, Iterator, Generic, TypeVar
+from typing import Optional, Type, Any, Iterator, Iterable, Generic, TypeVar, ContextManager
 from .utils import html as to_html, mask
 
 ComponentId = str
 
 
+def viewer_bit(viewer_id: Optional[int]) -> int:
+    """
+    The bit representing a viewer in visibility masks (see WeakComponentSlot.get_visibility_mask).
+    Bit 0 is for the spectators (viewer_id=None), bit i+1 for the agent with ID i.
+    """
+    return 1 if viewer_id is None else 2 << viewer_id
+
+
+def render_class(masks: tuple[int, ...], viewer_id: Optional[int]) -> int:
+    """
+    Viewers that are in the same render class for a slot see the same HTML, and it needs to be rendered only once.
+    `masks` are the masks of viewers that see something different from the other viewers,
+    see WeakComponentSlot.get_render_class()
+    """
+    bit = viewer_bit(viewer_id)
+    result = 0
+    for i, mask in enumerate(masks):
+        if mask & bit:
+            result |= 1 << i
+    return result
+
+
+@cache
+def _attribute_names(cls: type) -> tuple[str, ...]:
+    """ The __slots__ of the class and its bases """
+    names = []
+    for klass in cls.__mro__:
+        slots = vars(klass).get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        names += [name for name in slots if name not in ("__weakref__", "__dict__")]
+    return tuple(names)
+
+
+def shallow_copy(obj: Any) -> Any:
+    """ A new object of the same class, with the same attributes, without calling __init__ """
+    result = object.__new__(type(obj))
+    for name in _attribute_names(type(obj)):
+        try:
+            setattr(result, name, getattr(obj, name))
+        except AttributeError:
+            pass  # not set on the original either
+    if hasattr(obj, "__dict__"):
+        result.__dict__.update(obj.__dict__)
+    return result
+
+
+class _RenderCache:
+    """ The cached HTML of a slot, by render class. """
+
+    __slots__ = ("masks", "html")
+
+    def __init__(self, masks: tuple[int, ...]):
+        self.masks = masks
+        self.html: dict[int, HtmlElement] = {}
+
+
 # TODO find a better name
 class ComponentOrGame(ABC):
     """
@@ -14,16 +73,31 @@ class ComponentOrGame(ABC):
     Each ComponentSlot can contain one Component. Components in turn can have multiple ComponentSlots.
     I.e. each Component has a ComponentSlot as a parent/slot, and each ComponentSlot has a ComponentOrGame as a parent.
     """
-    def __init__(self):
-        # TODO: a lot of subclasses don't need the slots dict - maybe this should be optional or a mixin
-        self.slots: dict[str, "WeakComponentSlot"] = {}
+    __slots__ = ("_slots",)
+
+    # The ComponentSlotProperties of the class and its bases, in declaration order. Compiled by __init_subclass__.
+    # The slot of the property at index i is stored in self._slots[i]
+    _slot_layout: tuple["ComponentSlotProperty", ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        layout = []
+        for klass in reversed(cls.__mro__):
+            for prop in vars(klass).get("_declared_slot_properties", ()):
+                if prop not in layout:
+                    layout.append(prop)
+        for index, prop in enumerate(layout):
+            if prop.index is None:
+                prop.index = index
+            elif prop.index != index:
+                raise TypeError(f"{cls.__name__}: slot property {prop.private_name} has incompatible positions in its bases")
+        cls._slot_layout = tuple(layout)
 
-    def add_slot(self, slot_name: str, slot: "WeakComponentSlot"):
-        self.slots[slot_name] = slot
-        try:
-            self.get_game().log_new_slot(self, slot)
-        except Component.NotAttachedToComponentTree:
-            pass
+    def __init__(self):
+        # All slots are created upfront, so that accessing a slot property is only an index in this list.
+        # A lot of subclasses don't have slots (e.g. cards), they share the same empty tuple
+        layout = self._slot_layout
+        self._slots: list["WeakComponentSlot"] | tuple[()] = [prop.create_slot(self) for prop in layout] if layout else ()
 
     @abstractmethod
     def get_game(self) -> "Game": ...
@@ -36,6 +110,16 @@ class ComponentOrGame(ABC):
         """ Whether there's a component higher up in the component hierarchy that blocks visibility of this slot. """
         ...
 
+    @abstractmethod
+    def get_visibility_mask(self) -> int:
+        """ All viewers that can see this object, as a bit mask. See viewer_bit() """
+        ...
+
+    @abstractmethod
+    def invalidate_html(self) -> None:
+        """ Needs to be called when the HTML of this object changes, so that the cached HTML of its parents is dropped """
+        ...
+
     def html(self, viewer_id=None) -> Html:
         result = Html()
         for slotname, slot in self.get_slots():
@@ -45,17 +129,29 @@ class ComponentOrGame(ABC):
         return result
 
     def get_slots(self) -> Iterator[tuple[str, "WeakComponentSlot"]]:
-        for slot_name, slot in self.slots.items():
-            yield slot_name, slot
+        for prop, slot in zip(self._slot_layout, self._slots):
+            yield prop.private_name, slot
 
 
 class Component(ComponentOrGame):
     class NotAttachedToComponentTree(Exception):
         pass
 
+    __slots__ = ("slot",)
+
+    # A leaf has no slots and no state that its class copies (see __copy__()). It is treated as a value: replaced,
+    # never modified in place. So a clone shares it with its source even once it is read, see WeakComponentSlot._unshare()
+    _is_leaf = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._is_leaf = (
+            not cls._slot_layout and cls.__copy__ is Component.__copy__ and cls.get_slots is ComponentOrGame.get_slots
+        )
+
     def __init__(self):
+        self.slot: Optional["ComponentSlot"] = None  # before the slots are created, as they notify their parent
         super().__init__()
-        self.slot: Optional["ComponentSlot"] = None
 
     def get_game(self) -> "Game":
         if self.slot is None:
@@ -70,12 +166,71 @@ class Component(ComponentOrGame):
     def reveal(self, *args, **kwargs):
         self.slot.reveal(*args, **kwargs)
 
+    def get_journal(self) -> Optional[list]:
+        """ The journal of the game (see Game.checkpoint()), or None if it is off or if the component is detached """
+        try:
+            return self.get_game()._journal
+        except Component.NotAttachedToComponentTree:
+            return None
+
+    def on_moved(self):
+        """ Called when the component is put into a slot or taken out of it. Invalidates the caches below it. """
+        for _, child in self.get_slots():
+            child.invalidate_visibility()
+            child.invalidate_address()
+            child.clear_html_cache()  # the HTML contains the addresses
+
+    def invalidate_html(self):
+        if self.slot is not None:
+            self.slot.invalidate_html()
+
+    def log_update(self):
+        """ Sends the whole component to the agents, e.g. after a bulk operation instead of one update per change """
+        if self.slot is not None:
+            try:
+                self.get_game().log_component_update(self.slot, self)
+            except Component.NotAttachedToComponentTree:
+                pass
+
+    def transaction(self) -> ContextManager:
+        """ Game.transaction() if the component is attached to a game, otherwise a no-op """
+        try:
+            return self.get_game().transaction()
+        except Component.NotAttachedToComponentTree:
+            return nullcontext()
+
+    def __copy__(self) -> "Component":
+        """
+        A detached copy of the component, that shares its content with the original: the slots of the copy are new,
+        but they are marked as shared (see WeakComponentSlot._unshare()), so the components below them are only copied
+        when they are accessed. Components that store slots or mutable objects outside of the slot layout need to
+        copy them too.
+        """
+        result = shallow_copy(self)
+        result.slot = None
+        if self._slots:
+            result._slots = [slot.copy_to(result) for slot in self._slots]
+        return result
+
+    def get_html_viewer_masks(self) -> Iterable[int]:
+        """
+        By default, the HTML of a component is assumed to depend on the viewer only through the visibility of its slots.
+        Components whose html() depends on the viewer in another way need to override this, and return a mask of the
+        viewers that see something different than the others, e.g. viewer_bit(owner_id) if the owner sees more.
+        """
+        return ()
+
     def can_be_seen_by_recursive(self, viewer_id) -> bool:
         try:
-            return self.slot.can_be_seen_by_recursive(viewer_id)
+            return self.get_visibility_mask() & viewer_bit(viewer_id) != 0
         except self.NotAttachedToComponentTree:
             raise AssertionError("This method should be called only on components on the tree")
 
+    def get_visibility_mask(self) -> int:
+        if self.slot is None:
+            raise Component.NotAttachedToComponentTree()
+        return self.slot.get_visibility_mask()
+
 
 """ Typically, ComponentTreeNodes are Components. But we also support raw values, e.g. booleans. """
 ComponentTreeNode = Any
@@ -83,6 +238,12 @@ T = TypeVar("T", bound=ComponentTreeNode)
 
 
 class WeakComponentSlot(Generic[T]):
+    # There are a lot of slots (e.g. one per field of a CheckerBoard), so they should be as small as possible
+    __slots__ = (
+        "id", "parent", "_visibility_mask", "_address", "_html_cache", "_hidden", "_owner_id", "_content", "_shared",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         id: str,
@@ -93,34 +254,112 @@ class WeakComponentSlot(Generic[T]):
     ):
         self.id = id
         self.parent = parent
-        self.hidden = hidden
-        self.owner_id = owner_id
+        # Cache for get_visibility_mask(). If it is None, the masks of all slots below this one are None too
+        self._visibility_mask: Optional[int] = None
+        # Cache for get_address(). Same as above, if it is None, the addresses of all slots below are None too
+        self._address: Optional[str] = None
+        # Cache for html(), by render class. None means dirty
+        self._html_cache: Optional[_RenderCache] = None
+        self._hidden = hidden
+        self._owner_id = owner_id
         self._content = None
-        if content:
+        # Whether the content is shared with another component tree, see _unshare()
+        self._shared = False
+        if content is not None:  # not just truthy: an empty List is a component too
             self.set(content)
 
-    def get_address(self):
-        return self.parent.get_slot_address() + "/" + self.id
+    def get_address(self) -> str:
+        if self._address is None:
+            address = self.parent.get_slot_address() + "/" + self.id
+            try:
+                self.get_game()
+            except Component.NotAttachedToComponentTree:
+                return address  # addresses of detached slots change when they are attached, so don't cache them
+            self._address = address
+        return self._address
+
+    def invalidate_address(self):
+        """ Needs to be called when the slot is moved in the tree. """
+        if self._address is None:
+            return  # the slots below are not cached either
+        self._address = None
+        if isinstance(self._content, ComponentOrGame) and not self._shared:
+            for _, child in self._content.get_slots():
+                child.invalidate_address()
 
     def get_game(self) -> "Game":
         return self.parent.get_game()
 
     def get(self) -> T:
+        if self._shared:
+            return self._unshare()
         return self._content
 
+    def copy_to(self, parent: ComponentOrGame) -> "WeakComponentSlot[T]":
+        """
+        A copy of this slot for a copy of its parent, see Component.__copy__().
+        The content is shared, so the caches (which only depend on the position in the tree) stay valid.
+        """
+        result = shallow_copy(self)
+        result.parent = parent
+        result._shared = True
+        return result
+
+    def _unshare(self) -> T:
+        """
+        The content of the slot is shared with another tree (typically its source, see Game.clone()):
+        replaces it with a copy that belongs to this tree, so that it can be modified through it.
+        Only one level is copied, the content of the copy is shared in turn. Values (raw values and leaf components,
+        see Component._is_leaf) can't be modified in place, so they stay shared: only a component that has state of
+        its own is copied when it is reached. Moving a shared value copies it, see _set_content()
+        """
+        content = self._content
+        if isinstance(content, Component):
+            if content._is_leaf:
+                return content
+            self.get_game().check_source_unchanged()
+            content = self._content = content.__copy__()
+            content.slot = self
+        self._shared = False
+        return content
+
     def set(self, content: T):
+        try:
+            game = self.get_game()
+        except Component.NotAttachedToComponentTree:
+            # No need to update the clients then
+            self._set_content(content)
+            return
+        journal = game._journal
+        if journal is not None:
+            if self._shared:
+                self._unshare()  # the journal must not hold content of another tree
+            journal.append((self._set_content, self._content))
+        self._set_content(content)
+        game.log_component_update(self, content)
+
+    def _set_content(self, content: T):
+        """ Same as set(), without sending the update to the agents """
+        if isinstance(content, Component) and content._is_leaf and self._held_by_other_tree(content):
+            content = content.__copy__()  # a value shared with another tree, see _unshare()
         self._content = content
+        self._shared = False
+        self.invalidate_html()
         if isinstance(content, Component):
             content.slot = self
+            content.on_moved()
         # Re-enforce owner ID inheritance
         if self.owner_id is not None:
             self.set_owner_id(self.owner_id)
+
+    def _held_by_other_tree(self, content: "Component") -> bool:
+        slot = content.slot
+        if slot is None or slot is self or slot._content is not content:
+            return False
         try:
-            game = self.get_game()
+            return slot.get_game() is not self.get_game()
         except Component.NotAttachedToComponentTree:
-            # No need to update the clients then
-            return
-        game.log_component_update(self, content)
+            return False
 
     def reveal(self, to: int|None = None):
         try:
@@ -138,28 +377,130 @@ class WeakComponentSlot(Generic[T]):
         self.set(content)
 
     def take(self) -> T:
-        result = self._content
+        result = self.get()
         self.set(None)
+        if isinstance(result, Component):
+            result.on_moved()
         return result
 
     def empty(self) -> bool:
         return self._content is None
 
+    @property
+    def hidden(self) -> bool:
+        return self._hidden
+
+    @hidden.setter
+    def hidden(self, hidden: bool):
+        if hidden != self._hidden:
+            self._hidden = hidden
+            self.invalidate_visibility()
+            self.invalidate_html()
+
+    @property
+    def owner_id(self) -> Optional[int]:
+        return self._owner_id
+
+    @owner_id.setter
+    def owner_id(self, owner_id: Optional[int]):
+        if owner_id != self._owner_id:
+            self._owner_id = owner_id
+            self.invalidate_visibility()
+            self.invalidate_html()
+
     def set_owner_id(self, owner_id: int):
         """ Owner IDs are inherited down the component tree by default, so this is a recursive method """
         self.owner_id = owner_id
-        if type(self._content) is Component:
-            for child in self._content.get_slots():
-                child.set_owner_id(owner_id)
+        content = self.get()
+        if isinstance(content, Component):
+            for prop, child in zip(content._slot_layout, content._slots):
+                if prop.inherits_owner_id:
+                    child.set_owner_id(owner_id)
 
     def can_be_seen_by(self, viewer_id=None):
         return not self.hidden or viewer_id == self.owner_id
 
     def can_be_seen_by_recursive(self, viewer_id=None) -> bool:
         """ Whether there's a component higher up in the component hierarchy that blocks visibility of this slot. """
-        return self.can_be_seen_by(viewer_id) and self.parent.can_be_seen_by_recursive(viewer_id)
+        return self.get_visibility_mask() & viewer_bit(viewer_id) != 0
+
+    def get_visibility_mask(self) -> int:
+        """
+        All viewers that can see this slot, taking into account the whole hierarchy above it. See viewer_bit().
+        The mask is computed from can_be_seen_by(), and cached until invalidate_visibility() is called.
+        """
+        if self._visibility_mask is None:
+            self._visibility_mask = self.get_own_visibility_mask() & self.parent.get_visibility_mask()
+        return self._visibility_mask
+
+    def get_own_visibility_mask(self) -> int:
+        """ All viewers for which can_be_seen_by() is true """
+        own_mask = 0
+        for viewer_id in self.get_game().get_viewers():
+            if self.can_be_seen_by(viewer_id):
+                own_mask |= viewer_bit(viewer_id)
+        return own_mask
+
+    def invalidate_visibility(self):
+        """ Needs to be called when the result of can_be_seen_by() changes, or when the slot is moved in the tree. """
+        if self._visibility_mask is None:
+            return  # the slots below are not cached either
+        self._visibility_mask = None
+        if isinstance(self._content, ComponentOrGame) and not self._shared:
+            for _, child in self._content.get_slots():
+                child.invalidate_visibility()
+
+    def invalidate_html(self):
+        """ Marks this slot and all slots above it as dirty. """
+        self._html_cache = None
+        self.parent.invalidate_html()
+
+    def clear_html_cache(self):
+        """ Marks this slot and all slots below it as dirty. """
+        self._html_cache = None
+        # The slots below a shared content belong to the other tree
+        if isinstance(self._content, ComponentOrGame) and not self._shared:
+            for _, child in self._content.get_slots():
+                child.clear_html_cache()
+
+    def _get_render_cache(self) -> _RenderCache:
+        # The HTML can be requested by the network thread while the game thread modifies the slot.
+        # Keeping a reference to the cache means that a rendering that started before invalidate_html()
+        # is stored in the old cache, which is then discarded.
+        cache = self._html_cache
+        if cache is None:
+            masks = {self.get_own_visibility_mask()}
+            if isinstance(self._content, Component):
+                masks.update(self._content.get_html_viewer_masks())
+                for _, child in self._content.get_slots():
+                    masks.update(child._get_render_cache().masks)
+            # Masks that contain all viewers or none don't distinguish between viewers
+            masks.discard(0)
+            masks.discard(self.get_game().get_visibility_mask())
+            cache = self._html_cache = _RenderCache(tuple(masks))
+        return cache
+
+    def get_render_class(self, viewer_id=None) -> int:
+        """
+        The viewers with the same render class see the same HTML for this slot.
+        The render class depends on the visibility of all slots below this one, and on get_html_viewer_masks().
+        """
+        return render_class(self._get_render_cache().masks, viewer_id)
 
     def html(self, viewer_id=None, force_reveal=False) -> HtmlElement:
+        if force_reveal:
+            return self._render_html(viewer_id, force_reveal=True)
+        try:
+            cache = self._get_render_cache()
+        except Component.NotAttachedToComponentTree:
+            return self._render_html(viewer_id)  # there are no viewers yet, so no render classes either
+        key = render_class(cache.masks, viewer_id)
+        html = cache.html.get(key)
+        if html is None:
+            html = cache.html[key] = FrozenHtmlElement(self._render_html(viewer_id))
+        return html
+
+    def _render_html(self, viewer_id=None, force_reveal=False) -> HtmlElement:
         if self.can_be_seen_by(viewer_id) or force_reveal:
             html = to_html(self._content, viewer_id=viewer_id)
         else:
@@ -173,17 +514,25 @@ class WeakComponentSlot(Generic[T]):
 
 
 class Pointer(WeakComponentSlot):
-    pass
+    __slots__ = ()
 
 
 class ComponentSlot(WeakComponentSlot):
+    __slots__ = ()
+
     def set(self, content: ComponentTreeNode):
         super().set(content)
+        content = self._content  # a copy if it was shared with another tree, see _set_content()
         if isinstance(content, Component):
             content.slot = self
 
 
 class ComponentSlotProperty(Generic[T]):
+    """
+    Declares a slot on a Component or Game class.
+    The properties of a class are compiled into a fixed layout (see ComponentOrGame.__init_subclass__),
+    and the slots are created when the object is constructed.
+    """
     _next_id = count()
     components: dict[ComponentId, "ComponentSlotProperty"] = {}
 
@@ -201,29 +550,34 @@ class ComponentSlotProperty(Generic[T]):
         self.SlotType = slotType
         self.args = args
         self.kwargs = kwargs
+        # The slot inherits the owner ID of the slot of its component, see WeakComponentSlot.set_owner_id()
+        self.inherits_owner_id = 'owner_id' not in kwargs
+        # Position in ComponentOrGame._slots, set when the owner class is compiled
+        self.index: Optional[int] = None
 
     def __set_name__(self, owner: Type[ComponentOrGame], name):
         self.private_name = "_" + name
+        # __set_name__ is called before __init_subclass__, which collects the properties into the slot layout
+        if "_declared_slot_properties" not in vars(owner):
+            owner._declared_slot_properties = []
+        owner._declared_slot_properties.append(self)
+
+    def create_slot(self, obj: ComponentOrGame) -> WeakComponentSlot:
+        return self.SlotType(self.id, obj, *self.args, **self.kwargs)
 
     def __get__(self, obj: ComponentOrGame, objtype=None) -> T:
-        if self.private_name not in obj.slots:
-            slot = self.SlotType(self.id, obj, *self.args, **self.kwargs)
-            obj.add_slot(self.private_name, slot)
-        return obj.slots[self.private_name].get()
+        if obj is None:
+            return self
+        slot = obj._slots[self.index]
+        if slot._shared:
+            return slot._unshare()
+        return slot._content
 
     def __set__(self, obj: ComponentOrGame, value: T):
-        if self.private_name not in obj.slots:
-            kwargs = self.kwargs.copy()
-            if 'owner_id' not in self.kwargs and isinstance(obj, Component) and obj.slot is not None:
-                kwargs['owner_id'] = obj.slot.owner_id
-            slot = self.SlotType(self.id, obj, *self.args, **kwargs)
-            obj.add_slot(self.private_name, slot)
-            slot.set(value) # First set and register the slot, then fill it.
-            # Otherwise, it will log its update as soon as it is filled, and the clients will get confused
-        else:
-            obj.slots[self.private_name].set(value)
+        slot = obj._slots[self.index]
+        slot.set(value)
         if isinstance(value, Component) and self.SlotType == ComponentSlot:
-            assert value.slot == obj.slots[self.private_name]
+            assert value.slot == slot
 
 
 class PerPlayerComponent(Component):
@@ -239,12 +593,18 @@ class PerPlayerComponent(Component):
     ))
     """
 
+    __slots__ = ("owner", "owner_id")
+
     def __init__(self, owner: "AgentDescriptor", owner_id: "AgentId", *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.owner = owner
         self.owner_id = owner_id
     def __str__(self):
         return f'Board of player {self.owner.name or "(not connected)"}'
+    # override
+    def get_html_viewer_masks(self) -> Iterable[int]:
+        return (viewer_bit(self.owner_id),)  # the owner is shown as "(you)"
+
     def html(self, viewer_id=None) -> Html:
         html = super().html(viewer_id)
         owner = self.owner.name or "(not connected)"
@@ -280,7 +640,7 @@ class PerPlayer(ComponentSlotProperty):
                 type,
                 "PerPlayerComponent[" + ",".join(kwargs.keys()) + "]",
                 (PerPlayerComponent,),
-                kwargs,
+                {"__slots__": (), **kwargs},
             )
         else:
             assert len(kwargs) == 0, (
@@ -299,10 +659,6 @@ class PerPlayer(ComponentSlotProperty):
             for_all_players = List(per_player)
             for agent_id, slot in enumerate(for_all_players.slots):
                 slot.set_owner_id(agent_id)
-            slot = ComponentSlot(self.id, obj)
-            obj.add_slot(self.private_name, slot)
-            # Fill the slot only after it is registered. See ComponentSlotProperty for explanation
-            slot.set(for_all_players)
+            obj._slots[self.index].set(for_all_players)
         else:
-            obj.slots[self.private_name].set(value)
-            assert value.slot == obj.slots[self.private_name]
+            super().__set__(obj, value)
@@ -7,7 +7,10 @@ T = TypeVar("T", bound=Component)
 
 
 class List(Component, Generic[T], MutableSequence[T]):
-    def __init__(self, args, slotClass: type[ComponentSlot] = ComponentSlot, **kwargs):
+    # The slots of a List are dynamic, so they are stored here instead of the slot layout of ComponentOrGame
+    __slots__ = ("slots", "kwargs")
+
+    def __init__(self, args: Iterable[T] = (), slotClass: type[ComponentSlot] = ComponentSlot, **kwargs):
         super().__init__()
         self.kwargs = kwargs
         slots = [
@@ -33,9 +36,12 @@ class List(Component, Generic[T], MutableSequence[T]):
     def append(self, value: Component):
         slot = ComponentSlot(id=str(len(self.slots)), parent=self, **self.kwargs)
         self.slots.append(slot)
+        self.invalidate_html()
         # log update, see ComponentSlot.set()
         try:
             game = self.get_game()
+            if game._journal is not None:
+                game._journal.append((self._undo_append, None))
             game.log_new_slot(self, slot)
         except Component.NotAttachedToComponentTree:
             pass
@@ -50,7 +56,11 @@ class List(Component, Generic[T], MutableSequence[T]):
         self.slots[index].set(value)
 
     def __delitem__(self, index):
+        journal = self.get_journal()
+        if journal is not None:
+            journal.append((self._restore_slots, list(self.slots)))
         del self.slots[index]
+        self.invalidate_html()
 
     def __len__(self):
         return len(self.slots)
@@ -59,23 +69,234 @@ class List(Component, Generic[T], MutableSequence[T]):
 
     def __iter__(self) -> Iterator[Component]:
         # When iterating, we can't replace one value. So just dealing with components and ignoring slots is appropriate here
-        return (slot._content for slot in self.slots)
+        return (slot._unshare() if slot._shared else slot._content for slot in self.slots)
 
     def __iadd__(self, other_list: list[Component]):
-        for i in other_list:
-            self.append(i)
+        self.extend(other_list)
         return self
 
     def extend(self, values_iter: Iterable[Component]):
-        for i in values_iter:
-            self.append(i)
+        """ Appends all values, and sends one update for the whole list instead of two per value """
+        values = list(values_iter)
+        if not values:
+            return
+        journal = self.get_journal()
+        if journal is not None:
+            journal.append((self._restore_slots, list(self.slots)))
+        for value in values:
+            slot = ComponentSlot(id=str(len(self.slots)), parent=self, **self.kwargs)
+            self.slots.append(slot)
+            slot._set_content(value)
+        self.invalidate_html()
+        self.log_update()
+
+    # useful methods
+
+    def _undo_append(self, _):
+        self.slots.pop()
+        self.invalidate_html()
+
+    def _restore_slots(self, slots: list[ComponentSlot]):
+        self.slots = slots
+        self.invalidate_html()
+
+    # override
+    def __copy__(self) -> "List[T]":
+        copy = super().__copy__()
+        copy.slots = [slot.copy_to(copy) for slot in self.slots]
+        return copy
+
+
+class StableList(Component, Generic[T], MutableSequence[T]):
+    """
+    A list whose slots keep their ID when other slots are inserted, removed or moved, so that each of these changes is
+    sent to the agents as one diff ("add" with the slot it is inserted before, "remove", "move").
+    The IDs of a List are positions instead, so it can only grow at the end.
+    The order is a doubly-linked list over the slots: changes next to a known slot are O(1), indexing is O(n).
+    """
+    __slots__ = ("_next", "_prev", "next_id", "slot_class", "kwargs")
+
+    def __init__(self, args: Iterable[T] = (), slotClass: type[ComponentSlot] = ComponentSlot, **kwargs):
+        super().__init__()
+        self.slot_class = slotClass
+        self.kwargs = kwargs
+        # None is both the head and the tail: self._next[None] is the first slot and self._prev[None] the last one
+        self._next: dict[ComponentSlot | None, ComponentSlot | None] = {None: None}
+        self._prev: dict[ComponentSlot | None, ComponentSlot | None] = {None: None}
+        self.next_id = 0
+        for component in args:
+            slot = self._new_slot()
+            slot._set_content(component)
+            self._link(slot, None)
+
+    # Component interface methods
+
+    def get_slots(self) -> Iterator[tuple[str, ComponentSlot]]:
+        for slot in self.iter_slots():
+            yield slot.id, slot
+
+    def html(self, viewer_id=None) -> Html:
+        return Html(*[slot.html(viewer_id=viewer_id) for slot in self.iter_slots()])
+
+    # slot methods, O(1)
+
+    def iter_slots(self) -> Iterator[ComponentSlot]:
+        slot = self._next[None]
+        while slot is not None:
+            yield slot
+            slot = self._next[slot]
+
+    def insert_before(self, before: ComponentSlot | None, value: T) -> ComponentSlot:
+        """ Inserts the value before a slot of this list, or at the end if it is None, and returns the new slot """
+        slot = self._new_slot()
+        self._link(slot, before)
+        self.invalidate_html()
+        try:
+            game = self.get_game()
+            if game._journal is not None:
+                game._journal.append((self._unlink, slot))
+            game.log_new_slot(self, slot, before=before)
+        except Component.NotAttachedToComponentTree:
+            pass
+        slot.set(value)  # see List.append()
+        return slot
+
+    def remove_slot(self, slot: ComponentSlot):
+        before = self._next[slot]
+        self._unlink(slot)
+        try:
+            game = self.get_game()
+            if game._journal is not None:
+                game._journal.append((self._relink, (slot, before)))
+            game.log_delete_slot(self, slot.id)
+        except Component.NotAttachedToComponentTree:
+            pass
+
+    def move(self, slot: ComponentSlot, before: ComponentSlot | None):
+        """ Moves a slot of this list before another one, or to the end if it is None. The content is not sent again """
+        if slot is before or self._next[slot] is before:
+            return
+        old_before = self._next[slot]
+        self._unlink(slot)
+        self._link(slot, before)
+        try:
+            game = self.get_game()
+            if game._journal is not None:
+                game._journal.append((self._undo_move, (slot, old_before)))
+            game.log_move_slot(self, slot, before=before)
+        except Component.NotAttachedToComponentTree:
+            pass
+
+    def slot_at(self, index: int) -> ComponentSlot:
+        """ O(n), walks from the nearest end """
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("StableList index out of range")
+        if index < length // 2:
+            slot = self._next[None]
+            for _ in range(index):
+                slot = self._next[slot]
+        else:
+            slot = self._prev[None]
+            for _ in range(length - 1 - index):
+                slot = self._prev[slot]
+        return slot
+
+    # list interface methods - the most basic ones
+
+    def insert(self, index, value: T):
+        """ Like list.insert(), an index out of range inserts at the head or at the end """
+        length = len(self)
+        if index < 0:
+            index = max(index + length, 0)
+        self.insert_before(self.slot_at(index) if index < length else None, value)
+
+    def append(self, value: T):
+        self.insert_before(None, value)
+
+    def __getitem__(self, index):
+        return self.slot_at(index).get()
+
+    def __setitem__(self, index, value):
+        self.slot_at(index).set(value)
+
+    def __delitem__(self, index):
+        self.remove_slot(self.slot_at(index))
+
+    def __len__(self):
+        return len(self._next) - 1
+
+    # list interface methods - syntactic sugar
+
+    def __iter__(self) -> Iterator[T]:
+        return (slot._unshare() if slot._shared else slot._content for slot in self.iter_slots())
+
+    def __iadd__(self, other_list: list[T]):
+        self.extend(other_list)
+        return self
+
+    def extend(self, values_iter: Iterable[T]):
+        """ Appends all values, and sends one update for the whole list, see List.extend() """
+        values = list(values_iter)
+        if not values:
+            return
+        journal = self.get_journal()
+        for value in values:
+            slot = self._new_slot()
+            slot._set_content(value)  # the update of the whole list below adds it, see List.extend()
+            self._link(slot, None)
+            if journal is not None:
+                journal.append((self._unlink, slot))
+        self.invalidate_html()
+        self.log_update()
+
+    def remove(self, value: T):
+        """ O(1) if the value is a component of this list, otherwise removes the first slot whose content is equal """
+        slot = getattr(value, "slot", None)
+        if slot is None or slot not in self._next:
+            slot = next((slot for slot in self.iter_slots() if slot.get() == value), None)
+            if slot is None:
+                raise ValueError("StableList.remove(x): x not in list")
+        self.remove_slot(slot)
 
     # useful methods
 
-    def __copy__(self):
-        copy = type(self)()
-        copy.__dict__.update(self.__dict__)
-        copy.slot = None  # copy shouldn't be attached to the component tree
+    def _new_slot(self) -> ComponentSlot:
+        """ An empty slot: its content is set by the caller, which decides how the agents learn about it """
+        slot = self.slot_class(id=str(self.next_id), parent=self, **self.kwargs)
+        self.next_id += 1  # IDs are never reused, so a client never confuses a new slot with a removed one
+        return slot
+
+    def _link(self, slot: ComponentSlot, before: ComponentSlot | None):
+        prev = self._prev[before]
+        self._next[prev] = self._prev[before] = slot
+        self._prev[slot] = prev
+        self._next[slot] = before
+
+    def _unlink(self, slot: ComponentSlot):
+        prev, before = self._prev.pop(slot), self._next.pop(slot)
+        self._next[prev] = before
+        self._prev[before] = prev
+        self.invalidate_html()
+
+    def _relink(self, slot_and_before: tuple[ComponentSlot, ComponentSlot | None]):
+        self._link(*slot_and_before)
+        self.invalidate_html()
+
+    def _undo_move(self, slot_and_before: tuple[ComponentSlot, ComponentSlot | None]):
+        self._unlink(slot_and_before[0])
+        self._relink(slot_and_before)
+
+    # override
+    def __copy__(self) -> "StableList[T]":
+        copy = super().__copy__()
+        copies = {None: None}
+        for slot in self.iter_slots():
+            copies[slot] = slot.copy_to(copy)
+        copy._next = {copies[slot]: copies[after] for slot, after in self._next.items()}
+        copy._prev = {copies[slot]: copies[before] for slot, before in self._prev.items()}
         return copy
 
 
@@ -83,6 +304,9 @@ Key = TypeVar("Key")
 
 
 class Dict(Component, Generic[Key, T], MutableMapping[Key, T]):
+    # see List
+    __slots__ = ("slots", "slot_constructor")
+
     def __init__(self, content: dict[Key, T] = {}, slotClass: type[ComponentSlot] = ComponentSlot, **kwargs):
         super().__init__()
         self.slot_constructor = lambda *args, **other_kwargs: slotClass(*args, **other_kwargs, **kwargs)
@@ -107,16 +331,24 @@ class Dict(Component, Generic[Key, T], MutableMapping[Key, T]):
         else:
             slot = self.slot_constructor(id=str(__key), parent=self)
             self.slots[__key] = slot
+            self.invalidate_html()
             try:
-                self.get_game().log_new_slot(self, slot)
+                game = self.get_game()
+                if game._journal is not None:
+                    game._journal.append((self._undo_add, __key))
+                game.log_new_slot(self, slot)
             except Component.NotAttachedToComponentTree:
                 pass
         slot.set(__value)
 
     def __delitem__(self, __key: Key):
+        journal = self.get_journal()
+        if journal is not None:
+            journal.append((self._restore_slots, dict(self.slots)))  # a copy, to restore the order of the keys
         del self.slots[__key]
+        self.invalidate_html()
         try:
-            self.get_game().log_delete_slot(self, __key)
+            self.get_game().log_delete_slot(self, str(__key))
         except Component.NotAttachedToComponentTree:
             pass
 
@@ -128,3 +360,17 @@ class Dict(Component, Generic[Key, T], MutableMapping[Key, T]):
 
     def __iter__(self) -> Iterator[Key]:
         return iter(self.slots)
+
+    def _undo_add(self, key: Key):
+        del self.slots[key]
+        self.invalidate_html()
+
+    def _restore_slots(self, slots: dict[Key, ComponentSlot]):
+        self.slots = slots
+        self.invalidate_html()
+
+    # override
+    def __copy__(self) -> "Dict[Key, T]":
+        copy = super().__copy__()
+        copy.slots = {key: slot.copy_to(copy) for key, slot in self.slots.items()}
+        return copy
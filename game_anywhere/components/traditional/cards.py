@@ -2,10 +2,13 @@ from enum import Enum, unique, auto
 from typing import Iterable, TypeVar, Generic, Any
 import random
 from ..component import Component
+from ..containers import List
 from ...ui import Html, tag
 
 
 class PokerCard(Component):
+    __slots__ = ("color", "value")
+
     @unique
     class Color(Enum):
         SPADES = auto()
@@ -33,6 +36,8 @@ class PokerCard(Component):
         QUEEN = 12
         KING = 13
 
+        __slots__ = ("value",)
+
         def __init__(self, value: int):
             assert 1 <= value <= 13
             self.value = value
@@ -64,6 +69,7 @@ class PokerCard(Component):
             return (Value(i + 1) for i in range(13))
 
     def __init__(self, color: "PokerCard.Color", value: "PokerCard.Value"):
+        super().__init__()
         self.color = color
         self.value = value
 
@@ -88,36 +94,133 @@ T = TypeVar("T")
 
 
 class Deck(Generic[T], Component):
-    def __init__(self, cards: Iterable[T], shuffled=False):
+    """
+    The cards are drawn from the end of a list that is never resized: only the number of cards left changes,
+    so drawing (and undoing it, see Game.rollback()) costs O(1) per card.
+    The bulk operations send one update for the deck and all the lists the cards go to.
+    """
+
+    __slots__ = ("cards", "nb_cards", "_cards_shared")
+
+    class Empty(IndexError):
+        pass
+
+    def __init__(self, cards: Iterable[T], shuffled=False, rng: random.Random | None = None):
+        super().__init__()
         self.cards = list(cards)
+        # cards[:nb_cards] are in the deck, the others were drawn
+        self.nb_cards = len(self.cards)
+        self._cards_shared = False  # with a copy, see __copy__()
         if shuffled:
-            self.shuffle()
+            self.shuffle(rng)
+
+    def shuffle(self, rng: random.Random | None = None):
+        """ Games should pass their own RNG (Game.random), so that they can be replayed """
+        remaining = self.cards[:self.nb_cards]
+        journal = self.get_journal()
+        if journal is not None:
+            journal.append((self._restore_cards, list(remaining)))
+        (rng or random).shuffle(remaining)
+        self._unshare_cards()
+        self.cards[:self.nb_cards] = remaining
+
+    def draw(self, n=1) -> T | list[T]:
+        """ One card, or a list of n cards """
+        cards = self._take(n)
+        self.log_update()
+        return cards[0] if n == 1 else cards
+
+    def draw_into(self, target: "List[T]", n=1):
+        """ Draws n cards and appends them to the list """
+        with self.transaction():
+            target.extend(self._take(n))
+            self.log_update()
+
+    def deal(self, targets: Iterable["List[T]"], n=1):
+        """ Draws n cards for each list, e.g. the hands of the players """
+        with self.transaction():
+            for target in targets:
+                target.extend(self._take(n))
+            self.log_update()
+
+    def burn(self, n=1, discard_pile: "DiscardPile[T] | None" = None):
+        """ Draws n cards without revealing them, and puts them on the discard pile if there is one """
+        with self.transaction():
+            cards = self._take(n)
+            if discard_pile is not None:
+                discard_pile.extend(cards)
+            self.log_update()
+
+    def _take(self, n: int) -> list[T]:
+        if n > self.nb_cards:
+            raise Deck.Empty(f"Can't draw {n} cards, only {self.nb_cards} left")
+        journal = self.get_journal()
+        if journal is not None:
+            journal.append((self._restore_nb_cards, self.nb_cards))
+        self.nb_cards -= n
+        self.invalidate_html()  # the number of cards changes
+        cards = self.cards[self.nb_cards:self.nb_cards + n]
+        if self._cards_shared:
+            # the other deck may draw the same cards: a leaf card is copied when it is moved (see
+            # WeakComponentSlot._set_content()), any other component is copied here
+            cards = [card.__copy__() if isinstance(card, Component) and not card._is_leaf else card for card in cards]
+        return cards
 
-    def shuffle(self):
-        random.shuffle(self.cards)
+    def html(self, viewer_id=None) -> Html:
+        return tag.div(f"Deck with {self.nb_cards} cards")
 
-    def draw(self, n=1) -> T:
-        if n == 1:
-            return self.cards.pop()
-        else:
-            cards_drawn = self.cards[-n:]
-            self.cards = self.cards[:-n]
-            return cards_drawn
+    def _restore_nb_cards(self, nb_cards: int):
+        self.nb_cards = nb_cards
+        self.invalidate_html()
 
-    def html(self, viewer_id=None) -> Html:
-        return tag.div("Deck with", len(self.cards), "cards")
+    def _restore_cards(self, cards: list[T]):
+        self._unshare_cards()
+        self.cards[:len(cards)] = cards
+
+    def _unshare_cards(self):
+        """ Before the order of the cards changes: the list is shared with a copy until then """
+        if self._cards_shared:
+            self.cards = list(self.cards)
+            self._cards_shared = False
+
+    # override
+    def __copy__(self) -> "Deck[T]":
+        copy = super().__copy__()
+        # Drawing doesn't change the list, only nb_cards: both decks keep it until one of them shuffles
+        self._cards_shared = copy._cards_shared = True
+        return copy
 
 
 class DiscardPile(Generic[T], Component):
+    __slots__ = ("cards",)
+
     def __init__(self):
         super().__init__()
         self.cards: list[T] = []
 
     def append(self, card: T):
-        self.cards.append(card)
+        self.extend((card,))
+
+    def extend(self, cards: Iterable[T]):
+        journal = self.get_journal()
+        if journal is not None:
+            journal.append((self._truncate, len(self.cards)))
+        self.cards.extend(cards)
+        self.invalidate_html()
+        self.log_update()
+
+    def _truncate(self, nb_cards: int):
+        del self.cards[nb_cards:]
+        self.invalidate_html()
 
     def html(self, viewer_id=None):
-        return tag.div("Discard pile with", len(self.cards), "cards")
+        return tag.div(f"Discard pile with {len(self.cards)} cards")
+
+    # override
+    def __copy__(self) -> "DiscardPile[T]":
+        copy = super().__copy__()
+        copy.cards = list(self.cards)
+        return copy
 
 
 def fiftytwo_cards() -> Iterable[PokerCard]:
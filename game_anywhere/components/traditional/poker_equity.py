@@ -0,0 +1,89 @@
+"""
+Monte Carlo equity of Texas hold'em hands.
+
+equities() completes the board (and the unknown hands) at random, many times, and counts how often each hand wins.
+The samples are drawn and scored in batches of numpy arrays of card indices (see poker_hands.card_index()),
+so no Python object is created per sample. Needs numpy.
+"""
+import time
+from typing import NamedTuple, Optional, Sequence
+
+from .poker_hands import evaluate_hands, np
+
+BOARD_SIZE = 5
+HAND_SIZE = 2
+
+
+class Equity(NamedTuple):
+    win: float  # fraction of the samples where this hand is the only winner
+    tie: float  # fraction of the samples where this hand shares the pot
+    share: float  # expected fraction of the pot, i.e. win plus the split pots
+
+    def __str__(self):
+        return f"{self.share:.1%}"
+
+
+def equities(
+    hands: Sequence[Optional[Sequence[int]]],
+    board: Sequence[int] = (),
+    samples: int = 10000,
+    time_limit: Optional[float] = None,
+    batch_size: int = 2000,
+    rng: Optional["np.random.Generator"] = None,
+) -> tuple[list[Equity], int]:
+    """
+    The equity of each hand, and the number of samples it was computed with.
+    `hands` are the hole cards of the players still in the game; None for a hand that is not known, e.g. the hands of
+    the opponents when a bot estimates its own equity. `board` are the community cards revealed so far.
+    Without `time_limit`, `samples` samples are drawn. With a `time_limit` in seconds, as many batches as fit are drawn
+    instead (at least one), e.g. time_limit=0.02 to run during a betting round without stalling the game.
+    """
+    if np is None:
+        raise RuntimeError("equities() needs numpy")
+    if rng is None:
+        rng = np.random.default_rng()
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    known_cards = [card for hand in hands if hand is not None for card in hand] + list(board)
+    remaining = np.setdiff1d(np.arange(52), known_cards)
+    if len(remaining) + len(known_cards) != 52:
+        raise ValueError("The same card is dealt twice")
+    nb_players = len(hands)
+    nb_missing = BOARD_SIZE - len(board)
+    unknown_hands = [player for player, hand in enumerate(hands) if hand is None]
+    nb_drawn = nb_missing + HAND_SIZE * len(unknown_hands)
+
+    # Each sample has 7 cards per player: the board, then the hand. Known cards are the same for every sample
+    template = np.empty((nb_players, BOARD_SIZE + HAND_SIZE), dtype=np.int64)
+    template[:, :len(board)] = board
+    for player, hand in enumerate(hands):
+        if hand is not None:
+            template[player, BOARD_SIZE:] = hand
+
+    wins = np.zeros(nb_players)
+    shares = np.zeros(nb_players)
+    ties = np.zeros(nb_players)
+    nb_samples = 0
+    while True:
+        size = batch_size if deadline is not None else min(batch_size, samples - nb_samples)
+        if size <= 0:
+            break
+        # A random subset of the remaining cards for each sample: the indices of the nb_drawn smallest random keys
+        drawn = remaining[np.argpartition(rng.random((size, len(remaining))), nb_drawn - 1, axis=1)[:, :nb_drawn]]
+        cards = np.broadcast_to(template, (size, *template.shape)).copy()
+        cards[:, :, len(board):BOARD_SIZE] = drawn[:, None, :nb_missing]
+        cards[:, unknown_hands, BOARD_SIZE:] = drawn[:, nb_missing:].reshape(size, len(unknown_hands), HAND_SIZE)
+        scores = evaluate_hands(cards)  # shape (size, nb_players)
+        winners = scores == scores.max(axis=1, keepdims=True)
+        nb_winners = winners.sum(axis=1, keepdims=True)
+        wins += (winners & (nb_winners == 1)).sum(axis=0)
+        ties += (winners & (nb_winners > 1)).sum(axis=0)
+        shares += (winners / nb_winners).sum(axis=0)
+        nb_samples += size
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+
+    return [
+        Equity(win / nb_samples, tie / nb_samples, share / nb_samples)
+        for win, tie, share in zip(wins.tolist(), ties.tolist(), shares.tolist())
+    ], nb_samples
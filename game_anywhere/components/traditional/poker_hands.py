@@ -0,0 +1,191 @@
+"""
+Fast poker hand evaluation.
+
+evaluate_hand() scores 5 to 7 cards into a single int, and the best hand gets the highest score.
+It only does a few table lookups: the tables are built once, and cached on disk because building them takes a while,
+in the cache directory of the user (not in the installed package, which may be read-only or shared).
+Cards are represented by their index, see card_index(): rank * 4 + suit, where rank 0 is a 2 and rank 12 an ace.
+If numpy is installed, evaluate_hands() scores many hands at once, with the same tables stored as arrays.
+"""
+import os
+import pickle
+from itertools import combinations_with_replacement
+from pathlib import Path
+from typing import Iterable
+
+from .cards import PokerCard
+
+try:
+    import numpy as np
+except ImportError:
+    # evaluate_hands() is not available then
+    np = None
+
+HIGH_CARD, PAIR, TWO_PAIRS, THREE_OF_A_KIND, STRAIGHT, FLUSH, FULL_HOUSE, FOUR_OF_A_KIND, STRAIGHT_FLUSH = range(9)
+CATEGORY_NAMES = [
+    "high_card",
+    "pair",
+    "two_pairs",
+    "three_of_a_kind",
+    "straight",
+    "flush",
+    "full_house",
+    "four_of_a_kind",
+    "straight_flush",
+]
+
+# One prime per rank: the product of the primes of the cards identifies the ranks of a hand, in any order
+PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+SUITS = list(PokerCard.Color)
+
+CACHE_VERSION = 1
+CACHE_DIRECTORY = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "game_anywhere"
+CACHE_FILE = CACHE_DIRECTORY / f"poker_hands.v{CACHE_VERSION}.pickle"
+
+
+def card_index(card: PokerCard) -> int:
+    rank = (int(card.value) - 2) % 13  # aces are high
+    return rank * 4 + SUITS.index(card.color)
+
+
+def hand_category(score: int) -> str:
+    return CATEGORY_NAMES[score >> 20]
+
+
+def _score(category: int, ranks: Iterable[int]) -> int:
+    """ The category, then up to 5 ranks in decreasing importance, 4 bits each """
+    score = category
+    nb_ranks = 0
+    for rank in ranks:
+        score = score << 4 | rank
+        nb_ranks += 1
+    return score << 4 * (5 - nb_ranks)
+
+
+def _straight_high_card(rank_mask: int) -> int | None:
+    for high in range(12, 3, -1):
+        if rank_mask >> (high - 4) & 0b11111 == 0b11111:
+            return high
+    if rank_mask & 0b1000000001111 == 0b1000000001111:
+        return 3  # A-2-3-4-5, the five is the highest card
+    return None
+
+
+def _score_flush(rank_mask: int) -> int:
+    """ The best hand made of cards of the same suit """
+    high = _straight_high_card(rank_mask)
+    if high is not None:
+        return _score(STRAIGHT_FLUSH, [high])
+    return _score(FLUSH, [rank for rank in range(12, -1, -1) if rank_mask >> rank & 1][:5])
+
+
+def _score_ranks(ranks: tuple[int, ...]) -> int:
+    """ The best hand that is not a flush, for the given ranks (with repetitions) """
+    counts = [0] * 13
+    for rank in ranks:
+        counts[rank] += 1
+    # Ranks by decreasing count, then decreasing rank
+    by_count = sorted((rank for rank in range(13) if counts[rank]), key=lambda rank: (counts[rank], rank), reverse=True)
+    first, second = counts[by_count[0]], counts[by_count[1]] if len(by_count) > 1 else 0
+
+    def kickers(*excluded: int) -> list[int]:
+        return [rank for rank in range(12, -1, -1) if counts[rank] and rank not in excluded]
+
+    if first == 4:
+        return _score(FOUR_OF_A_KIND, [by_count[0], kickers(by_count[0])[0]])
+    if first == 3 and second >= 2:
+        return _score(FULL_HOUSE, by_count[:2])
+    high = _straight_high_card(sum(1 << rank for rank in by_count))
+    if high is not None:
+        return _score(STRAIGHT, [high])
+    if first == 3:
+        return _score(THREE_OF_A_KIND, [by_count[0]] + kickers(by_count[0])[:2])
+    if first == 2 and second == 2:
+        return _score(TWO_PAIRS, by_count[:2] + kickers(*by_count[:2])[:1])
+    if first == 2:
+        return _score(PAIR, [by_count[0]] + kickers(by_count[0])[:3])
+    return _score(HIGH_CARD, kickers()[:5])
+
+
+def _build_tables() -> tuple[dict[int, int], list[int]]:
+    rank_table = {}
+    for nb_cards in (5, 6, 7):
+        for ranks in combinations_with_replacement(range(13), nb_cards):
+            if any(ranks.count(rank) > 4 for rank in set(ranks)):
+                continue
+            key = 1
+            for rank in ranks:
+                key *= PRIMES[rank]
+            rank_table[key] = _score_ranks(ranks)
+    flush_table = [0] * (1 << 13)
+    for rank_mask in range(1 << 13):
+        if rank_mask.bit_count() >= 5:
+            flush_table[rank_mask] = _score_flush(rank_mask)
+    return rank_table, flush_table
+
+
+def _load_tables() -> tuple[dict[int, int], list[int]]:
+    try:
+        with open(CACHE_FILE, "rb") as file:
+            return pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    tables = _build_tables()
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(CACHE_FILE, "wb") as file:
+            pickle.dump(tables, file, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass  # e.g. no writable home directory, the tables are rebuilt next time
+    return tables
+
+
+RANK_TABLE, FLUSH_TABLE = _load_tables()
+
+
+def evaluate_hand(cards: Iterable[int]) -> int:
+    """
+    Score of the best 5-card hand among 5 to 7 cards, given by their index (see card_index()).
+    Higher is better, and equal scores are ties.
+    """
+    key = 1
+    suit_masks = [0, 0, 0, 0]
+    for card in cards:
+        rank = card >> 2
+        key *= PRIMES[rank]
+        suit_masks[card & 3] |= 1 << rank
+    # With at most 7 cards, a hand with 5 cards of the same suit can't contain a four of a kind or a full house
+    for suit_mask in suit_masks:
+        if suit_mask.bit_count() >= 5:
+            return FLUSH_TABLE[suit_mask]
+    return RANK_TABLE[key]
+
+
+def evaluate_poker_cards(cards: Iterable[PokerCard]) -> int:
+    return evaluate_hand(card_index(card) for card in cards)
+
+
+if np is not None:
+    # The same tables as arrays: RANK_TABLE is looked up with a binary search in its sorted keys
+    _PRIME_ARRAY = np.array(PRIMES, dtype=np.int64)
+    _RANK_KEYS = np.array(sorted(RANK_TABLE), dtype=np.int64)
+    _RANK_SCORES = np.array([RANK_TABLE[key] for key in _RANK_KEYS.tolist()], dtype=np.int32)
+    _FLUSH_SCORES = np.array(FLUSH_TABLE, dtype=np.int32)
+    # Bit of each card in a 52-bit mask with one group of 13 bits per suit, so that the rank mask of a suit is a shift
+    _SUIT_BITS = np.array([1 << (card & 3) * 13 + (card >> 2) for card in range(52)], dtype=np.int64)
+
+
+def evaluate_hands(cards: "np.ndarray") -> "np.ndarray":
+    """
+    Vectorized evaluate_hand(): `cards` is an integer array of shape (..., nb_cards) with 5 <= nb_cards <= 7,
+    and the result holds the score of each hand, with shape (...). Needs numpy.
+    """
+    if np is None:
+        raise RuntimeError("evaluate_hands() needs numpy")
+    cards = np.asarray(cards)
+    scores = _RANK_SCORES[np.searchsorted(_RANK_KEYS, _PRIME_ARRAY[cards >> 2].prod(axis=-1))]
+    suit_masks = _SUIT_BITS[cards].sum(axis=-1)  # the cards are distinct, so the sum is a bitwise or
+    for suit in range(4):
+        # As in evaluate_hand(), a flush beats any other hand of the same cards; FLUSH_TABLE is 0 for less than 5 cards
+        np.maximum(scores, _FLUSH_SCORES[suit_masks >> 13 * suit & 0x1FFF], out=scores)
+    return scores
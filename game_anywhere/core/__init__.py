@@ -1,3 +1,3 @@
-from .agent import Agent
-from .turn_based_game import TurnBasedGame
-from .game import Game, GameSummary, SimpleGameSummary
+from .agent import Agent, AsyncAgent
+from .turn_based_game import TurnBasedGame, AsyncTurnBasedGame
+from .game import Game, AsyncGame, GameSummary, SimpleGameSummary
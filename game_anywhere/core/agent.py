@@ -1,5 +1,8 @@
-from typing import Any, TypeVar, Union, Optional
+import asyncio
+from collections import deque
+from typing import Any, Callable, TypeVar, Union, Optional
 from abc import ABC, abstractmethod
+from weakref import WeakKeyDictionary
 
 from game_anywhere.protocols import JsonSchema
 
@@ -62,3 +65,188 @@ class Agent(ABC):
 
     def get_2D_choice(self, dimensions: tuple[int, int]):
         return tuple(self.int_choice(min=0, max=dim - 1) for dim in dimensions)
+
+
+class AsyncAgent(ABC):
+    """
+    An agent whose choices are coroutines, so that the game waiting for them doesn't block a thread, see AsyncGame.
+    message() and update() must not block either.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @abstractmethod
+    def message(self, message: str, **kwargs) -> None: ...
+
+    @abstractmethod
+    def update(self, diff: list[Any]): ...
+
+    @abstractmethod
+    async def query(self, allowedSchema: JsonSchema): ...
+
+    @abstractmethod
+    async def choose_one_component_slot(
+        self,
+        slots: list["ComponentSlot"],
+        indices: Optional[list[T]] = None,
+        special_options: list[U] = [],
+        message: str|None = None,
+    ) -> Union[T, U]: ...
+
+    @abstractmethod
+    async def text_choice(self, options: list[str]) -> str: ...
+
+    @abstractmethod
+    async def int_choice(self, min: int | None = 0, max: int | None = None) -> int: ...
+
+    async def boolean_choice(self, message: str) -> bool:
+        self.message(message + "? [yes/no]")
+        return await self.text_choice(["yes", "no"]) == "yes"
+
+    @abstractmethod
+    def chat_stream(self, event_loop: "asyncio.AbstractEventLoop") -> ChatStream: ...
+
+    async def get_2D_choice(self, dimensions: tuple[int, int]):
+        return tuple([await self.int_choice(min=0, max=dim - 1) for dim in dimensions])
+
+
+class AsyncAgentAdapter(AsyncAgent):
+    """
+    Lets an AsyncGame be played by a synchronous Agent, e.g. a bot or a ReplayAgent.
+    The agent is called directly, so it blocks the event loop while it chooses: this is for agents that answer at once.
+    """
+
+    def __init__(self, agent: Agent):
+        super().__init__(agent.name)
+        self.agent = agent
+
+    # override
+    def message(self, message: str, **kwargs) -> None:
+        self.agent.message(message, **kwargs)
+
+    # override
+    def update(self, diff: list[Any]):
+        self.agent.update(diff)
+
+    # override
+    async def query(self, allowedSchema: JsonSchema):
+        return self.agent.query(allowedSchema)
+
+    # override
+    async def choose_one_component_slot(self, slots, indices=None, special_options=[], message=None):
+        kwargs = {} if message is None else {"message": message}  # not all agents accept a message
+        return self.agent.choose_one_component_slot(slots, indices, special_options, **kwargs)
+
+    # override
+    async def text_choice(self, options: list[str]) -> str:
+        return self.agent.text_choice(options)
+
+    # override
+    async def int_choice(self, min: int | None = 0, max: int | None = None) -> int:
+        return self.agent.int_choice(min, max)
+
+    # override
+    async def boolean_choice(self, message: str) -> bool:
+        return self.agent.boolean_choice(message)
+
+    # override
+    def chat_stream(self, event_loop: "asyncio.AbstractEventLoop") -> ChatStream:
+        return self.agent.chat_stream(event_loop)
+
+    # override
+    async def get_2D_choice(self, dimensions: tuple[int, int]):
+        return self.agent.get_2D_choice(dimensions)
+
+
+class ThreadBridge:
+    """
+    Runs functions on an event loop for other threads, e.g. the messages that a game thread sends to its agents.
+    The calls are appended to a deque, which is thread-safe, and the loop is woken up once per burst of calls, instead
+    of once per call with loop.call_soon_threadsafe(), or with a future and a task per call with
+    asyncio.run_coroutine_threadsafe(). The calls of a thread are run in order.
+    """
+
+    _bridges: WeakKeyDictionary["asyncio.AbstractEventLoop", "ThreadBridge"] = WeakKeyDictionary()
+
+    @staticmethod
+    def of(loop: "asyncio.AbstractEventLoop") -> "ThreadBridge":
+        """ The bridge to the loop, which is shared by all threads """
+        bridge = ThreadBridge._bridges.get(loop)
+        if bridge is None:
+            bridge = ThreadBridge._bridges.setdefault(loop, ThreadBridge(loop))
+        return bridge
+
+    def __init__(self, loop: "asyncio.AbstractEventLoop"):
+        self.loop = loop
+        self.calls: deque[tuple[Callable, tuple]] = deque()
+        self.wakeup_pending = False
+
+    def call_soon(self, function: Callable, *args) -> None:
+        """ Can be called from any thread """
+        self.calls.append((function, args))
+        # if a wakeup is pending, the loop hasn't started running the calls yet, and it will run this one too
+        if not self.wakeup_pending:
+            self.wakeup_pending = True
+            self.loop.call_soon_threadsafe(self._run_calls)
+
+    def _run_calls(self) -> None:
+        self.wakeup_pending = False
+        while self.calls:
+            function, args = self.calls.popleft()
+            try:
+                function(*args)
+            except Exception as err:
+                self.loop.call_exception_handler({"message": f"Exception in {function}", "exception": err})
+
+
+class BlockingAgentAdapter(Agent):
+    """
+    Lets a synchronous game, played on its own thread, be played by an AsyncAgent that runs on an event loop,
+    e.g. an AsyncNetworkAgent on the loop of the server. Each choice blocks the game thread until it is made.
+    """
+
+    def __init__(self, agent: AsyncAgent, loop: "asyncio.AbstractEventLoop"):
+        super().__init__(agent.name)
+        self.agent = agent
+        self.loop = loop
+        self.bridge = ThreadBridge.of(loop)
+
+    def _wait_for(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    # override
+    def message(self, message: str, **kwargs) -> None:
+        self.bridge.call_soon(lambda: self.agent.message(message, **kwargs))
+
+    # override
+    def update(self, diff: list[Any]):
+        self.bridge.call_soon(self.agent.update, diff)
+
+    # override
+    def query(self, allowedSchema: JsonSchema):
+        return self._wait_for(self.agent.query(allowedSchema))
+
+    # override
+    def choose_one_component_slot(self, slots, indices=None, special_options=[], message=None):
+        return self._wait_for(self.agent.choose_one_component_slot(slots, indices, special_options, message))
+
+    # override
+    def text_choice(self, options: list[str]) -> str:
+        return self._wait_for(self.agent.text_choice(options))
+
+    # override
+    def int_choice(self, min: int | None = 0, max: int | None = None) -> int:
+        return self._wait_for(self.agent.int_choice(min, max))
+
+    # override
+    def boolean_choice(self, message: str) -> bool:
+        return self._wait_for(self.agent.boolean_choice(message))
+
+    # override
+    def chat_stream(self, event_loop: "asyncio.AbstractEventLoop") -> ChatStream:
+        return self.agent.chat_stream(event_loop)
+
+    # override
+    def get_2D_choice(self, dimensions: tuple[int, int]):
+        return self._wait_for(self.agent.get_2D_choice(dimensions))
@@ -1,10 +1,15 @@
-from typing import Any, NoReturn, Union
+from typing import Any, Callable, NoReturn, Union, Optional
 from abc import ABC, abstractmethod
+import asyncio
+import queue
+import random
+import threading
+from weakref import WeakValueDictionary
 
 from game_anywhere.components import Component
 
-from .agent import Agent, AgentId
-from ..components.component import ComponentOrGame, WeakComponentSlot
+from .agent import Agent, AgentId, AsyncAgent, AsyncAgentAdapter
+from ..components.component import ComponentOrGame, WeakComponentSlot, shallow_copy, viewer_bit
 from ..components.utils import html
 from ..ui import tag
 
@@ -24,6 +29,29 @@ class SimpleGameSummary(GameSummary):
         return self.winner
 
 
+def coalesce_diffs(diffs: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Removes the diffs that are made obsolete by a later diff in the same list, e.g. a replace that is followed by
+    another replace of the same address, or of one of its parents (the parent's new HTML contains the child anyway).
+    "add" and "move" diffs are always kept, and the relative order of the remaining diffs is preserved.
+    """
+    overwritten: set[str] = set()  # addresses whose content is replaced or removed later in the list
+    result = []
+    for diff in reversed(diffs):
+        if diff["op"] == "replace":
+            key = diff["key"]
+            while key and key not in overwritten:
+                key = key.rpartition("/")[0]
+            if key:  # this address or one of its parents is overwritten later
+                continue
+            overwritten.add(diff["key"])
+        elif diff["op"] == "remove":
+            overwritten.add(diff["key"])
+        result.append(diff)
+    result.reverse()
+    return result
+
+
 """
 Represents a game in progress.
 """
@@ -43,11 +71,125 @@ class Game(ComponentOrGame):
     - play_game is called (typically)
     """
 
-    def __init__(self, agent_descriptions: list["AgentDescriptor"]):
-        super().__init__()
+    class Transaction:
+        """
+        Holds back all updates sent to the agents, and sends them as one (coalesced) list per agent when it ends.
+        Transactions can be nested; only the outermost one sends the updates.
+        Usage: `with game.transaction(): ...`
+        """
+
+        def __init__(self, game: "Game"):
+            self.game = game
+
+        def __enter__(self) -> "Game.Transaction":
+            if self.game._transaction_depth == 0:
+                self.game._pending_updates = [[] for _ in self.game.agents]
+                self.game._pending_spectator_updates = []
+            self.game._transaction_depth += 1
+            return self
+
+        def __exit__(self, exc_type, exc_val, exc_tb):
+            self.game._transaction_depth -= 1
+            if self.game._transaction_depth == 0:
+                # The component tree was modified even if there was an exception, so the agents need to know
+                self.game.flush_updates()
+                self.game._pending_updates = None
+                self.game._pending_spectator_updates = None
+
+    class FlushingAgent:
+        """
+        An agent of the game, see set_agents(). The updates held back by a transaction are sent before it is asked a
+        question, so that its player sees the changes that it is asked about. The game is idle while it waits for the
+        answer, see set_idle(). Everything else is the agent's own
+        """
+        CHOICES = frozenset((
+            "query", "choose_one_component_slot", "text_choice", "int_choice", "boolean_choice", "get_2D_choice"
+        ))
+        __slots__ = ("agent", "game")
+
+        def __init__(self, agent: Agent | AsyncAgent, game: "Game"):
+            self.agent = agent
+            self.game = game
+
+        def __getattr__(self, name: str) -> Any:
+            attribute = getattr(self.agent, name)
+            if name not in Game.FlushingAgent.CHOICES:
+                return attribute
+
+            def choice(*args, **kwargs):
+                self.game.flush_updates()
+                self.game.set_idle(True)
+                try:
+                    return attribute(*args, **kwargs)
+                finally:
+                    self.game.set_idle(False)
+            return choice
+
+    class IdleCalls:
+        """
+        The calls that wait for the game to be idle, see call_when_idle(). A copy of the game gets its own, empty
+        """
+        __slots__ = ("idle", "calls", "lock")
+
+        def __init__(self):
+            self.idle = True
+            # Appended to without a lock, so that the event loop never waits for the game
+            self.calls: queue.SimpleQueue[Callable[[], None]] = queue.SimpleQueue()
+            # Held by the game's thread while it becomes idle or stops being idle, and while the calls run
+            self.lock = threading.Lock()
+
+        def __reduce__(self):
+            return Game.IdleCalls, ()
+
+        def run(self):
+            """ With the lock held """
+            while True:
+                try:
+                    call = self.calls.get_nowait()
+                except queue.Empty:
+                    return
+                call()
+
+    # Attributes of the game that are not in the component tree, and that checkpoint() saves.
+    # They need to be replaced rather than modified in place, e.g. an immutable position, or an int
+    checkpointed_attributes: tuple[str, ...] = ()
+
+    class SourceModified(Exception):
+        """ The game was modified while a clone of it was in use, see clone() """
+        pass
+
+    def __init__(self, agent_descriptions: list["AgentDescriptor"], seed: Optional[int] = None):
         nb_agents = len(agent_descriptions)
         # TODO: maybe a state pattern with AgentDescriptors and Agents, instead of setting them to None at the beginning
         self.agents: list[Agent]|list[None] = [None] * nb_agents
+        # All randomness of the game should come from self.random, so that a game can be replayed from its seed
+        self.seed = seed if seed is not None else random.randrange(1 << 63)
+        self.random = random.Random(self.seed)
+        # A headless game sends no updates to its agents, e.g. when it is replayed
+        self.headless = False
+        # If not None, the updates that the spectators would get are appended to it, e.g. for a ReplayArchive
+        self.spectator_updates: Optional[list[dict[str, Any]]] = None
+        # If not None, called with the updates that the spectators get, like Agent.update(), e.g. by a server room that
+        # has spectators
+        self.spectator_feed: Optional[Callable[[list[dict[str, Any]]], None]] = None
+        self._transaction_depth = 0
+        # One list of diffs per agent, or None if there is no transaction going on
+        self._pending_updates: list[list[dict[str, Any]]] | None = None
+        self._pending_spectator_updates: list[dict[str, Any]] | None = None
+        # Reverse index of WeakComponentSlot.get_address(), or None if it is off, see index_slot_addresses()
+        self._slots_by_address: Optional[WeakValueDictionary[str, WeakComponentSlot]] = None
+        # Incremented whenever the component tree changes, see invalidate_html()
+        self._version = 0
+        # The game this one is a clone of, and its version at that time
+        self._source: Optional[Game] = None
+        self._source_version = 0
+        # The inverse operations of the changes since the first checkpoint, or None if there's no checkpoint.
+        # Each entry is a (function, argument) pair, see rollback()
+        self._journal: Optional[list[tuple[Callable[[Any], None], Any]]] = None
+        # Whether the game is waiting, and the calls that wait for it, see call_when_idle()
+        self._idle_calls = Game.IdleCalls()
+        # Last, because the slots that have an initial content already use the state above (see WeakComponentSlot.set())
+        super().__init__()
 
     @classmethod
     def parse_config(cls, config: list[str]|None) -> tuple[int, dict[str, Any]]:
@@ -70,25 +212,253 @@ class Game(ComponentOrGame):
         """ The Game can be seen by everybody. """
         return True
 
+    # override
+    def get_visibility_mask(self) -> int:
+        return viewer_bit(len(self.agents)) - 1
+
+    # override
+    def invalidate_html(self):
+        # The HTML of the Game itself is not cached, but all changes to the tree end up here
+        self._version += 1
+
+    def get_viewers(self) -> list[AgentId | None]:
+        """ All agent IDs, plus None for the spectators """
+        return [None, *range(len(self.agents))]
+
+    def clone(self) -> "Game":
+        """
+        A copy of the game, e.g. to try out moves in a search. It has no agents, and doesn't send any updates.
+        The component tree is copied on write: the clone shares it with this game, and copies a component only when
+        it accesses it (see WeakComponentSlot._unshare()). So this game must not be modified while the clone is
+        in use, otherwise the clone raises SourceModified. The other attributes of the game are copied shallowly,
+        games that modify mutable attributes in place need to override this.
+        """
+        clone = shallow_copy(self)
+        clone.agents = [None] * len(self.agents)
+        clone._transaction_depth = 0
+        clone._pending_updates = None
+        clone._pending_spectator_updates = None
+        clone._journal = None
+        clone._slots_by_address = None
+        clone._idle_calls = Game.IdleCalls()
+        clone.spectator_updates = None
+        clone.spectator_feed = None
+        clone.random = random.Random()
+        clone.random.setstate(self.random.getstate())
+        clone._source = self
+        clone._source_version = self._version
+        if self._slots:
+            clone._slots = [slot.copy_to(clone) for slot in self._slots]
+        return clone
+
+    def check_source_unchanged(self):
+        game = self
+        while game._source is not None:
+            if game._source._version != game._source_version:
+                raise Game.SourceModified()
+            game = game._source
+
+    def checkpoint(self) -> int:
+        """
+        Starts recording the changes to the component tree, so that they can be undone with rollback(checkpoint).
+        E.g. for a search that plays moves and takes them back. Checkpoints can be nested.
+        Until the first checkpoint is rolled back or committed, no updates are sent to the agents.
+        """
+        if self._journal is None:
+            self._journal = []
+        checkpoint = len(self._journal)
+        if self.checkpointed_attributes:
+            self._journal.append((self._restore_attributes, [getattr(self, name) for name in self.checkpointed_attributes]))
+        return checkpoint
+
+    def rollback(self, checkpoint: int):
+        """ Undoes all changes since the checkpoint, without sending any update """
+        journal = self._journal
+        for undo, argument in reversed(journal[checkpoint:]):
+            undo(argument)
+        del journal[checkpoint:]
+        if checkpoint == 0:
+            self._journal = None
+
+    def commit(self, checkpoint: int):
+        """
+        Keeps the changes since the checkpoint. They can still be undone by rolling back an earlier checkpoint;
+        if there's none, the agents get the updates that were held back since the checkpoint.
+        """
+        if checkpoint != 0:
+            return
+        journal = self._journal
+        self._journal = None
+        # One update per slot that changed, and one for the whole component if slots were added or removed
+        changed_slots = {}
+        for undo, _ in journal:
+            target = undo.__self__
+            if isinstance(target, Component):
+                target = target.slot
+            if isinstance(target, WeakComponentSlot):
+                changed_slots[target] = None
+        with self.transaction():
+            for slot in changed_slots:
+                try:
+                    self.log_component_update(slot, slot.get())
+                except Component.NotAttachedToComponentTree:
+                    pass  # the slot was removed from the tree
+
+    def _restore_attributes(self, values: list[Any]):
+        for name, value in zip(self.checkpointed_attributes, values):
+            setattr(self, name, value)
+
+    def index_slot_addresses(self):
+        """
+        Opt-in: keeps an index from address to slot, so that get_slot_by_address() resolves the answers of clients in
+        O(1), e.g. on a server. It is kept up to date with the updates that the agents get (see log_new_slot(),
+        log_delete_slot() and log_component_update()), so it is turned on once the agents are set
+        """
+        self._slots_by_address = WeakValueDictionary()
+        for _, slot in self.get_slots():
+            self._index_slot(slot)
+
+    def get_slot_by_address(self, address: str) -> Optional[WeakComponentSlot]:
+        """ The slot that has this address, or None if there is none or if the index is off """
+        if self._slots_by_address is None:
+            return None
+        slot = self._slots_by_address.get(address)
+        if slot is None or slot.get_address() != address:  # e.g. moved by changes that were rolled back
+            return None
+        return slot
+
+    def _index_slot(self, slot: WeakComponentSlot):
+        """ The slot and the slots below it """
+        index = self._slots_by_address
+        slots = [slot]
+        while slots:
+            slot = slots.pop()
+            index[slot.get_address()] = slot
+            content = slot._content
+            # not through a pointer: the slots below are indexed under the address of the component's own slot
+            if isinstance(content, ComponentOrGame) and getattr(content, "slot", None) is slot:
+                slots.extend(child for _, child in content.get_slots())
+
+    def _unindex_slot(self, address: str):
+        """ The slot at this address, which was removed, and the slots below it """
+        slot = self._slots_by_address.pop(address, None)
+        if slot is None:
+            return
+        content = slot._content
+        if isinstance(content, ComponentOrGame) and getattr(content, "slot", None) is slot:
+            for _, child in content.get_slots():
+                self._unindex_slot(child.get_address())
+
     def message(self, *args, **kwargs):
         for agent in self.agents:
             agent.message(*args, **kwargs)
 
-    def log_new_slot(self, obj: ComponentOrGame, slot: WeakComponentSlot):
-        if self.agents[0] is None:
-            return # Return early if the agents are not initialized yet
-        for agent_id, agent in enumerate(self.agents):
+    def transaction(self) -> "Game.Transaction":
+        return Game.Transaction(self)
+
+    def flush_updates(self):
+        """
+        Sends the updates held back by the current transaction right away.
+        The agents call it before each question, see FlushingAgent.
+        """
+        if self._pending_updates is None:
+            return
+        for agent, diffs in zip(self.agents, self._pending_updates):
+            if diffs:
+                agent.update(coalesce_diffs(diffs))
+        self._pending_updates = [[] for _ in self.agents]
+        if self._pending_spectator_updates and self.spectator_feed is not None:
+            self.spectator_feed(coalesce_diffs(self._pending_spectator_updates))
+        self._pending_spectator_updates = []
+
+    def set_idle(self, idle: bool):
+        """
+        Called when the game starts or stops waiting, e.g. for an agent (see FlushingAgent), or before it is played and
+        once it ended. The game must have sent its updates when it becomes idle, and it must not change while it is.
+        Runs the calls that wait, see call_when_idle(): the game is in the same state on both sides of the change
+        """
+        idle_calls = self._idle_calls
+        with idle_calls.lock:
+            idle_calls.idle = idle
+            idle_calls.run()
+
+    def call_when_idle(self, function: Callable[[], None]):
+        """
+        Calls the function while the game is idle and its updates are sent, e.g. to render a view that matches them.
+        Never waits: it is called on the game's thread the next time the game becomes idle or stops being idle, or by
+        run_idle_calls() if that comes first. Can be called from any thread
+        """
+        self._idle_calls.calls.put(function)
+
+    def run_idle_calls(self):
+        """
+        Runs the calls of call_when_idle() if the game is idle now, e.g. while it waits for an agent. It waits while the
+        game changes state, and the calls run here: call it on a worker thread, not on an event loop
+        """
+        idle_calls = self._idle_calls
+        with idle_calls.lock:
+            if idle_calls.idle:
+                idle_calls.run()
+
+    def get_update_recipients(self) -> list[AgentId | None]:
+        """
+        The viewers that get updates: the agents unless the game is headless, and None if spectator_updates or
+        spectator_feed is set
+        """
+        recipients: list[AgentId | None] = [] if self.headless else list(range(len(self.agents)))
+        if self.spectator_updates is not None or self.spectator_feed is not None:
+            recipients.append(None)
+        return recipients
+
+    def send_update(self, agent_id: AgentId | None, diff: dict[str, Any]):
+        if agent_id is None:
+            if self.spectator_updates is not None:
+                self.spectator_updates.append(diff)
+            if self.spectator_feed is not None:
+                if self._pending_spectator_updates is None:
+                    self.spectator_feed([diff])
+                else:
+                    self._pending_spectator_updates.append(diff)
+        elif self._pending_updates is None:
+            self.agents[agent_id].update([diff])
+        else:
+            self._pending_updates[agent_id].append(diff)
+
+    def log_new_slot(self, obj: ComponentOrGame, slot: WeakComponentSlot, before: WeakComponentSlot | None = None):
+        """ The new slot is appended to its parent, or inserted before a slot of the same parent """
+        if self.agents[0] is None or self._journal is not None:
+            return # Return early if the agents are not initialized yet, or if the changes might be rolled back
+        address = slot.get_address()
+        if self._slots_by_address is not None:
+            self._index_slot(slot)
+        # The same update is sent to everybody, so it is created (and serialized) only once
+        update = {"op": "add", "key": address, "value": str(tag.div(id=address))}
+        if before is not None:
+            update["before"] = before.get_address()
+        for agent_id in self.get_update_recipients():
             if obj.can_be_seen_by_recursive(agent_id):
-                update = {"op": "add", "key": slot.get_address(), "value": tag.div(id=slot.get_address())}
-                agent.update([update])
+                self.send_update(agent_id, update)
 
     def log_delete_slot(self, obj: ComponentOrGame, slot_relative_address: str):
-        if self.agents[0] is None:
+        if self.agents[0] is None or self._journal is not None:
+            return
+        update = {"op": "remove", "key": obj.get_slot_address() + "/" + slot_relative_address}
+        if self._slots_by_address is not None:
+            self._unindex_slot(update["key"])
+        for agent_id in self.get_update_recipients():
+            if obj.can_be_seen_by_recursive(agent_id):
+                self.send_update(agent_id, update)
+
+    def log_move_slot(self, obj: ComponentOrGame, slot: WeakComponentSlot, before: WeakComponentSlot | None = None):
+        """ The slot is moved to the end of its parent, or before a slot of the same parent. Its content is unchanged """
+        if self.agents[0] is None or self._journal is not None:
             return
-        for agent_id, agent in enumerate(self.agents):
+        update = {"op": "move", "key": slot.get_address()}
+        if before is not None:
+            update["before"] = before.get_address()
+        for agent_id in self.get_update_recipients():
             if obj.can_be_seen_by_recursive(agent_id):
-                update = {"op": "remove", "key": obj.get_slot_address()}
-                agent.update([update])
+                self.send_update(agent_id, update)
 
     def log_component_update(
         self,
@@ -97,25 +467,58 @@ class Game(ComponentOrGame):
         only_update: int|None = None,
         force_reveal = False,
     ):
+        if self.agents[0] is None or self._journal is not None:
+            # Return early if the agents are not initialized yet, if this is a clone, or if the changes might be rolled back
+            return
         address = slot.get_address()
+        if self._slots_by_address is not None:
+            self._index_slot(slot)  # its new content has new slots
 
         if only_update is None:
-            agents = enumerate(self.agents)
+            agent_ids = self.get_update_recipients()
         else:
-            agents = [(only_update, self.agents[only_update])]
-        if self.agents[0] is None:
-            return # Return early if the agents are not initialized yet
-        for agent_id, agent in agents:
+            agent_ids = [only_update]
+        # Agents that see the same thing get the same update object, which is rendered only once
+        updates_by_render_class: dict[int, dict[str, Any]] = {}
+        for agent_id in agent_ids:
             if force_reveal or slot.can_be_seen_by_recursive(agent_id):
-                agent.update([{"op": "replace", "key": address, "value": html(new_value, viewer_id=agent_id)}])
+                render_class = slot.get_render_class(agent_id)
+                update = updates_by_render_class.get(render_class)
+                if update is None:
+                    value = str(html(new_value, viewer_id=agent_id))
+                    update = updates_by_render_class[render_class] = {"op": "replace", "key": address, "value": value}
+                self.send_update(agent_id, update)
 
     def set_agents(self, agents: list[Agent]):
-        self.agents = agents
+        self.agents = [Game.FlushingAgent(agent, self) for agent in agents]
+        self.set_idle(False)  # it is about to be played, see call_when_idle()
+        # The names of all players are known now, and they might be displayed
+        for _, slot in self.get_slots():
+            slot.clear_html_cache()
 
     @abstractmethod
     def play_game(self) -> GameSummary: ...
 
 
+class AsyncGame(Game):
+    """
+    A game that waits for its agents with await, so that it is played as a coroutine on the event loop of the server
+    instead of on its own thread (see GameRoom). Its agents are AsyncAgents, synchronous agents are adapted.
+    """
+
+    # override
+    def set_agents(self, agents: list[Agent | AsyncAgent]):
+        super().set_agents([agent if isinstance(agent, AsyncAgent) else AsyncAgentAdapter(agent) for agent in agents])
+
+    # override
+    def play_game(self) -> GameSummary:
+        """ Plays the game on a new event loop, e.g. from the command line """
+        return asyncio.run(self.play_game_async())
+
+    @abstractmethod
+    async def play_game_async(self) -> GameSummary: ...
+
+
 # TODO: possible improvements:
 # Game could detect automatically when Components exist as class properties
 # and translate them to ComponentSlotProperties
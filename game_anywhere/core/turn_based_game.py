@@ -1,16 +1,20 @@
 from typing import Union
-from .game import Game, GameSummary, AgentId
+from .game import Game, AsyncGame, GameSummary, AgentId
 from abc import abstractmethod
 
 
 class TurnBasedGame(Game):
+    checkpointed_attributes = ("totalTurn",)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.totalTurn = 0
 
     def play_game(self) -> GameSummary:
         while True:
-            winner = self.turn()
+            # all updates of one turn are sent together at the end of the turn, or before a question
+            with self.transaction():
+                winner = self.turn()
             if winner is not None:
                 return winner
             self.totalTurn += 1
@@ -30,3 +34,21 @@ class TurnBasedGame(Game):
 
     def get_current_turn(self) -> int:
         return self.totalTurn
+
+
+class AsyncTurnBasedGame(AsyncGame, TurnBasedGame):
+    """ A TurnBasedGame whose turns are coroutines, see AsyncGame """
+
+    # override
+    async def play_game_async(self) -> GameSummary:
+        while True:
+            with self.transaction():
+                winner = await self.turn()
+            if winner is not None:
+                return winner
+            self.totalTurn += 1
+
+    # override
+    @abstractmethod
+    async def turn(self) -> Union[None, GameSummary]:
+        ...
@@ -0,0 +1,144 @@
+from typing import Any, Optional
+
+"""
+A compact binary encoding of diffs, for the clients that ask for it when they connect (see Spectator.on_connect).
+The other messages, and the diffs sent to the other clients, are JSON.
+
+Each address gets a small integer ID, announced the first time it is sent on the connection.
+IDs are given in order from 0, so defining ID 0 again starts a new table: the IDs defined before are forgotten.
+A frame is a sequence of operations, each one being an opcode byte followed by:
+- DEFINE: the new ID, then the address
+- REPLACE: the ID of the address, then the value
+- ADD: the ID of the address, then the slot it is inserted before, then the value
+- MOVE: the ID of the address, then the slot it is moved before
+- REMOVE: the ID of the address
+- SEQUENCE: the sequence number of the diffs of the frame, which it starts, for the diffs sent to a Session
+The slot before which a slot is inserted or moved is 1 + its ID, or 0 if it goes to the end.
+IDs are unsigned LEB128 varints, strings are the varint length of their UTF-8 encoding followed by that encoding.
+"""
+
+ADD = 0
+REPLACE = 1
+REMOVE = 2
+DEFINE = 3
+MOVE = 4
+SEQUENCE = 5
+
+OPCODES = {"add": ADD, "replace": REPLACE, "remove": REMOVE, "move": MOVE}
+OPS = {opcode: op for op, opcode in OPCODES.items()}
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_string(out: bytearray, string: str):
+    data = string.encode()
+    _write_varint(out, len(data))
+    out += data
+
+
+def _read_varint(data: bytes, position: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _read_string(data: bytes, position: int) -> tuple[str, int]:
+    length, position = _read_varint(data, position)
+    return data[position:position + length].decode(), position + length
+
+
+class DiffEncoder:
+    """
+    Encodes the diffs sent on one connection. A new connection needs a new encoder, since the IDs are forgotten, or
+    the definitions() of the encoder it shares with other connections, see BroadcastHub
+    """
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+
+    def encode(self, diffs: list[dict[str, Any]], sequence_number: Optional[int] = None) -> bytes:
+        definitions, operations = self.encode_parts(diffs)
+        if sequence_number is None:
+            return definitions + operations
+        out = bytearray([SEQUENCE])
+        _write_varint(out, sequence_number)
+        return bytes(out) + definitions + operations
+
+    def encode_parts(self, diffs: list[dict[str, Any]]) -> tuple[bytes, bytes]:
+        """ The DEFINEs of the new addresses, and the other operations. They make a frame once concatenated """
+        definitions, out = bytearray(), bytearray()
+        for diff in diffs:
+            slot_id = self._get_id(definitions, diff["key"])
+            opcode = OPCODES[diff["op"]]
+            before = 0
+            if (opcode == ADD or opcode == MOVE) and "before" in diff:
+                before = 1 + self._get_id(definitions, diff["before"])
+            out.append(opcode)
+            _write_varint(out, slot_id)
+            if opcode == ADD or opcode == MOVE:
+                _write_varint(out, before)
+            if opcode == ADD or opcode == REPLACE:
+                _write_string(out, diff["value"])
+        return bytes(definitions), bytes(out)
+
+    def definitions(self) -> bytes:
+        """ A frame that defines all IDs known so far, for a new connection that shares this encoder """
+        out = bytearray()
+        for key, slot_id in self.ids.items():
+            out.append(DEFINE)
+            _write_varint(out, slot_id)
+            _write_string(out, key)
+        return bytes(out)
+
+    def _get_id(self, out: bytearray, key: str) -> int:
+        """ The ID of the address, which is defined in out if it is new """
+        slot_id = self.ids.get(key)
+        if slot_id is None:
+            slot_id = self.ids[key] = len(self.ids)
+            out.append(DEFINE)
+            _write_varint(out, slot_id)
+            _write_string(out, key)
+        return slot_id
+
+
+class DiffDecoder:
+    """ The other end of a DiffEncoder, e.g. for Python clients """
+
+    def __init__(self):
+        self.keys: list[str] = []
+        # of the last frame that had one, see Session.replay_diffs()
+        self.sequence_number: Optional[int] = None
+
+    def decode(self, data: bytes) -> list[dict[str, Any]]:
+        diffs = []
+        position = 0
+        while position < len(data):
+            opcode = data[position]
+            slot_id, position = _read_varint(data, position + 1)
+            if opcode == SEQUENCE:
+                self.sequence_number = slot_id
+                continue
+            if opcode == DEFINE:
+                key, position = _read_string(data, position)
+                del self.keys[slot_id:]  # a new table if the ID is already known, see BroadcastHub.encode()
+                self.keys.append(key)
+                continue
+            diff = {"op": OPS[opcode], "key": self.keys[slot_id]}
+            if opcode == ADD or opcode == MOVE:
+                before, position = _read_varint(data, position)
+                if before:
+                    diff["before"] = self.keys[before - 1]
+            if opcode == ADD or opcode == REPLACE:
+                diff["value"], position = _read_string(data, position)
+            diffs.append(diff)
+        return diffs
@@ -0,0 +1,82 @@
+import json
+from typing import Any, Iterable, Optional
+from .binary_diffs import DiffEncoder
+
+"""
+Sends the same messages to many connections of a room: each message is encoded once, and the same encoded message is
+put in the writing queue of every recipient, so that writing it to the WebSocket is the only cost per connection.
+
+All methods should be called in the network thread.
+"""
+
+
+class EncodedMessage:
+    """
+    A message that is sent as is: text frames for a str, binary frames for bytes. See Spectator.send_all_messages.
+    Diffs keep their list, so that a slow connection can merge them (see OutboundQueue), and binary diffs also keep
+    the IDs that they define and the encoder that defined them
+    """
+    __slots__ = ("data", "diffs", "definitions", "encoder")
+
+    def __init__(
+        self, data: str | bytes, diffs: Optional[list[dict[str, Any]]] = None,
+        definitions: bytes = b"", encoder: Optional[DiffEncoder] = None
+    ):
+        self.data = data
+        self.diffs = diffs
+        self.definitions = definitions
+        self.encoder = encoder
+
+
+class BroadcastHub:
+    """
+    The spectators of a room subscribe to it to get the diffs of the game, see BaseGameRoom.
+    The clients that asked for binary diffs share one DiffEncoder, so that the binary frames are encoded once too:
+    a client that subscribes late is first sent the IDs defined so far. It is replaced on each snapshot, see encode()
+    """
+
+    def __init__(self):
+        self.subscribers: list["Spectator"] = []
+        self.diff_encoder = DiffEncoder()
+
+    def subscribe(self, spectator: "Spectator") -> None:
+        """ The spectator must be connected, so that we know which protocol it asked for """
+        if spectator.diff_encoder is not None and self.diff_encoder.ids:
+            definitions = self.diff_encoder.definitions()
+            spectator.send_nowait(EncodedMessage(definitions, [], definitions, self.diff_encoder))
+        self.subscribers.append(spectator)
+
+    def unsubscribe(self, spectator: "Spectator") -> None:
+        if spectator in self.subscribers:
+            self.subscribers.remove(spectator)
+
+    def publish(self, message: Any, recipients: Optional[Iterable["Spectator"]] = None) -> None:
+        """ Sends the message as JSON to the recipients, by default the subscribers """
+        encoded = EncodedMessage(json.dumps(message))
+        for spectator in self.subscribers if recipients is None else recipients:
+            spectator.send_nowait(encoded)
+
+    def publish_diffs(self, diffs: list[dict[str, Any]]) -> None:
+        """ Sends diffs to the subscribers. They are encoded as JSON and in binary only if a subscriber needs it """
+        text = binary = None
+        for spectator in self.subscribers:
+            if spectator.diff_encoder is None:
+                if text is None:
+                    text = EncodedMessage(json.dumps(diffs), diffs)
+                spectator.send_nowait(text)
+            else:
+                if binary is None:
+                    binary = self.encode(diffs)
+                spectator.send_nowait(binary)
+
+    def encode(self, diffs: list[dict[str, Any]]) -> EncodedMessage:
+        """
+        The encoder never forgets an address, since the queued messages of a slow connection may be encoded again (see
+        OutboundQueue.merge()). But a replace of the root replaces the whole view of every subscriber, so the addresses
+        sent before are no longer used: a new encoder starts there, with IDs from 0 again, which clears the table of
+        the clients (see DiffDecoder). The queued messages keep the encoder that defined their IDs
+        """
+        if any(diff["key"] == "" and diff["op"] == "replace" for diff in diffs):
+            self.diff_encoder = DiffEncoder()
+        definitions, operations = self.diff_encoder.encode_parts(diffs)
+        return EncodedMessage(definitions + operations, diffs, definitions, self.diff_encoder)
@@ -1,7 +1,11 @@
 from .room import ServerRoom
 from ..agents.descriptors import Context
+from ..agents.replay import ReplayArchive, ReplayLog, RecordingAgent, AsyncRecordingAgent
+from ..core import AsyncGame, AsyncAgent
+from ..core.agent import BlockingAgentAdapter, ThreadBridge
 from threading import Thread
 from aiohttp import web
+from typing import Callable
 import asyncio
 
 
@@ -9,6 +13,63 @@ class BaseGameRoom(ServerRoom):
     def __init__(self, game: "Game", *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.game = game
+        # The game renders the updates of the spectators only while there are some, see subscribe(). The diffs that
+        # come before the snapshots requested since are in them
+        self.nb_spectator_snapshots_pending = 0
+
+    def publish_spectator_updates(self, diffs: list[dict]):
+        """ Called by the game, on its own thread or on the event loop of the server (see AsyncGame) """
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self.server.loop:
+            self.publish_spectator_diffs(diffs)
+        else:
+            ThreadBridge.of(self.server.loop).call_soon(self.publish_spectator_diffs, diffs)
+
+    def publish_spectator_diffs(self, diffs: list[dict]):
+        if self.nb_spectator_snapshots_pending == 0:
+            self.broadcast.publish_diffs(diffs)
+
+    def publish_spectator_snapshot(self, snapshot: list[dict]):
+        self.nb_spectator_snapshots_pending -= 1
+        self.broadcast.publish_diffs(snapshot)
+
+    # override
+    def subscribe(self, spectator: "Spectator") -> None:
+        super().subscribe(spectator)
+        if self.game.spectator_feed is None:
+            # the view of the spectators wasn't updated while nobody watched, so they get all of it first
+            self.game.spectator_feed = self.publish_spectator_updates
+            self.nb_spectator_snapshots_pending += 1
+            self.request_view_snapshot(None, self.publish_spectator_snapshot)
+
+    # override
+    def unsubscribe(self, spectator: "Spectator") -> None:
+        super().unsubscribe(spectator)
+        if not self.broadcast.subscribers:
+            self.game.spectator_feed = None
+
+    # override
+    def view_snapshot(self, viewer_id) -> list[dict]:
+        return [{"op": "replace", "key": "", "value": str(self.game.html(viewer_id=viewer_id))}]
+
+    # override
+    def request_view_snapshot(self, viewer_id, deliver: Callable[[list[dict]], None]) -> None:
+        """
+        A game played on a thread is rendered when it is idle (see Game.call_when_idle()), by its thread or by a worker
+        thread, never by the event loop. The snapshot goes through the same ThreadBridge as the game's updates
+        """
+        if isinstance(self.game, AsyncGame):
+            # it is played on this loop, so it is waiting: the updates it held back are older than the snapshot
+            self.game.flush_updates()
+            deliver(self.view_snapshot(viewer_id))
+            return
+        bridge = ThreadBridge.of(self.server.loop)
+        self.game.call_when_idle(lambda: bridge.call_soon(deliver, self.view_snapshot(viewer_id)))
+        # if the game waits for an agent now, its thread doesn't run the call until the agent answers
+        self.server.loop.run_in_executor(None, self.game.run_idle_calls)
 
     # override
     @classmethod
@@ -18,11 +79,39 @@ class BaseGameRoom(ServerRoom):
             [
                 # see @class Server for an explanation of parameter {roomId}
                 web.get(r"/{roomId:\d+}/html", cls.http_get_html_view),
+                web.get(r"/{roomId:\d+}/replay", cls.http_get_replay),
             ]
         )
         return router
 
-    async def http_get_html_view(self, request: web.Request) -> web.Response:
+    def open_replay_archive(self) -> ReplayArchive | None:
+        """ Override this if the game is recorded """
+        return None
+
+    async def http_get_replay(self, request: web.Request) -> web.StreamResponse:
+        """
+        What the spectators saw at a turn of the game, see ReplayArchive: one JSON list of diffs per line,
+        starting with a replace of the whole game (key "").
+        """
+        try:
+            turn = int(request.query['turn'])
+        except (KeyError, ValueError):
+            raise web.HTTPBadRequest(text="Please provide the turn as an integer")
+        archive = self.open_replay_archive()
+        if archive is None:
+            raise web.HTTPNotFound(text="This game is not recorded")
+        with archive:
+            if not 0 <= turn < len(archive):
+                raise web.HTTPNotFound(text=f"No such turn, there are {len(archive)} turns so far")
+            response = web.StreamResponse()
+            response.content_type = "application/x-ndjson"
+            await response.prepare(request)
+            for frame in archive.read(turn):
+                await response.write(frame + b"\n")
+            await response.write_eof()
+        return response
+
+    async def http_get_html_view(self, request: web.Request) -> web.StreamResponse:
         try:
             username = self.get_request_username(request)
             session_id = request.query['seat']
@@ -39,45 +128,105 @@ class BaseGameRoom(ServerRoom):
                 raise web.HTTPForbidden(text="Session not owned by authenticated user")
             viewer_id = session_id
         html = self.game.html(viewer_id=viewer_id)
-        return web.Response(body=str(html), content_type="text/html")
+        response = web.StreamResponse()
+        response.content_type = "text/html"
+        response.charset = "utf-8"
+        await response.prepare(request)
+        for chunk in html.stream():
+            await response.write(chunk.encode())
+        await response.write_eof()
+        return response
 
 
 class GameRoom(BaseGameRoom):
-    """Provides its own game, which is launched on another thread from a GameDescriptor"""
+    """
+    Provides its own game, created from a GameDescriptor. The room waits for the agents on the event loop of the server,
+    and an AsyncGame is played there too. A synchronous game is played on its own thread, which it only gets once all
+    agents are connected, and its AsyncAgents are adapted, see BlockingAgentAdapter.
+    If a replay log path is given, the game is recorded there, see ReplayLog, and optionally to a ReplayArchive.
+    """
 
-    def __init__(self, game_descriptor: "GameDescriptor", *args, **kwargs):
+    def __init__(
+        self, game_descriptor: "GameDescriptor", *args,
+        replay_log: str|None = None, replay_archive: str|None = None, **kwargs
+    ):
         self.first_step = True
+        self.replay_log = None if replay_log is None else ReplayLog(replay_log, replay_archive)
         self.game = game_descriptor.create_game()
         super().__init__(*args, game=self.game, **kwargs)
         agent_promises: list["AgentPromise"] = game_descriptor.start_initialization(
             Context(server_room=self)
         )
-        self.game_thread = Thread(
-            target=self.run_game_thread, args=(game_descriptor, agent_promises)
-        )
-        self.game_thread.start()
+        self.game_task = self.server.loop.create_task(self.run_game(game_descriptor, agent_promises))
 
-    def run_game_thread(
+    async def run_game(
         self, game_descriptor: "GameDescriptor", agent_promises: list["AgentPromise"]
     ):
-        # print("Starting game thread, waiting for agents…")
-        self.game.set_agents(game_descriptor.await_initialization(agent_promises))
-        # print("…Agents connected")
-        self.game.play_game()
+        agents = await game_descriptor.await_initialization_async(agent_promises)
+        if not isinstance(self.game, AsyncGame):
+            agents = [
+                BlockingAgentAdapter(agent, self.server.loop) if isinstance(agent, AsyncAgent) else agent
+                for agent in agents
+            ]
+        if self.replay_log is not None:
+            self.replay_log.write_header(
+                self.game, game_descriptor.config, [agent.name for agent in agents],
+                game_descriptor.game_args, game_descriptor.game_kwargs,
+            )
+            agents = [
+                (AsyncRecordingAgent if isinstance(agent, AsyncAgent) else RecordingAgent)(agent, i, self.replay_log)
+                for i, agent in enumerate(agents)
+            ]
+        self.game.set_agents(agents)
+        self.game.index_slot_addresses()  # the answers of the clients are addresses, see NetworkAgent
+        try:
+            if isinstance(self.game, AsyncGame):
+                await self.game.play_game_async()
+            else:
+                await self.run_game_thread()
+        finally:
+            if self.replay_log is not None:
+                self.replay_log.close()
         # print("Game ended, interrupting agents")
-        self.server.loop.call_soon_threadsafe(self.nt_interrupt)
-        # print("Game ended, scheduling self.nt_close()")
-        asyncio.run_coroutine_threadsafe(self.nt_close(), loop=self.server.loop)
+        self.nt_interrupt()
+        # not awaited, since nt_close() waits for this task to end
+        asyncio.ensure_future(self.nt_close())
+
+    def run_game_thread(self) -> asyncio.Future:
+        """
+        Plays a synchronous game on a thread of its own. Not asyncio.to_thread(): the default executor has a few threads
+        only, and the games would wait for each other
+        """
+        loop = self.server.loop
+        game_ended = loop.create_future()
+
+        def play_game():
+            try:
+                summary = self.game.play_game()
+            except BaseException as err:
+                result = (game_ended.set_exception, err)
+            else:
+                result = (game_ended.set_result, summary)
+            self.game.set_idle(True)  # it doesn't change anymore, see request_view_snapshot()
+            loop.call_soon_threadsafe(*result)
+
+        self.game_thread = Thread(target=play_game)
+        self.game_thread.start()
+        return game_ended
+
+    # override
+    def open_replay_archive(self) -> ReplayArchive | None:
+        if self.replay_log is None or self.replay_log.archive is None:
+            return None  # not recorded, or the game hasn't started yet
+        return self.replay_log.archive.open()
 
     # override
     async def nt_close(self):
         # print("nt_closing GameRoom…")
         # first close the spectators
         await super().nt_close()
-        # print("Everything closed, now waiting for the game thread to end…")
+        # print("Everything closed, now waiting for the game to end…")
         # then wait for the game to end (with no one connected, it can't take long)
-        try:
-            self.game_thread.join()
-            # print("Game thread ended")
-        except Exception:
-            print("Game thread ended with an exception")
+        await asyncio.wait([self.game_task])
+        if not self.game_task.cancelled() and self.game_task.exception() is not None:
+            print("Game ended with an exception:", repr(self.game_task.exception()))
@@ -6,6 +6,7 @@ from .server import Server
 from game_anywhere.agents.parse_descriptors import parse_game_descriptor
 from .game_room import GameRoom
 import json
+import os
 import traceback
 import sys
 
@@ -20,9 +21,12 @@ def json_encode_server_room(room: "ServerRoom"):
 class HttpControlledServer(Server):
     SERVER_CLOSED_DUMMY_MSG = None
 
-    def __init__(self, available_games: dict[str, "Game"]):
+    def __init__(self, available_games: dict[str, "Game"], replay_directory: str|None = None):
         super().__init__(RoomClass=GameRoom)
         self.available_games = available_games
+        # If set, every game is recorded in this directory, see ReplayLog
+        self.replay_directory = replay_directory
+        self.nb_recorded_games = 0
         self.app.add_routes(
             [
                 web.post("/room", self.http_create_room),
@@ -43,7 +47,9 @@ class HttpControlledServer(Server):
         except (NotImplementedError, KeyError, json.JSONDecodeError) as err:
             raise web.HTTPBadRequest(text=repr(err))
         try:
-            room_id, room = self.new_room(room=GameRoom(game_description, server=self))
+            replay_log, replay_archive = self.new_replay_paths()
+            room = GameRoom(game_description, server=self, replay_log=replay_log, replay_archive=replay_archive)
+            room_id, room = self.new_room(room=room)
         except Exception as ex:
             traceback.print_exception(ex, file=sys.stderr)
             raise web.HTTPBadRequest(text=str(ex))
@@ -55,6 +61,15 @@ class HttpControlledServer(Server):
         )
         return web.json_response(room_id, status=http.HTTPStatus.CREATED)
 
+    def new_replay_paths(self) -> tuple[str, str] | tuple[None, None]:
+        """ Paths of the ReplayLog and ReplayArchive of a new game """
+        if self.replay_directory is None:
+            return None, None
+        # room IDs are reused, so they can't name the files
+        self.nb_recorded_games += 1
+        path = os.path.join(self.replay_directory, f"{os.getpid()}-{self.nb_recorded_games}")
+        return path + ".jsonl", path + ".replay"
+
     def http_get_rooms(self, request: web.Request) -> web.Response:
         return web.json_response(
             text=json.dumps(self.rooms, default=json_encode_server_room)
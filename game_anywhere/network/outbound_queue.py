@@ -0,0 +1,150 @@
+import asyncio
+import json
+from collections import deque
+from enum import Enum, unique
+from typing import Any, Optional
+from game_anywhere.core.game import coalesce_diffs
+from .broadcast import EncodedMessage
+
+"""
+The messages that wait to be sent on a connection, see Spectator.send_all_messages.
+It is bounded, so that a slow or stalled client (e.g. a mobile tab in the background) doesn't make the server keep every
+diff of the game: when it is full, the diffs that it holds are merged or dropped, depending on its OverflowPolicy.
+If that isn't enough, the connection needs a resync, see Spectator.resync().
+
+All methods should be called in the network thread.
+"""
+
+
+class OutboundQueue:
+    @unique
+    class OverflowPolicy(Enum):
+        # consecutive diffs are merged, and only the latest replace of an address survives, see coalesce_diffs()
+        CONFLATE = 0
+        # the diffs are dropped, and the client is told to reload the view
+        DROP = 1
+        # nothing is dropped, the connection needs a resync
+        DISCONNECT = 2
+
+    class Full(Exception):
+        """ The queue is full, and the messages that it holds can't be merged or dropped """
+        pass
+
+    DEFAULT_MAX_SIZE = 1000
+    # Sent instead of dropped diffs, see OverflowPolicy.DROP
+    RESYNC_MESSAGE = {"type": "resync"}
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, policy: OverflowPolicy = OverflowPolicy.CONFLATE):
+        self.max_size = max_size
+        self.policy = policy
+        self.messages: deque[Any] = deque()
+        self.not_empty: Optional[asyncio.Future] = None
+        # metrics, see metrics()
+        self.high_water_mark = 0
+        self.nb_overflows = 0
+        self.nb_merged = 0
+        self.nb_dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def put_nowait(self, message: Any) -> None:
+        if len(self.messages) >= self.max_size:
+            self.nb_overflows += 1
+            self.shrink()
+            # if the queue is still more than half full, shrinking it again would be of little use
+            if len(self.messages) > self.max_size // 2:
+                raise OutboundQueue.Full()
+        self.messages.append(message)
+        self.high_water_mark = max(self.high_water_mark, len(self.messages))
+        if self.not_empty is not None and not self.not_empty.done():
+            self.not_empty.set_result(None)
+
+    def put_back(self, message: Any) -> None:
+        """
+        A message that is sent before the others: one that couldn't be sent, which will be the first one sent on the
+        next connection, or a snapshot of the view that the queued messages are about, see Session.send_snapshot()
+        """
+        self.messages.appendleft(message)
+        if self.not_empty is not None and not self.not_empty.done():
+            self.not_empty.set_result(None)
+
+    async def get(self) -> Any:
+        while not self.messages:
+            self.not_empty = asyncio.get_running_loop().create_future()
+            await self.not_empty
+        return self.messages.popleft()
+
+    def clear(self) -> None:
+        self.nb_dropped += len(self.messages)
+        self.messages.clear()
+
+    def drop_diffs(self) -> None:
+        """ Drops the diffs but keeps the other messages, e.g. when the client got a snapshot of its view """
+        messages = deque(message for message in self.messages if self.diff_kind(message) is None)
+        self.nb_dropped += len(self.messages) - len(messages)
+        self.messages = messages
+
+    def metrics(self) -> dict[str, int]:
+        return {
+            "depth": len(self.messages),
+            "high_water_mark": self.high_water_mark,
+            "overflows": self.nb_overflows,
+            "merged": self.nb_merged,
+            "dropped": self.nb_dropped,
+        }
+
+    @staticmethod
+    def diff_kind(message: Any) -> Any:
+        """ Consecutive diffs of the same kind can be merged. None if the message isn't diffs """
+        if isinstance(message, list):  # encoded when it is sent, see Spectator.send_all_messages
+            return list
+        if isinstance(message, EncodedMessage) and message.diffs is not None:
+            # JSON diffs, or binary diffs, which can only be merged with those of the same encoder (whose IDs they use)
+            return str if message.encoder is None else message.encoder
+        return None
+
+    def shrink(self) -> None:
+        """ Replaces each run of consecutive diffs of the same kind, according to the policy """
+        if self.policy == OutboundQueue.OverflowPolicy.DISCONNECT:
+            return
+        messages = deque()
+        run = []
+        for message in [*self.messages, None]:  # None ends the last run
+            kind = self.diff_kind(message)
+            if run and kind is not self.diff_kind(run[0]):
+                if self.policy == OutboundQueue.OverflowPolicy.CONFLATE:
+                    messages.append(self.merge(run))
+                    self.nb_merged += len(run) - 1
+                else:
+                    if not messages or messages[-1] is not OutboundQueue.RESYNC_MESSAGE:
+                        messages.append(OutboundQueue.RESYNC_MESSAGE)
+                    if isinstance(run[0], EncodedMessage) and run[0].encoder is not None:
+                        # the IDs defined by the dropped binary diffs are used by the next ones
+                        definitions = b"".join(message.definitions for message in run)
+                        if definitions:
+                            messages.append(EncodedMessage(definitions, [], definitions, run[0].encoder))
+                    self.nb_dropped += len(run)
+                run = []
+            if kind is not None:
+                run.append(message)
+            elif message is not None:
+                messages.append(message)
+        self.messages = messages
+
+    @staticmethod
+    def merge(run: list[Any]) -> Any:
+        """ One message with the diffs of all messages of the run, which are of the same kind """
+        if len(run) == 1:
+            return run[0]
+        first = run[0]
+        diffs = coalesce_diffs([
+            diff for message in run for diff in (message if isinstance(message, list) else message.diffs)
+        ])
+        if isinstance(first, list):
+            return diffs
+        if first.encoder is None:
+            return EncodedMessage(json.dumps(diffs), diffs)
+        # the addresses are all defined by the run already, so encoding them defines nothing new
+        definitions = b"".join(message.definitions for message in run)
+        return EncodedMessage(definitions + first.encoder.encode(diffs), diffs, definitions, first.encoder)
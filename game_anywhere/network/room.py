@@ -1,8 +1,10 @@
 import json
 from game_anywhere.core.agent import AgentId
 from .spectator import Session, Spectator
+from .broadcast import BroadcastHub
+from .outbound_queue import OutboundQueue
 from itertools import chain
-from typing import Iterable, Awaitable, Optional
+from typing import Callable, Iterable, Awaitable, Optional
 from aiohttp import web
 import asyncio
 from .async_resource import AsyncResource
@@ -22,14 +24,23 @@ class ServerRoom(AsyncResource):
         except KeyError:
             return request.query['username'] + ' (Guest)'
 
-    def __init__(self, server: "Server", greeter_message="Welcome to the room!"):
+    def __init__(
+        self, server: "Server", greeter_message="Welcome to the room!",
+        max_queue_size: int = OutboundQueue.DEFAULT_MAX_SIZE,
+        overflow_policy: OutboundQueue.OverflowPolicy = OutboundQueue.OverflowPolicy.CONFLATE,
+    ):
         self.server = server
         self.greeter_message = (
             greeter_message  # The message that will be sent to every new spectator
         )
+        # The messages that a connection can hold back when the client is slow, see OutboundQueue
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
         self.spectators: list[Spectator] = []
         self.sessions: dict[SeatId, Session] = {}
         self.session_id_to_username: dict[SeatId, Username] = {}
+        # The connected spectators subscribe to it, see subscribe()
+        self.broadcast = BroadcastHub()
 
     def __del__(self):
         # as part of their closing, all sessions should have set themselves to FREE and all spectators should have deleted themselves
@@ -78,14 +89,34 @@ class ServerRoom(AsyncResource):
         if type(spectator) == Session:
             pass
         else:
+            self.unsubscribe(spectator)
             self.spectators.remove(spectator)
             self.server.log_event(json.dumps([
                 {"op": "replace", "key": f"/{self.room_id}/spectators", "value": len(self.spectators)}
             ]))
 
+    def subscribe(self, spectator: Spectator) -> None:
+        """ Once the spectator is connected, see nt_handle_websocket() """
+        self.broadcast.subscribe(spectator)
+
+    def unsubscribe(self, spectator: Spectator) -> None:
+        self.broadcast.unsubscribe(spectator)
+
+    def view_snapshot(self, viewer_id: AgentId) -> Optional[list[dict]]:
+        """ Diffs that replace the whole view of the viewer, see Session.replay_diffs(). None if the room has none """
+        return None
+
+    def request_view_snapshot(self, viewer_id: AgentId, deliver: Callable[[Optional[list[dict]]], None]) -> None:
+        """
+        Calls deliver() with view_snapshot() on the event loop, after the updates that the viewer got before it was
+        taken, so that all the updates that come after it are newer. Rooms whose view changes on another thread need
+        to override this
+        """
+        deliver(self.view_snapshot(viewer_id))
+
     def send(self, message: str) -> None:
-        for spectator in self.get_spectators_and_sessions():
-            spectator.send(message)
+        """ Sends the message to everyone in the room. It is encoded once, see BroadcastHub """
+        self.broadcast.publish(message, self.get_spectators_and_sessions())
 
     def get_spectators_and_sessions(self) -> Iterable[Spectator]:
         return chain(self.sessions.values(), self.spectators)
@@ -100,10 +131,18 @@ class ServerRoom(AsyncResource):
                 # see @class Server for an explanation of parameter {roomId}
                 web.get(r"/{roomId:\d+}/ws/{seat:\d+}", cls.nt_connect_session),
                 web.get(r"/{roomId:\d+}/ws/watch", cls.nt_add_spectator),
+                web.get(r"/{roomId:\d+}/connections", cls.http_get_connections),
             ]
         )
         return router
 
+    async def http_get_connections(self, request: web.Request) -> web.Response:
+        """ The metrics of each connection, e.g. to find the slow clients, see Spectator.metrics() """
+        return web.json_response({
+            "seats": {seat_id: session.metrics() for seat_id, session in self.sessions.items()},
+            "spectators": [spectator.metrics() for spectator in self.spectators],
+        })
+
     async def nt_add_spectator(self, request: web.Request):
         spectator = Spectator(self)
         self.spectators.append(spectator)
@@ -137,6 +176,7 @@ class ServerRoom(AsyncResource):
             await spectator.on_connect(request, ws)
             if type(spectator) != Session:
                 await spectator.send(self.greeter_message)
+                self.subscribe(spectator)
             await spectator.run()
             # the websocket is closed as soon as the method execution finishes, i.e. now
         except asyncio.CancelledError:  # cancelled by server, or the game ended
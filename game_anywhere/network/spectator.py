@@ -2,16 +2,22 @@ import aiohttp
 import asyncio
 from aiohttp import web
 from enum import Enum, unique
-from game_anywhere.core.agent import AgentId
+from game_anywhere.core.agent import AgentId, ThreadBridge
 from typing import Optional, Any, Awaitable, Callable
-from threading import Condition, Lock
+from collections import deque
+from queue import SimpleQueue, Empty
 import json
+import time
+from .binary_diffs import DiffEncoder
+from .broadcast import EncodedMessage
+from .outbound_queue import OutboundQueue
 
 """
 Represents an active WebSocket connection to the server.
 
 Convention: all methods should be called in the network thread by default,
-except those called _sync
+except those called _sync.
+A game thread waits for messages with get_sync(), a game played on the network thread (see AsyncGame) with get().
 """
 
 
@@ -27,6 +33,9 @@ class Spectator:
         def __init__(self, state=0):
             self.state = state
 
+    # The code of the close frame when the client has missed messages and must reload the view, see resync()
+    RESYNC_CLOSE_CODE = 4000
+
     def __init__(self, room: "ServerRoom"):
         self.room = room
 
@@ -34,18 +43,23 @@ class Spectator:
         self.listening = False
         self.previously_connected = False
 
-        self.reading_queue: list[str] = []  # All messages that haven't been read yet
-        # the reading queue can block the game thread but not the network thread, so we use threading sync primitives
-        # (the game thread will wait for messages by locking these primitives)
-        self.protect_reading_queue = Lock()
-        self.signal_reading_queue = Condition(self.protect_reading_queue)
+        # All messages that haven't been read yet. A deque is thread-safe, so the network thread appends to it and the
+        # game thread pops from it without a lock: the network thread must never wait for the game thread
+        self.reading_queue: deque[str] = deque()
+        # Signals the game thread that the reading queue or the state changed, see wait_for_readers_signal_sync().
+        # The put() of a SimpleQueue never blocks
+        self.reader_wakeups = SimpleQueue()
+        # The same signal for a coroutine that waits on the network thread, see get()
+        self.reading_queue_changed: Optional[asyncio.Future] = None
 
-        self.writing_queue = asyncio.Queue()  # All messages that haven't been sent yet
-        # the network thread will wait for the writing queue, so we use asyncio sync primitives
-        self.signal_connected = self.loop.create_future()
+        # All messages that haven't been sent yet. Only the network thread uses it
+        self.writing_queue = OutboundQueue(room.max_queue_size, room.overflow_policy)
+        self.nb_resyncs = 0
 
         self.run_handle: Optional[asyncio.Task] = None
         self.ws: Optional[aiohttp.web.WebSocketResponse] = None
+        # Set if the client asked for binary diffs when it connected, see binary_diffs
+        self.diff_encoder: Optional[DiffEncoder] = None
 
         # Called on each message received. If it returns True, the message is ignored
         # It's an ugly special case to make chatting work.
@@ -80,13 +94,14 @@ class Spectator:
         assert self.state == Spectator.State.FREE
         self.state = Spectator.State.CLAIMED
         self.ws = websocket
+        # a new connection starts with new slot IDs
+        self.diff_encoder = DiffEncoder() if request.query.get("protocol") == "binary" else None
 
         # do the websocket handshake
         await self.ws.prepare(request)
 
-        with self.protect_reading_queue:
-            self.state = Spectator.State.CONNECTED
-            self.signal_reading_queue.notify()
+        self.state = Spectator.State.CONNECTED
+        self.notify_readers()
         return self.ws
 
     async def run(self) -> Awaitable[None]:
@@ -100,14 +115,12 @@ class Spectator:
         try:
             await self.read_all_messages()
             # all messages read, connection closed
-            with self.protect_reading_queue:
-                self.state = Spectator.State.FREE
+            self.state = Spectator.State.FREE
         finally:  # catch asyncio.CancelledError
             message_sending_task.cancel()
             await message_sending_task  # in case it had any other exception
             # signal anyone that waits for an incoming message
-            with self.protect_reading_queue:
-                self.signal_reading_queue.notify()
+            self.notify_readers()
             self.room.report_afk(self)
 
     async def read_all_messages(self):
@@ -117,16 +130,15 @@ class Spectator:
                     continue
 
                 # Add to queue
-                with self.protect_reading_queue:
-                    # CLIENT_LOST_TRACK will be answered by the 'Not listening', no need to propagate it
-                    if (
-                        not self.listening
-                        and msg.data == Session.CLIENT_LOST_TRACK_MESSAGE
-                    ):
-                        pass
-                    else:
-                        self.reading_queue.append(msg.data)
-                        self.signal_reading_queue.notify()
+                # CLIENT_LOST_TRACK will be answered by the 'Not listening', no need to propagate it
+                if (
+                    not self.listening
+                    and msg.data == Session.CLIENT_LOST_TRACK_MESSAGE
+                ):
+                    pass
+                else:
+                    self.reading_queue.append(msg.data)
+                    self.notify_readers()
 
                 if not self.listening:
                     await self.ws.send_json("!Not listening")
@@ -140,10 +152,12 @@ class Spectator:
                 msg = await self.writing_queue.get()
                 while True:
                     try:
-                        await self.ws.send_json(msg)
+                        await self.send_message(msg)
                         break
                     except ConnectionResetError:
-                        await self.signal_connected
+                        # the read loop ends too. A session sends the message again when the client reconnects
+                        self.writing_queue.put_back(msg)
+                        return
                     except Exception as x:
                         print("(net) EXCEPTION when trying to send message:", x)
                         print("(net) discarded message!")
@@ -151,39 +165,114 @@ class Spectator:
         except asyncio.CancelledError:
             pass
 
+    async def send_message(self, msg: Any) -> None:
+        if isinstance(msg, EncodedMessage):  # encoded once for all recipients, see BroadcastHub
+            if isinstance(msg.data, bytes):
+                await self.ws.send_bytes(msg.data)
+            else:
+                await self.ws.send_str(msg.data)
+        # lists are diffs, see Game.log_component_update()
+        elif self.diff_encoder is not None and isinstance(msg, list):
+            await self.ws.send_bytes(self.diff_encoder.encode(msg))
+        else:
+            await self.ws.send_json(msg)
+
     # This is executed on the network thread, so the only possible race condition is with send() or get()
     def interrupt(self, msg="Server shutdown") -> None:
-        with self.protect_reading_queue:
-            self.state = Spectator.State.INTERRUPTED_BY_SERVER
-            self.signal_reading_queue.notify()
+        self.state = Spectator.State.INTERRUPTED_BY_SERVER
+        self.notify_readers()
 
         if self.run_handle:
             self.run_handle.cancel()
 
     async def send(self, msg: Any) -> None:
-        await self.writing_queue.put(msg)
+        self.send_nowait(msg)
+
+    def send_nowait(self, msg: Any) -> None:
+        try:
+            self.writing_queue.put_nowait(msg)
+        except OutboundQueue.Full:
+            self.resync()
+
+    def resync(self) -> None:
+        """
+        Drops the messages that the client hasn't received yet, so it must reload the view: it is disconnected, and
+        reconnects. A session that is disconnected already is told so when it reconnects.
+        Questions are asked again when the client reconnects, see Session.CLIENT_LOST_TRACK_MESSAGE
+        """
+        self.nb_resyncs += 1
+        self.writing_queue.clear()
+        if self.state == Spectator.State.CONNECTED:
+            asyncio.ensure_future(self.ws.close(code=Spectator.RESYNC_CLOSE_CODE, message=b"resync"))
+        else:
+            self.writing_queue.put_nowait(OutboundQueue.RESYNC_MESSAGE)
+
+    def metrics(self) -> dict[str, Any]:
+        """ The state of the connection and the metrics of its writing queue, see OutboundQueue.metrics() """
+        return {"state": str(self.state), "resyncs": self.nb_resyncs, **self.writing_queue.metrics()}
 
     def send_sync(self, msg: str) -> None:
-        asyncio.run_coroutine_threadsafe(self.send(msg), loop=self.loop)
+        ThreadBridge.of(self.loop).call_soon(self.send_nowait, msg)
+
+    # Called on the network thread, after the reading queue or the state changed
+    def notify_readers(self) -> None:
+        self.reader_wakeups.put(None)
+        if self.reading_queue_changed is not None and not self.reading_queue_changed.done():
+            self.reading_queue_changed.set_result(None)
+
+    def wait_for_readers_signal_sync(self, predicate: Callable[[], bool], timeout: Optional[float] = None) -> bool:
+        """ Blocks until the predicate is true, like Condition.wait_for(). Returns False if the timeout expired """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # the signals of the changes that the predicate sees are no longer needed
+            try:
+                while True:
+                    self.reader_wakeups.get_nowait()
+            except Empty:
+                pass
+            if predicate():
+                return True
+            try:
+                self.reader_wakeups.get(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except Empty:
+                return predicate()
+
+    async def wait_for_readers_signal(self, predicate: Callable[[], bool]) -> None:
+        """ The coroutine version of wait_for_readers_signal_sync() """
+        while not predicate():
+            self.reading_queue_changed = self.loop.create_future()
+            await self.reading_queue_changed
+
+    async def get(self) -> str:
+        """ The coroutine version of get_sync(), for AsyncNetworkAgent """
+        self.listening = True
+        if len(self.reading_queue) == 0:
+            if self.state != Spectator.State.CONNECTED:
+                raise Spectator.DisconnectedException(self.state)
+            await self.wait_for_readers_signal(
+                lambda: len(self.reading_queue) > 0 or self.state != Spectator.State.CONNECTED
+            )
+            # the client may have sent its answer and closed the connection before this coroutine is resumed
+            if len(self.reading_queue) == 0:
+                raise Spectator.DisconnectedException(self.state)
+        self.listening = False
+        return self.reading_queue.popleft()
 
     def get_sync(self) -> str:
-        with self.protect_reading_queue:
-            self.listening = True
+        self.listening = True
+        if len(self.reading_queue) == 0:
+            if self.state != Spectator.State.CONNECTED:
+                raise Spectator.DisconnectedException(self.state)
+            self.wait_for_readers_signal_sync(  # condition for waking up:
+                lambda: len(self.reading_queue) > 0
+                or self.state != Spectator.State.CONNECTED
+            )
+            # like in get(), an answer sent just before the client disconnected is still read
             if len(self.reading_queue) == 0:
-                if self.state != Spectator.State.CONNECTED:
-                    raise Spectator.DisconnectedException(self.state)
-                self.signal_reading_queue.wait_for(  # condition for waking up:
-                    lambda: len(self.reading_queue) > 0
-                    or self.state != Spectator.State.CONNECTED
-                )
-                if self.state != Spectator.State.CONNECTED:
-                    raise Spectator.DisconnectedException(self.state)
-
-            assert len(self.reading_queue) > 0
-            self.listening = False  # okay, maybe a semaphore would've been cleaner
-            retVal = self.reading_queue[0]
-            del self.reading_queue[0]
-        return retVal
+                raise Spectator.DisconnectedException(self.state)
+
+        self.listening = False  # okay, maybe a semaphore would've been cleaner
+        return self.reading_queue.popleft()
 
     class Chat:
         def __init__(self, parent: "Spectator", on_message: Callable[[str], bool]):
@@ -206,12 +295,18 @@ class Session(Spectator):
 
     CLIENT_LOST_TRACK_MESSAGE = "?"
 
+    # How many of the last diffs sent are kept for a client that reconnects, see replay_diffs()
+    REPLAY_BUFFER_SIZE = 256
+
     class TimeoutException(Exception):
         pass
 
     def __init__(self, id: AgentId, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.id = id
+        # Each diffs sent gets the next sequence number, so that a client knows which ones it has seen
+        self.sequence_number = 0
+        self.sent_diffs: deque[tuple[int, list[dict]]] = deque(maxlen=Session.REPLAY_BUFFER_SIZE)
 
     @property
     def seat_id(self) -> int:
@@ -225,28 +320,101 @@ class Session(Spectator):
             {"op": "replace", "key": f"/{self.room.room_id}/seats/{self.seat_id}", "value": str(value)}
         ]))
 
+    # override
+    async def on_connect(
+        self, request: web.Request, websocket: web.WebSocketResponse
+    ) -> Awaitable[web.WebSocketResponse]:
+        try:
+            last_seen = int(request.query["seq"])
+        except (KeyError, ValueError):  # a new view, fetched by the client
+            last_seen = None
+        await super().on_connect(request, websocket)
+        if last_seen is not None:
+            try:
+                await self.replay_diffs(last_seen)
+            except ConnectionResetError:
+                pass  # the read loop ends at once
+        return self.ws
+
+    async def replay_diffs(self, last_seen: int) -> None:
+        """
+        Sends the diffs that were sent after those numbered last_seen, which a client that reconnects may have missed
+        (they were still on the way when the connection was lost). Called before the writing queue is sent.
+        If they are no longer in the buffer, the client gets a snapshot of its view instead, see send_snapshot()
+        """
+        if last_seen == self.sequence_number:
+            return
+        if self.sent_diffs and self.sent_diffs[0][0] <= last_seen + 1 and 0 <= last_seen < self.sequence_number:
+            for sequence_number, diffs in self.sent_diffs:
+                if sequence_number > last_seen:
+                    await self.send_diffs(sequence_number, diffs)
+            return
+        snapshot = asyncio.get_running_loop().create_future()
+        self.room.request_view_snapshot(self.id, snapshot.set_result)
+        # the connection waits for it, e.g. the question that the client asks for again must come after it
+        self.send_snapshot(await snapshot)
+
+    def send_snapshot(self, snapshot: list[dict] | None) -> None:
+        """
+        Replaces the view of the client, on the event loop. The snapshot comes after the updates of the game that it
+        includes (see ServerRoom.request_view_snapshot()), so the diffs that still wait to be sent are dropped, and
+        the later ones apply to it. It is sent first, before e.g. a question about what it shows
+        """
+        self.writing_queue.drop_diffs()
+        self.writing_queue.put_back(OutboundQueue.RESYNC_MESSAGE if snapshot is None else snapshot)
+
+    # override
+    async def send_message(self, msg: Any) -> None:
+        if not isinstance(msg, list):
+            return await super().send_message(msg)
+        # if it can't be sent, it is put back in the writing queue, and gets its number when it is sent again
+        await self.send_diffs(self.sequence_number + 1, msg)
+        self.sequence_number += 1
+        self.sent_diffs.append((self.sequence_number, msg))
+
+    async def send_diffs(self, sequence_number: int, diffs: list[dict]) -> None:
+        if self.diff_encoder is not None:
+            await self.ws.send_bytes(self.diff_encoder.encode(diffs, sequence_number))
+        else:
+            await self.ws.send_json({"type": "diffs", "seq": sequence_number, "diffs": diffs})
+
     def reconnect_sync(self) -> None:
-        with self.protect_reading_queue:
-            if self.state == Spectator.State.INTERRUPTED_BY_SERVER:
-                raise Spectator.DisconnectedException(
-                    Spectator.State.INTERRUPTED_BY_SERVER
-                )
-            elif self.state == Spectator.State.CONNECTED:
-                return
-
-            # the lock needs to be still locked when we wait for the signal (wait_for unlocks it)
-            if not self.signal_reading_queue.wait_for(
-                predicate=lambda: self.state
-                in [Spectator.State.CONNECTED, Spectator.State.INTERRUPTED_BY_SERVER],
-                timeout=Session.TIMEOUT_SECONDS,
-            ):
-                raise Session.TimeoutException()
+        if self.state == Spectator.State.INTERRUPTED_BY_SERVER:
+            raise Spectator.DisconnectedException(
+                Spectator.State.INTERRUPTED_BY_SERVER
+            )
+        elif self.state == Spectator.State.CONNECTED:
+            return
+
+        if not self.wait_for_readers_signal_sync(
+            predicate=lambda: self.state
+            in [Spectator.State.CONNECTED, Spectator.State.INTERRUPTED_BY_SERVER],
+            timeout=Session.TIMEOUT_SECONDS,
+        ):
+            raise Session.TimeoutException()
 
         if self.state == Spectator.State.INTERRUPTED_BY_SERVER:
             raise Exception("Interrupted by server")
 
         assert self.state == Spectator.State.CONNECTED, str(self.state)
 
+    async def reconnect(self) -> None:
+        """ The coroutine version of reconnect_sync() """
+        if self.state == Spectator.State.INTERRUPTED_BY_SERVER:
+            raise Spectator.DisconnectedException(Spectator.State.INTERRUPTED_BY_SERVER)
+        try:
+            await asyncio.wait_for(
+                self.wait_for_readers_signal(
+                    lambda: self.state in [Spectator.State.CONNECTED, Spectator.State.INTERRUPTED_BY_SERVER]
+                ),
+                timeout=Session.TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            raise Session.TimeoutException()
+
+        if self.state == Spectator.State.INTERRUPTED_BY_SERVER:
+            raise Exception("Interrupted by server")
+
     # Override
     def get_sync(self) -> str:
         while True:
@@ -257,3 +425,14 @@ class Session(Spectator):
                     raise err
                 else:
                     self.reconnect_sync()
+
+    # Override
+    async def get(self) -> str:
+        while True:
+            try:
+                return await super().get()
+            except Spectator.DisconnectedException as err:
+                if err.state == Spectator.State.INTERRUPTED_BY_SERVER:
+                    raise err
+                else:
+                    await self.reconnect()
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import multiprocessing
+from typing import Optional
+
+import aiohttp
+from aiohttp import web, http
+from aiohttp_sse import sse_response
+
+from .http_controlled_server import HttpControlledServer
+
+"""
+Shards the rooms of an HttpControlledServer over several processes, so that all cores serve rooms: each worker process
+runs its own HttpControlledServer on a local port, and the supervisor is the front that the clients connect to.
+
+The room IDs seen by the clients say which worker owns the room: room_id = worker_room_id * nb_workers + worker_index.
+The supervisor proxies /r/{roomId}/... (HTTP and WebSockets) to that worker, and aggregates the room lists.
+"""
+
+WORKER_HOST = "127.0.0.1"
+
+
+def run_worker(available_games: dict[str, "Game"], port: int, replay_directory: str | None):
+    HttpControlledServer(available_games, replay_directory=replay_directory).nt_start(
+        host=WORKER_HOST, port=port, print=None
+    )
+
+
+class Supervisor:
+    # request headers that aiohttp sets itself on the proxied request
+    HOP_BY_HOP_HEADERS = {"host", "connection", "upgrade", "content-length", "transfer-encoding", "keep-alive"}
+
+    def __init__(
+        self, available_games: dict[str, "Game"], nb_workers: int,
+        first_worker_port: int = 9000, replay_directory: str | None = None
+    ):
+        self.available_games = available_games
+        self.worker_urls = [f"http://{WORKER_HOST}:{first_worker_port + i}" for i in range(nb_workers)]
+        self.workers = [
+            multiprocessing.Process(
+                target=run_worker, args=(available_games, first_worker_port + i, replay_directory), daemon=True
+            )
+            for i in range(nb_workers)
+        ]
+        self.client: Optional[aiohttp.ClientSession] = None
+        self.event_queues: list[asyncio.Queue] = []
+        self.watch_tasks: list[asyncio.Task] = []
+        self.app = web.Application()
+        self.app.add_routes(
+            [
+                web.post("/room", self.http_create_room),
+                web.get("/room/list", self.http_get_rooms),
+                web.get("/room/list/watch", self.http_watch_rooms),
+                web.options("/room", self.http_options_create_room),
+                web.post("/login", self.http_login),
+                web.route("*", r"/r/{roomId:\d+}/{path:.*}", self.http_proxy),
+            ]
+        )
+        self.app.on_startup.append(self.on_startup)
+        self.app.on_shutdown.append(self.on_shutdown)
+
+    def add_client(self, route):
+        """ See Server.add_client() """
+        self.app.add_routes([route])
+        return self  # for chaining
+
+    def nt_start(self, *args, **kwargs):
+        """ Starts the workers, then serves the clients until interrupted. The arguments are those of web.run_app() """
+        for worker in self.workers:
+            worker.start()
+        try:
+            web.run_app(self.app, *args, **kwargs)
+        finally:
+            for worker in self.workers:
+                worker.terminate()
+
+    # room IDs
+
+    def global_room_id(self, worker_index: int, worker_room_id: int) -> int:
+        return worker_room_id * len(self.workers) + worker_index
+
+    def worker_of(self, room_id: int) -> tuple[int, int]:
+        """ The index of the worker that owns a room, and the ID of the room in that worker """
+        return room_id % len(self.workers), room_id // len(self.workers)
+
+    def translate_events(self, worker_index: int, data: str) -> str:
+        """ The events of a worker are diffs whose keys start with its room IDs, see HttpControlledServer.log_event() """
+        diffs = json.loads(data)
+        for diff in diffs:
+            _, worker_room_id, *rest = diff["key"].split("/", 2)
+            diff["key"] = "/".join(["", str(self.global_room_id(worker_index, int(worker_room_id))), *rest])
+        return json.dumps(diffs)
+
+    # lifecycle
+
+    async def on_startup(self, app):
+        self.client = aiohttp.ClientSession(auto_decompress=False)
+        for url in self.worker_urls:  # wait until all workers accept connections
+            while True:
+                try:
+                    async with self.client.get(url + "/room/list") as response:
+                        await response.read()
+                    break
+                except aiohttp.ClientConnectionError:
+                    await asyncio.sleep(0.1)
+        self.watch_tasks = [
+            asyncio.create_task(self.watch_worker(i, url)) for i, url in enumerate(self.worker_urls)
+        ]
+
+    async def on_shutdown(self, app):
+        for queue in self.event_queues:
+            queue.put_nowait(HttpControlledServer.SERVER_CLOSED_DUMMY_MSG)
+        for task in self.watch_tasks:
+            task.cancel()
+        await self.client.close()
+
+    async def watch_worker(self, worker_index: int, url: str):
+        """ Forwards the room events of a worker to the clients watching the room list """
+        async with self.client.get(url + "/room/list/watch") as response:
+            async for line in response.content:
+                if line.startswith(b"data: "):
+                    data = self.translate_events(worker_index, line[len(b"data: "):].decode().strip())
+                    for queue in self.event_queues:
+                        queue.put_nowait(data)
+
+    # HTTP handlers, see HttpControlledServer
+
+    async def worker_rooms(self, url: str) -> dict[str, dict]:
+        async with self.client.get(url + "/room/list") as response:
+            return await response.json()
+
+    async def http_create_room(self, request: web.Request) -> web.Response:
+        # the least loaded worker gets the room
+        room_lists = await asyncio.gather(*[self.worker_rooms(url) for url in self.worker_urls])
+        worker_index = min(range(len(self.workers)), key=lambda i: len(room_lists[i]))
+        async with self.client.post(
+            self.worker_urls[worker_index] + "/room", data=await request.read(), headers=self.proxied_headers(request)
+        ) as response:
+            if response.status != http.HTTPStatus.CREATED:
+                return web.Response(status=response.status, text=await response.text())
+            worker_room_id = await response.json()
+        return web.json_response(self.global_room_id(worker_index, worker_room_id), status=http.HTTPStatus.CREATED)
+
+    async def http_get_rooms(self, request: web.Request) -> web.Response:
+        room_lists = await asyncio.gather(*[self.worker_rooms(url) for url in self.worker_urls])
+        rooms = {
+            self.global_room_id(worker_index, int(worker_room_id)): room
+            for worker_index, room_list in enumerate(room_lists)
+            for worker_room_id, room in room_list.items()
+        }
+        return web.json_response(text=json.dumps(rooms))
+
+    async def http_watch_rooms(self, request: web.Request) -> web.StreamResponse:
+        queue = asyncio.Queue()
+        self.event_queues.append(queue)
+        try:
+            async with sse_response(request) as channel:
+                while True:
+                    data = await queue.get()
+                    if data == HttpControlledServer.SERVER_CLOSED_DUMMY_MSG:
+                        break
+                    await channel.send(data)
+        except ConnectionResetError:
+            pass
+        self.event_queues.remove(queue)
+        return channel
+
+    def http_options_create_room(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"enum": list(self.available_games.keys())}, headers={"Allow": "POST"}
+        )
+
+    async def http_login(self, request: web.Request) -> web.Response:
+        login_data = await request.json()
+        username = login_data['username']
+        return web.Response(status=http.HTTPStatus.NO_CONTENT, headers={'Set-Cookie': f'username={username}'})
+
+    # proxy
+
+    def proxied_headers(self, request: web.Request) -> dict[str, str]:
+        return {key: value for key, value in request.headers.items() if key.lower() not in self.HOP_BY_HOP_HEADERS}
+
+    async def http_proxy(self, request: web.Request) -> web.StreamResponse:
+        worker_index, worker_room_id = self.worker_of(int(request.match_info["roomId"]))
+        url = f"{self.worker_urls[worker_index]}/r/{worker_room_id}/{request.match_info['path']}"
+        if request.query_string:
+            url += "?" + request.query_string
+        headers = self.proxied_headers(request)
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            return await self.proxy_websocket(request, url, headers)
+
+        async with self.client.request(request.method, url, headers=headers, data=await request.read()) as response:
+            proxied = web.StreamResponse(status=response.status, reason=response.reason)
+            for header in ("Content-Type", "Content-Encoding", "Set-Cookie"):
+                if header in response.headers:
+                    proxied.headers[header] = response.headers[header]
+            await proxied.prepare(request)
+            async for chunk in response.content.iter_any():  # e.g. the replay frames, as they are read
+                await proxied.write(chunk)
+            await proxied.write_eof()
+        return proxied
+
+    async def proxy_websocket(self, request: web.Request, url: str, headers: dict[str, str]) -> web.StreamResponse:
+        headers = {key: value for key, value in headers.items() if not key.lower().startswith("sec-websocket")}
+        try:
+            to_worker = await self.client.ws_connect(url, headers=headers, autoping=True)
+        except aiohttp.WSServerHandshakeError as err:  # e.g. the seat is taken
+            return web.Response(status=err.status, text=err.message)
+        to_client = web.WebSocketResponse()
+        await to_client.prepare(request)
+
+        async def forward(source, destination):
+            async for message in source:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    await destination.send_str(message.data)
+                elif message.type == aiohttp.WSMsgType.BINARY:  # binary diffs, see binary_diffs
+                    await destination.send_bytes(message.data)
+
+        tasks = [asyncio.create_task(forward(to_worker, to_client)), asyncio.create_task(forward(to_client, to_worker))]
+        try:
+            # when one side closes the connection, the other one is closed too
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await to_worker.close()
+            # e.g. the client must reload the view, see Spectator.RESYNC_CLOSE_CODE
+            await to_client.close(code=to_worker.close_code or aiohttp.WSCloseCode.OK)
+        return to_client
@@ -1,5 +1,6 @@
 from game_anywhere.agents import parse_agent_description, agent_types
 from game_anywhere.agents.descriptors import Context, GameDescriptor
+from game_anywhere.agents.replay import ReplayLog, RecordingAgent
 from .core.game import Game, GameSummary
 import argparse
 
@@ -8,6 +9,7 @@ def run_game_from_cmdline(GameType: type[Game], *args, **kwargs) -> GameSummary:
     parser = argparse.ArgumentParser()
     parser.add_argument('agent_types', choices=agent_types.keys(), nargs='+')
     parser.add_argument('--config', '-c', nargs='*')
+    parser.add_argument('--record', help='write a replay log of the game to this file')
     cmdline_args = parser.parse_args()
 
     if cmdline_args.config is None:
@@ -19,15 +21,27 @@ def run_game_from_cmdline(GameType: type[Game], *args, **kwargs) -> GameSummary:
 
     agent_descriptions = [parse_agent_description(arg) for arg in cmdline_args.agent_types]
 
-    return run_game(GameDescriptor(GameType, agent_descriptions, *args, **kwargs, **game_config))
+    descriptor = GameDescriptor(GameType, agent_descriptions, *args, **kwargs, **game_config)
+    descriptor.config = cmdline_args.config
+    return run_game(descriptor, record_to=cmdline_args.record)
 
 
-def run_game(descriptor: GameDescriptor):
+def run_game(descriptor: GameDescriptor, record_to: str|None = None):
     game = descriptor.create_game()
     context = Context(game=game)
 
     agents = descriptor.create_agents(context)
 
-    game.set_agents(agents)
+    if record_to is None:
+        game.set_agents(agents)
+        return game.play_game()
 
-    return game.play_game()
+    log = ReplayLog(record_to)
+    log.write_header(
+        game, descriptor.config, [agent.name for agent in agents], descriptor.game_args, descriptor.game_kwargs
+    )
+    try:
+        game.set_agents([RecordingAgent(agent, i, log) for i, agent in enumerate(agents)])
+        return game.play_game()
+    finally:
+        log.close()
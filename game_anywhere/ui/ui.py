@@ -1,15 +1,78 @@
 import functools
+from html import escape
+from typing import Callable, Iterator, Optional
 
 
 class Html:
+    __slots__ = ("content",)
+
     def __init__(self, *content):
         self.content = content
 
     def __str__(self):
-        result = ""
-        for child in self.content:
-            result += str(child)
-        return result
+        return "".join(self.pieces())
+
+    def write_to(self, write: Callable[[str], None]) -> None:
+        """ Serializes the HTML by calling `write` on consecutive pieces of it, see pieces() """
+        for piece in self.pieces():
+            write(piece)
+
+    def pieces(self) -> Iterator[str]:
+        """
+        Yields the serialized HTML in consecutive pieces, while the tree is walked.
+        Every element is visited once and no intermediate strings are built,
+        so this is linear in the size of the output, however deep the tree is.
+        """
+        stack: list[tuple[Iterator, Optional[str]]] = []  # the parents of the current element, and their tag names
+        push, pop = stack.append, stack.pop
+        children = iter((self,))
+        while True:
+            for node in children:
+                node_type = type(node)
+                if node_type is str:
+                    yield node
+                elif node_type is FrozenHtmlElement:
+                    yield node.serialized
+                elif isinstance(node, HtmlElement):
+                    opening_tag = "<" + node.tag_name
+                    for key, value in node.attrs.items():
+                        value = str(value)
+                        if '"' in value or '&' in value:  # checking is faster than calling escape() every time
+                            value = escape(value)
+                        opening_tag += f' {key}="{value}"'
+                    yield opening_tag + ">"
+                    push((children, node.tag_name))
+                    children = iter(node.content)
+                    break  # continue with the children of this element
+                elif isinstance(node, Html):
+                    push((children, None))
+                    children = iter(node.content)
+                    break
+                else:
+                    yield str(node)
+            else:  # all children written, back to the parent
+                if not stack:
+                    return
+                children, tag_name = pop()
+                if tag_name is not None:
+                    yield "</" + tag_name + ">"
+
+    def stream(self, chunk_size: int = 64 * 1024) -> Iterator[str]:
+        """
+        Yields the serialized HTML in chunks of at least chunk_size characters (except the last one), each one as soon
+        as the tree has been walked that far, so that it can be sent before the rest is serialized
+        """
+        chunk: list[str] = []
+        size = 0
+        for piece in self.pieces():
+            chunk.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield "".join(chunk)
+                chunk.clear()
+                size = 0
+        if chunk:
+            yield "".join(chunk)
 
     def __add__(self, other):
         if not isinstance(other, Html):
@@ -27,24 +90,30 @@ class Html:
 
 
 class HtmlElement(Html):
+    __slots__ = ("tag_name", "attrs")
+
     def __init__(self, tag_name, *children, **attrs):
         super().__init__(*children)
         self.tag_name = tag_name
         self.attrs = attrs
 
-    def __str__(self):
-        result = f"<{self.tag_name}"
-        for key, value in self.attrs.items():
-            result += f' {key}="{value}"'
-        result += ">"
-        result += super().__str__()
-        result += f"</{self.tag_name}>"
-        return result
-
     def wrap_to_one_element(self):
         return self
 
 
+class FrozenHtmlElement(HtmlElement):
+    """ An HtmlElement that is serialized only once, when it is created. Its content can't be changed afterwards. """
+
+    __slots__ = ("serialized",)
+
+    def __init__(self, element: HtmlElement):
+        super().__init__(element.tag_name, **element.attrs)
+        self.serialized = str(element)
+
+    def __str__(self):
+        return self.serialized
+
+
 class HtmlElementMeta(type):
     _tags: dict[str, type["HtmlElement"]] = {}
 
@@ -60,10 +129,12 @@ class HtmlElementMeta(type):
         try:
             return HtmlElementMeta._tags[attrname]
         except KeyError:
-            tag_class = type.__new__(type, attrname, (HtmlElement,), {})
+            tag_class = type.__new__(type, attrname, (HtmlElement,), {"__slots__": ()})
             tag_class.__init__ = HtmlElementMeta._wrap_init(
                 tag_class.__init__, tag_name=attrname
             )
+            # creating a class is expensive, so every tag class is created only once
+            HtmlElementMeta._tags[attrname] = tag_class
             return tag_class
 
 
@@ -0,0 +1,45 @@
+"""
+The binary diffs that BroadcastHub encodes once for all its subscribers.
+Run with `python -m pytest tests`.
+"""
+import sys
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from game_anywhere.network.binary_diffs import DiffDecoder
+from game_anywhere.network.broadcast import BroadcastHub
+
+
+class TestBroadcastHubEncoder(unittest.TestCase):
+    def test_ids_are_reset_by_a_snapshot(self):
+        hub, decoder = BroadcastHub(), DiffDecoder()
+        snapshot = [{"op": "replace", "key": "", "value": "<div id='/board'></div>"}]
+        for turn in range(100):
+            diffs = [{"op": "add", "key": f"/board/{turn}", "value": "token"}]
+            self.assertEqual(decoder.decode(hub.encode(diffs).data), diffs)
+        self.assertEqual(len(hub.diff_encoder.ids), 100)
+        old_encoder = hub.diff_encoder
+
+        self.assertEqual(decoder.decode(hub.encode(snapshot).data), snapshot)
+        self.assertIsNot(hub.diff_encoder, old_encoder)
+        self.assertEqual(len(hub.diff_encoder.ids), 1)
+        self.assertEqual(decoder.keys, [""])
+        diffs = [{"op": "add", "key": "/board/100", "value": "token"}, {"op": "remove", "key": "/board/100"}]
+        self.assertEqual(decoder.decode(hub.encode(diffs).data), diffs)
+
+    def test_late_subscriber(self):
+        hub = BroadcastHub()
+        hub.encode([{"op": "add", "key": "/board/0", "value": "token"}])
+        hub.encode([{"op": "replace", "key": "", "value": "<div id='/board'></div>"}])
+        diffs = [{"op": "add", "key": "/board/1", "value": "token"}]
+        message = hub.encode(diffs)
+        decoder = DiffDecoder()
+        decoder.decode(hub.diff_encoder.definitions())
+        self.assertEqual(decoder.decode(message.data), diffs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Slots declared with ComponentSlotProperty, on games and on components.
+Run with `python -m pytest tests`.
+"""
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from game_anywhere.components import Component
+from game_anywhere.components.component import ComponentSlotProperty
+from game_anywhere.core.game import Game
+from game_anywhere.ui import tag
+
+
+class Token(Component):
+    def html(self, viewer_id=None):
+        return tag.div("token")
+
+
+class Box(Component):
+    token = ComponentSlotProperty(content=Token())
+
+    def html(self, viewer_id=None):
+        return tag.div(self.token.html(viewer_id))
+
+
+class GameWithContent(Game):
+    score = ComponentSlotProperty(content=0)
+    box = ComponentSlotProperty()
+
+    def __init__(self, agent_descriptions):
+        super().__init__(agent_descriptions)
+        self.box = Box()
+
+    def html(self, viewer_id=None):
+        return tag.div(str(self.score), self.box.html(viewer_id))
+
+    def play_game(self): ...
+
+
+class TestInitialContent(unittest.TestCase):
+    def test_game_slot_with_initial_content(self):
+        game = GameWithContent([SimpleNamespace(name="player 0")])
+        self.assertEqual(game.score, 0)
+        game.score = 3
+        self.assertEqual(game.score, 3)
+
+    def test_component_slot_with_initial_content(self):
+        game = GameWithContent([SimpleNamespace(name="player 0")])
+        self.assertIsInstance(game.box.token, Token)
+        self.assertIs(game.box.token.get_game(), game)
+
+    def test_initial_content_is_rolled_back_to(self):
+        game = GameWithContent([SimpleNamespace(name="player 0")])
+        checkpoint = game.checkpoint()
+        game.score = 5
+        game.rollback(checkpoint)
+        self.assertEqual(game.score, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
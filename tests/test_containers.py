@@ -0,0 +1,40 @@
+"""
+StableList behaves like a list where the list interface allows it.
+Run with `python -m pytest tests`.
+"""
+import sys
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from game_anywhere.components import StableList
+
+
+class TestStableListInsert(unittest.TestCase):
+    def check_insert(self, index: int):
+        values = [1, 2, 3]
+        stable_list = StableList(values)
+        values.insert(index, 0)
+        stable_list.insert(index, 0)
+        self.assertEqual(list(stable_list), values)
+
+    def test_insert_in_range(self):
+        for index in range(-3, 4):
+            with self.subTest(index=index):
+                self.check_insert(index)
+
+    def test_insert_before_the_head(self):
+        for index in (-4, -100):
+            with self.subTest(index=index):
+                self.check_insert(index)
+
+    def test_insert_after_the_tail(self):
+        for index in (4, 100):
+            with self.subTest(index=index):
+                self.check_insert(index)
+
+
+if __name__ == "__main__":
+    unittest.main()
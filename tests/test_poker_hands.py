@@ -0,0 +1,84 @@
+"""
+Cross-checks evaluate_poker_cards() against the reference PokerHand of examples/poker.py.
+Run with `python -m pytest tests`.
+"""
+import random
+import sys
+import unittest
+from itertools import combinations
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "examples"))
+
+from game_anywhere.components.traditional.cards import PokerCard, fiftytwo_cards
+from game_anywhere.components.traditional.poker_hands import evaluate_poker_cards, hand_category
+from poker import PokerHand, hand_value_names_ranked
+
+DECK = list(fiftytwo_cards())
+SUITS = {"s": PokerCard.Color.SPADES, "h": PokerCard.Color.HEARTS, "d": PokerCard.Color.DIAMONDS,
+         "c": PokerCard.Color.CLUBS}
+VALUES = {"A": 1, "T": 10, "J": 11, "Q": 12, "K": 13}
+
+
+def cards(hand: str) -> list[PokerCard]:
+    """ e.g. "As 5h Td": value then suit """
+    by_name = {(int(card.value), card.color): card for card in DECK}
+    return [by_name[VALUES[value] if value in VALUES else int(value), SUITS[suit]] for value, suit in hand.split()]
+
+
+def reference(hand: list[PokerCard]) -> PokerHand:
+    return max(PokerHand(five_cards) for five_cards in combinations(hand, 5))
+
+
+def sign(x) -> int:
+    return (x > 0) - (x < 0)
+
+
+EDGE_HANDS = {
+    "wheel": "As 2h 3d 4c 5s Kd 9h",
+    "six high straight": "2h 3d 4c 5s 6h Kd 9h",
+    "ace high straight": "Th Jd Qc Ks As 2d 7h",
+    "steel wheel": "Ah 2h 3h 4h 5h Kd 9c",
+    "six high straight flush": "2h 3h 4h 5h 6h Ah 9c",
+    "royal flush": "Ts Js Qs Ks As 2d 2h",
+    "ace high flush": "Ad 9d 7d 4d 2d Kc Qh",
+    "quads with king kicker": "9s 9h 9d 9c Ks 3h 2d",
+    "quads with queen kicker": "9s 9h 9d 9c Qs 3h 2d",
+    "quads, kicker on the board pair": "9s 9h 9d 9c 5s 5h 2d",
+    "two trips": "7s 7h 7d 5s 5h 5d Kc",
+    "full house, sevens over fives": "7s 7h 7d 5s 5h Kd 2c",
+    "full house, fives over sevens": "5s 5h 5d 7s 7h Kd 2c",
+    "three pairs": "Ks Kh 8d 8c 4s 4h 2d",
+    "two pairs, ace kicker": "Ks Kh 8d 8c As 4h 2d",
+    "high card": "As Kh 9d 7c 5s 3h 2d",
+}
+
+
+class TestEvaluatePokerCards(unittest.TestCase):
+    def assert_same_ranking(self, hands: list[list[PokerCard]]):
+        references = [reference(hand) for hand in hands]
+        scores = [evaluate_poker_cards(hand) for hand in hands]
+        for hand, expected, score in zip(hands, references, scores):
+            self.assertEqual(hand_category(score), hand_value_names_ranked[expected.hand_value], hand)
+        for (hand1, expected1, score1), (hand2, expected2, score2) in combinations(zip(hands, references, scores), 2):
+            self.assertEqual(sign(score1 - score2), sign((expected1 > expected2) - (expected1 < expected2)),
+                             (hand1, hand2))
+
+    def test_edge_hands(self):
+        self.assert_same_ranking([cards(hand) for hand in EDGE_HANDS.values()])
+
+    def test_edge_categories(self):
+        self.assertEqual(hand_category(evaluate_poker_cards(cards(EDGE_HANDS["wheel"]))), "straight")
+        self.assertEqual(hand_category(evaluate_poker_cards(cards(EDGE_HANDS["steel wheel"]))), "straight_flush")
+        self.assertEqual(hand_category(evaluate_poker_cards(cards(EDGE_HANDS["two trips"]))), "full_house")
+
+    def test_random_hands(self):
+        rng = random.Random(0)
+        for nb_cards in (5, 6, 7):
+            self.assert_same_ranking([rng.sample(DECK, nb_cards) for _ in range(150)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Records a game that takes arguments besides its command-line configuration, and replays it from the log alone.
+Run with `python -m pytest tests`.
+"""
+import random
+import sys
+import unittest
+from enum import Enum
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from game_anywhere.agents.replay import RecordingAgent, ReplayLog, replay_game
+from game_anywhere.core import Agent
+from game_anywhere.core.game import Game, SimpleGameSummary
+from game_anywhere.ui import tag
+
+
+class Bonus(Enum):
+    NONE = 0
+    DOUBLE = 2
+
+
+class Dice(Game):
+    """ Each player picks a number for each die, and scores it plus the roll. Has no command-line configuration """
+
+    def __init__(self, agent_descriptions, faces: list[int], bonus: Bonus, summary: type = SimpleGameSummary, **kwargs):
+        super().__init__(agent_descriptions, **kwargs)
+        self.faces = faces
+        self.bonus = bonus
+        self.summary = summary
+        self.scores = [0] * len(agent_descriptions)
+
+    def html(self, viewer_id=None):
+        return tag.div(" ".join(map(str, self.scores)))
+
+    def play_game(self):
+        for face in self.faces:
+            for i, agent in enumerate(self.agents):
+                self.scores[i] += (agent.int_choice(0, face) + self.random.randint(1, face)) * (self.bonus.value or 1)
+        return self.summary(max(range(len(self.scores)), key=self.scores.__getitem__))
+
+
+class RandomAgent(Agent):
+    def __init__(self, name: str, rng: random.Random):
+        super().__init__(name)
+        self.rng = rng
+
+    def int_choice(self, min=0, max=None):
+        return self.rng.randint(min, max)
+
+    def message(self, *args, **kwargs): ...
+    def update(self, diff): ...
+    def query(self, allowedSchema): ...
+    def choose_one_component_slot(self, *args, **kwargs): ...
+    def text_choice(self, options): ...
+    def chat_stream(self, event_loop): ...
+
+
+class TestReplayGameArguments(unittest.TestCase):
+    names = ["player 0", "player 1"]
+    kwargs = {"faces": [4, 6, 8, 20], "bonus": Bonus.DOUBLE, "summary": SimpleGameSummary}
+
+    def record(self, path: str) -> tuple[Dice, SimpleGameSummary]:
+        game = Dice([SimpleNamespace(name=name) for name in self.names], seed=7, **self.kwargs)
+        log = ReplayLog(path)
+        log.write_header(game, [], self.names, game_kwargs=self.kwargs)
+        rng = random.Random(7)
+        game.set_agents([RecordingAgent(RandomAgent(name, rng), i, log) for i, name in enumerate(self.names)])
+        try:
+            return game, game.play_game()
+        finally:
+            log.close()
+
+    def test_replay_with_recorded_arguments(self):
+        kwargs = self.kwargs
+        with TemporaryDirectory() as directory:
+            path = str(Path(directory) / "dice.jsonl")
+            game, summary = self.record(path)
+            replayed, replayed_summary = replay_game(path, Dice)
+        self.assertEqual(replayed.faces, kwargs["faces"])
+        self.assertIs(replayed.bonus, Bonus.DOUBLE)
+        self.assertIs(replayed.summary, SimpleGameSummary)
+        self.assertEqual(replayed.scores, game.scores)
+        self.assertEqual(replayed_summary.get_winner(), summary.get_winner())
+
+    def test_replay_with_a_recorded_argument_given_again(self):
+        with TemporaryDirectory() as directory:
+            path = str(Path(directory) / "dice.jsonl")
+            game, summary = self.record(path)
+            replayed, replayed_summary = replay_game(path, Dice, bonus=Bonus.DOUBLE, seed=0)
+        self.assertEqual(replayed.seed, game.seed)
+        self.assertEqual(replayed.scores, game.scores)
+
+
+if __name__ == "__main__":
+    unittest.main()